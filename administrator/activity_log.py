@@ -1,6 +1,24 @@
-"""Central activity logging for User Activity page. Call log_activity(request, action, description) from any view."""
+"""
+Central activity logging for User Activity page. Call log_activity(request, action, description) from any view.
+
+Rows are buffered in-process and written with bulk_create once ACTIVITY_LOG_BATCH_SIZE rows
+are pending or ACTIVITY_LOG_FLUSH_SECONDS have passed, so a request does not pay a database
+round-trip per log line. Events are only queued after the surrounding transaction commits.
+Set ACTIVITY_LOG_BUFFERED = False (e.g. in tests) to write each row synchronously.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
 from .models import UserActivity
 
+logger = logging.getLogger(__name__)
+
 # Action constants for callers that don't import the model
 ACTION_CREATE = UserActivity.ACTION_CREATE
 ACTION_UPDATE = UserActivity.ACTION_UPDATE
@@ -31,6 +49,123 @@ def _safe_ip(ip_str):
     return None
 
 
+class ActivityBuffer:
+    """Thread-safe in-process queue of unsaved UserActivity rows."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = []
+        self._oldest = None
+        self._timer = None
+
+    def add(self, activity):
+        with self._lock:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append(activity)
+            due = (
+                len(self._pending) >= _batch_size()
+                or time.monotonic() - self._oldest >= _flush_seconds()
+            )
+        if due:
+            self.flush()
+        else:
+            self._ensure_timer()
+
+    def flush(self):
+        """
+        Write all pending rows with one bulk_create. Returns the number written.
+        If the batch fails, rows are retried one by one so a single bad row does not lose the rest.
+        """
+        with self._lock:
+            batch, self._pending, self._oldest = self._pending, [], None
+        if not batch:
+            return 0
+        try:
+            UserActivity.objects.bulk_create(batch, batch_size=_batch_size())
+            return len(batch)
+        except Exception:
+            logger.exception('Activity log batch of %s rows failed; retrying row by row', len(batch))
+        written = 0
+        for activity in batch:
+            try:
+                activity.save()
+                written += 1
+            except Exception:
+                # don't break the request if logging fails
+                logger.exception('Dropped activity log row: %s %r', activity.action, activity.description)
+        return written
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _ensure_timer(self):
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Thread(target=self._run_timer, name='activity-log-flush', daemon=True)
+            self._timer.start()
+
+    def _run_timer(self):
+        # Flush rows that were not pushed out by the size threshold, then exit once idle.
+        # The thread's own database connection is closed on exit; nothing else would close it.
+        try:
+            while True:
+                time.sleep(_flush_seconds())
+                with self._lock:
+                    if not self._pending:
+                        self._timer = None
+                        return
+                self.flush()
+                close_old_connections()
+        finally:
+            connections.close_all()
+
+
+def _batch_size():
+    return max(1, int(getattr(settings, 'ACTIVITY_LOG_BATCH_SIZE', 50)))
+
+
+def _flush_seconds():
+    return max(0.1, float(getattr(settings, 'ACTIVITY_LOG_FLUSH_SECONDS', 5)))
+
+
+def _is_buffered():
+    return getattr(settings, 'ACTIVITY_LOG_BUFFERED', True)
+
+
+_buffer = ActivityBuffer()
+atexit.register(_buffer.flush)
+
+
+def pending_activity_count():
+    """Rows waiting in this process's buffer (for /metrics)."""
+    return len(_buffer)
+
+
+def flush_activity_log():
+    """Write any buffered activity rows now (e.g. before reading the log)."""
+    return _buffer.flush()
+
+
+def record_activity(user, action, description='', ip_address=None):
+    """Queue (or, in synchronous mode, write) one UserActivity row."""
+    activity = UserActivity(
+        user=user,
+        action=action,
+        description=(description or '')[:255],
+        ip_address=ip_address,
+        created_at=timezone.now(),
+    )
+    if not _is_buffered():
+        try:
+            activity.save()
+        except Exception:
+            pass  # don't break the request if logging fails
+        return
+    transaction.on_commit(lambda: _buffer.add(activity))
+
+
 def log_activity(request, action, description):
     """
     Record a user action for the User Activity page.
@@ -42,31 +177,11 @@ def log_activity(request, action, description):
     user = getattr(request, 'user', None)
     if user and not user.is_authenticated:
         user = None
-    ip = _safe_ip(_get_client_ip(request))
-    desc = (description or '')[:255]
-    try:
-        UserActivity.objects.create(
-            user=user,
-            action=action,
-            description=desc,
-            ip_address=ip,
-        )
-    except Exception:
-        pass  # don't break the request if logging fails
+    record_activity(user, action, description, _safe_ip(_get_client_ip(request)))
 
 
 def log_activity_for_user(user, request, action, description):
     """
     Record an action for a specific user (useful for unauthenticated flows like forgot password).
     """
-    ip = _safe_ip(_get_client_ip(request))
-    desc = (description or '')[:255]
-    try:
-        UserActivity.objects.create(
-            user=user,
-            action=action,
-            description=desc,
-            ip_address=ip,
-        )
-    except Exception:
-        pass
+    record_activity(user, action, description, _safe_ip(_get_client_ip(request)))
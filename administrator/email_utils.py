@@ -1,8 +1,37 @@
-"""Utility to send emails and log them to SentEmail."""
-from django.core.mail import send_mail
+"""
+Utility to send emails and log them to SentEmail.
+
+Emails go through an outbox: send_and_log_email() writes an OutboxEmail row in the caller's
+transaction and returns immediately. send_outbox() delivers pending rows in batches over one
+SMTP connection, retrying failures with exponential backoff until EMAIL_OUTBOX_MAX_ATTEMPTS,
+after which the row is left in the dead-letter ('dead') state. It runs in a background thread
+after each commit (EMAIL_OUTBOX_AUTOSEND) and from `manage.py send_outbox_emails`.
+"""
+import logging
+import threading
+from datetime import timedelta
+
 from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import OutboxEmail, SentEmail
+
+logger = logging.getLogger(__name__)
+
+# A worker that died mid-batch leaves rows in 'sending'; reclaim them after this long.
+STALE_LOCK_AFTER = timedelta(minutes=10)
 
-from .models import SentEmail
+
+def _max_attempts():
+    return getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 6)
+
+
+def _backoff(attempts):
+    """Delay before the next try: base * 2^(attempts - 1), capped at one day."""
+    base = getattr(settings, 'EMAIL_OUTBOX_RETRY_SECONDS', 60)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), 86400))
 
 
 def send_and_log_email(
@@ -14,25 +43,144 @@ def send_and_log_email(
     related_user=None,
 ):
     """
-    Send an email and log it to SentEmail.
-    Returns True if sent successfully, False otherwise.
+    Queue an email in the outbox; it is sent and logged to SentEmail by send_outbox().
+    Returns True if queued, False otherwise.
     """
+    if not recipient_email:
+        return False
     try:
-        send_mail(
-            subject=subject,
-            message=body_plain,
-            from_email=None,
-            recipient_list=[recipient_email],
-            fail_silently=False,
-        )
-        SentEmail.objects.create(
+        OutboxEmail.objects.create(
             recipient_email=recipient_email,
-            subject=subject,
+            subject=subject[:255],
             body_plain=body_plain,
             email_type=email_type,
             sent_by=sent_by,
             related_user=related_user,
         )
-        return True
     except Exception:
         return False
+    if getattr(settings, 'EMAIL_OUTBOX_AUTOSEND', True):
+        transaction.on_commit(_send_outbox_in_background)
+    return True
+
+
+def _claim_batch(batch_size):
+    """Mark up to batch_size due emails as 'sending' and return them."""
+    now = timezone.now()
+    due = (
+        OutboxEmail.objects.filter(status=OutboxEmail.STATUS_PENDING, next_attempt_at__lte=now)
+        | OutboxEmail.objects.filter(status=OutboxEmail.STATUS_SENDING, locked_at__lt=now - STALE_LOCK_AFTER)
+    )
+    with transaction.atomic():
+        ids = list(
+            due.select_for_update(skip_locked=True)
+            .order_by('next_attempt_at', 'pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        OutboxEmail.objects.filter(pk__in=ids).update(status=OutboxEmail.STATUS_SENDING, locked_at=now)
+    return list(OutboxEmail.objects.filter(pk__in=ids).order_by('next_attempt_at', 'pk'))
+
+
+def _record_failure(email, error):
+    email.attempts += 1
+    email.last_error = str(error)[:2000]
+    email.locked_at = None
+    if email.attempts >= _max_attempts():
+        email.status = OutboxEmail.STATUS_DEAD
+    else:
+        email.status = OutboxEmail.STATUS_PENDING
+        email.next_attempt_at = timezone.now() + _backoff(email.attempts)
+    email.save(update_fields=['attempts', 'last_error', 'locked_at', 'status', 'next_attempt_at'])
+
+
+def _record_success(email):
+    with transaction.atomic():
+        email.status = OutboxEmail.STATUS_SENT
+        email.attempts += 1
+        email.sent_at = timezone.now()
+        email.locked_at = None
+        email.last_error = ''
+        email.save(update_fields=['status', 'attempts', 'sent_at', 'locked_at', 'last_error'])
+        SentEmail.objects.create(
+            recipient_email=email.recipient_email,
+            subject=email.subject,
+            body_plain=email.body_plain,
+            email_type=email.email_type,
+            sent_by_id=email.sent_by_id,
+            related_user_id=email.related_user_id,
+        )
+
+
+def send_outbox(batch_size=50):
+    """
+    Send one batch of due outbox emails over a single SMTP connection.
+    Returns (sent, failed) counts.
+    """
+    batch = _claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+
+    sent = failed = 0
+    try:
+        connection = get_connection(fail_silently=False)
+        connection.open()
+    except Exception as exc:
+        for email in batch:
+            _record_failure(email, exc)
+        return 0, len(batch)
+
+    try:
+        for email in batch:
+            try:
+                EmailMessage(
+                    subject=email.subject,
+                    body=email.body_plain,
+                    to=[email.recipient_email],
+                    connection=connection,
+                ).send()
+            except Exception as exc:
+                _record_failure(email, exc)
+                failed += 1
+            else:
+                _record_success(email)
+                sent += 1
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+    return sent, failed
+
+
+_drain_lock = threading.Lock()
+_drain_requested = threading.Event()
+
+
+def _send_outbox_in_background():
+    """Drain due outbox emails in a daemon thread so the request does not wait on SMTP."""
+    _drain_requested.set()
+    if not _drain_lock.acquire(blocking=False):
+        return  # the running drain checks _drain_requested again after releasing the lock
+    threading.Thread(target=_drain, name='email-outbox', daemon=True).start()
+
+
+def _drain():
+    """Send until nothing is due. The caller holds _drain_lock; it is released on return."""
+    try:
+        while True:
+            _drain_requested.clear()
+            try:
+                while True:
+                    sent, failed = send_outbox()
+                    if not sent and not failed:
+                        break
+            except Exception:
+                logger.exception('Email outbox drain failed')
+            finally:
+                _drain_lock.release()
+            # A row committed after the last empty batch found the lock taken and only set the
+            # flag; take the lock back for it, unless a new drain already did.
+            if not _drain_requested.is_set() or not _drain_lock.acquire(blocking=False):
+                return
+    finally:
+        connections.close_all()
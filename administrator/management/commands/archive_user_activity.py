@@ -0,0 +1,135 @@
+import gzip
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from administrator.activity_log import flush_activity_log
+from administrator.models import UserActivity, UserActivityArchive
+
+
+def _month_start(dt):
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(dt):
+    if dt.month == 12:
+        return dt.replace(year=dt.year + 1, month=1)
+    return dt.replace(month=dt.month + 1)
+
+
+def _months_back(dt, months):
+    total = dt.year * 12 + (dt.month - 1) - months
+    return dt.replace(year=total // 12, month=total % 12 + 1)
+
+
+class Command(BaseCommand):
+    help = (
+        'Move UserActivity rows older than N months into gzipped JSONL archives (one file per month and run) '
+        'and delete them from the live table. Per-action counts are kept for dashboard charts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months', type=int, default=None,
+            help='Keep this many months (including the current one) in the live table '
+                 '(default: ACTIVITY_RETENTION_MONTHS)',
+        )
+        parser.add_argument(
+            '--output-dir', type=str, default=None,
+            help='Directory for archive files (default: ACTIVITY_ARCHIVE_DIR)',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Show what would be archived without writing files or deleting rows',
+        )
+
+    def handle(self, *args, **options):
+        months = options['months']
+        if months is None:
+            months = getattr(settings, 'ACTIVITY_RETENTION_MONTHS', 12)
+        months = max(1, months)
+        output_dir = Path(options['output_dir'] or settings.ACTIVITY_ARCHIVE_DIR)
+        dry_run = options['dry_run']
+
+        flush_activity_log()
+        now = timezone.localtime()
+        cutoff = _months_back(_month_start(now), months - 1)
+        self.stdout.write(f'Archiving user activity before {cutoff:%Y-%m-%d} into {output_dir}')
+
+        oldest = UserActivity.objects.filter(created_at__lt=cutoff).order_by('created_at').first()
+        if not oldest:
+            self.stdout.write(self.style.SUCCESS('Nothing to archive.'))
+            return
+
+        if not dry_run:
+            output_dir.mkdir(parents=True, exist_ok=True)
+
+        total = 0
+        month = _month_start(timezone.localtime(oldest.created_at))
+        while month < cutoff:
+            end = _next_month(month)
+            rows = UserActivity.objects.filter(created_at__gte=month, created_at__lt=end)
+            if dry_run:
+                count = rows.count()
+                if count:
+                    self.stdout.write(f'  {month:%Y-%m}: {count} rows (dry run)')
+                total += count
+            else:
+                total += self._archive_month(month, rows, output_dir)
+            month = end
+
+        style = self.style.WARNING if dry_run else self.style.SUCCESS
+        self.stdout.write(style(f'{"Would archive" if dry_run else "Archived"} {total} rows.'))
+
+    def _archive_month(self, month, rows, output_dir):
+        with transaction.atomic():
+            first_pk = rows.order_by('pk').values_list('pk', flat=True).first()
+            if first_pk is None:
+                return 0
+            # One file per run, named by its first row id. If the delete below does not commit, the
+            # rows stay live and a re-run starts at the same id, so it replaces the file instead of
+            # archiving the rows twice.
+            path = output_dir / f'user_activity-{month:%Y-%m}-{first_pk}.jsonl.gz'
+            archive, _ = UserActivityArchive.objects.select_for_update().get_or_create(month=month.date())
+            counts = dict(archive.action_counts or {})
+            written = 0
+            last_pk = None
+            tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+            try:
+                with gzip.open(tmp_path, 'wt', encoding='utf-8') as fh:
+                    for row in rows.order_by('pk').values(
+                        'pk', 'user_id', 'user__username', 'action', 'description', 'ip_address', 'created_at',
+                    ).iterator(chunk_size=2000):
+                        fh.write(json.dumps({
+                            'id': row['pk'],
+                            'user_id': row['user_id'],
+                            'username': row['user__username'],
+                            'action': row['action'],
+                            'description': row['description'],
+                            'ip_address': row['ip_address'],
+                            'created_at': row['created_at'].isoformat(),
+                        }) + '\n')
+                        counts[row['action']] = counts.get(row['action'], 0) + 1
+                        written += 1
+                        last_pk = row['pk']
+                if not written:
+                    if not archive.row_count:
+                        archive.delete()
+                    return 0
+                os.replace(tmp_path, path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
+            # Only delete what was written, in case rows arrived for this month meanwhile.
+            rows.filter(pk__lte=last_pk).delete()
+            if str(path) not in archive.file_paths:
+                archive.file_paths = [*archive.file_paths, str(path)]
+            archive.row_count += written
+            archive.action_counts = counts
+            archive.save()
+        self.stdout.write(f'  {month:%Y-%m}: {written} rows -> {path}')
+        return written
@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from administrator.models import UserProfile
+from administrator.utils import ADMIN_GROUP_NAME, STAFF_GROUP_NAME
+
+User = get_user_model()
+
+BENCH_PREFIX = 'bench_user_'
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Count the queries run by the User Accounts and User Permissions pages as the number '
+        'of users grows. Benchmark users are created inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=str, default='10,50,200',
+            help='Comma-separated numbers of users to measure with (default: 10,50,200)',
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(s) for s in options['sizes'].split(',') if s.strip())
+        pages = ['administrator:user_accounts', 'administrator:user_permissions']
+        results = {name: [] for name in pages}
+
+        try:
+            with transaction.atomic():
+                admin_group, _ = Group.objects.get_or_create(name=ADMIN_GROUP_NAME)
+                staff_group, _ = Group.objects.get_or_create(name=STAFF_GROUP_NAME)
+                viewer = User.objects.create_superuser(f'{BENCH_PREFIX}viewer', '', 'bench-pass-1234')
+                client = Client()
+                client.force_login(viewer)
+
+                created = 0
+                for size in sizes:
+                    while created < size:
+                        user = User.objects.create_user(f'{BENCH_PREFIX}{created}', password=None)
+                        user.groups.add(admin_group if created % 5 == 0 else staff_group)
+                        UserProfile.objects.create(user=user, can_delete_in_operations=created % 2 == 0)
+                        created += 1
+                    for name in pages:
+                        with CaptureQueriesContext(connection) as ctx:
+                            response = client.get(reverse(name))
+                        results[name].append((size, len(ctx.captured_queries), response.status_code))
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(self.style.SUCCESS('\n=== Query count per page load ===\n'))
+        for name, rows in results.items():
+            self.stdout.write(name)
+            for size, queries, status in rows:
+                self.stdout.write(f'  users={size:<6} queries={queries:<4} status={status}')
+            counts = {queries for _, queries, _ in rows}
+            if len(counts) == 1:
+                self.stdout.write(self.style.SUCCESS('  [OK] constant query count'))
+            else:
+                self.stdout.write(self.style.WARNING('  [WARN] query count grows with users'))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from administrator.email_utils import send_outbox
+from administrator.models import OutboxEmail
+
+
+class Command(BaseCommand):
+    help = 'Send pending outbox emails in batches over one SMTP connection per batch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=50,
+            help='Emails sent per SMTP connection (default: 50)',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running and poll the outbox every --interval seconds',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=30,
+            help='Seconds between polls when --loop is set (default: 30)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        while True:
+            total_sent = total_failed = 0
+            while True:
+                sent, failed = send_outbox(batch_size=batch_size)
+                total_sent += sent
+                total_failed += failed
+                if not sent and not failed:
+                    break
+            if total_sent or total_failed or not options['loop']:
+                dead = OutboxEmail.objects.filter(status=OutboxEmail.STATUS_DEAD).count()
+                self.stdout.write(
+                    f'Sent {total_sent}, failed {total_failed} (will retry unless dead-lettered). '
+                    f'Dead-lettered total: {dead}'
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
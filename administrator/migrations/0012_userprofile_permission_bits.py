@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+from administrator.permissions import compile_permission_bits
+
+
+def compile_existing_profiles(apps, schema_editor):
+    UserProfile = apps.get_model('administrator', 'UserProfile')
+    for profile in UserProfile.objects.all():
+        bits = compile_permission_bits(profile)
+        if bits:
+            UserProfile.objects.filter(pk=profile.pk).update(permission_bits=bits)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administrator', '0011_admin_otp_and_forgot_password_action'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='permission_bits',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(compile_existing_profiles, migrations.RunPython.noop),
+    ]
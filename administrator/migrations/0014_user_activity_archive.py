@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administrator', '0013_useractivity_created_at_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserActivityArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the archived month', unique=True)),
+                ('file_path', models.CharField(max_length=500)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('action_counts', models.JSONField(blank=True, default=dict)),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'User activity archive',
+                'verbose_name_plural': 'User activity archives',
+                'ordering': ['-month'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['created_at'], name='useractivity_created_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administrator', '0014_user_activity_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['user', 'created_at'], name='activity_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['action', 'created_at'], name='activity_action_created_idx'),
+        ),
+    ]
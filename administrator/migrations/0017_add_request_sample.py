@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administrator', '0016_add_outbox_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='URL name of the view', max_length=200)),
+                ('path', models.CharField(max_length=500)),
+                ('method', models.CharField(max_length=10)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('duration_ms', models.FloatField()),
+                ('db_ms', models.FloatField()),
+                ('queries', models.PositiveIntegerField()),
+                ('response_bytes', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Request sample',
+                'verbose_name_plural': 'Request samples',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['name', 'created_at'], name='requestsample_name_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+from administrator.utils import ADMIN_GROUP_NAME, STAFF_GROUP_NAME
+
+
+def create_role_groups(apps, schema_editor):
+    Group = apps.get_model('auth', 'Group')
+    for name in (STAFF_GROUP_NAME, ADMIN_GROUP_NAME):
+        Group.objects.get_or_create(name=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administrator', '0017_add_request_sample'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_role_groups, migrations.RunPython.noop),
+    ]
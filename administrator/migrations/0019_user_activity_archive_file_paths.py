@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+def copy_file_path(apps, schema_editor):
+    UserActivityArchive = apps.get_model('administrator', 'UserActivityArchive')
+    for archive in UserActivityArchive.objects.exclude(file_path=''):
+        archive.file_paths = [archive.file_path]
+        archive.save(update_fields=['file_paths'])
+
+
+def restore_file_path(apps, schema_editor):
+    UserActivityArchive = apps.get_model('administrator', 'UserActivityArchive')
+    for archive in UserActivityArchive.objects.all():
+        archive.file_path = archive.file_paths[-1] if archive.file_paths else ''
+        archive.save(update_fields=['file_path'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administrator', '0018_create_role_groups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useractivityarchive',
+            name='file_paths',
+            field=models.JSONField(blank=True, default=list, help_text='Archive files for this month, oldest first'),
+        ),
+        migrations.RunPython(copy_file_path, restore_file_path),
+        migrations.RemoveField(
+            model_name='useractivityarchive',
+            name='file_path',
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+
+from .permissions import compile_permission_bits
 
 
 class UserProfile(models.Model):
@@ -94,6 +97,10 @@ class UserProfile(models.Model):
     can_edit_operations_voters_registration = models.BooleanField(default=False)
     can_delete_operations_voters_registration = models.BooleanField(default=False)
 
+    # Effective add/edit/delete permissions compiled from the flags above
+    # (see administrator.permissions). Recomputed on every save.
+    permission_bits = models.BigIntegerField(default=0, editable=False)
+
     class Meta:
         verbose_name = 'User profile'
         verbose_name_plural = 'User profiles'
@@ -101,6 +108,13 @@ class UserProfile(models.Model):
     def __str__(self):
         return f'Permissions for {self.user.username}'
 
+    def save(self, *args, **kwargs):
+        self.permission_bits = compile_permission_bits(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'permission_bits' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['permission_bits']
+        super().save(*args, **kwargs)
+
 
 class UserActivity(models.Model):
     """Log of user actions (login, logout, etc.) for the User Activity page."""
@@ -129,17 +143,44 @@ class UserActivity(models.Model):
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
     description = models.CharField(max_length=255, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when a buffered batch is written (see activity_log).
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'User activity'
         verbose_name_plural = 'User activities'
+        indexes = [
+            models.Index(fields=['created_at'], name='useractivity_created_idx'),
+            models.Index(fields=['user', 'created_at'], name='activity_user_created_idx'),
+            models.Index(fields=['action', 'created_at'], name='activity_action_created_idx'),
+        ]
 
     def __str__(self):
         return f'{self.get_action_display()} by {self.user_id} at {self.created_at}'
 
 
+class UserActivityArchive(models.Model):
+    """
+    One month of UserActivity moved out of the live table by `archive_user_activity`.
+    Rows are kept as gzipped JSONL on disk, one file per run (file_paths lists them all, oldest
+    first; together they hold row_count rows); per-action counts stay here for dashboard charts.
+    """
+    month = models.DateField(unique=True, help_text='First day of the archived month')
+    file_paths = models.JSONField(default=list, blank=True, help_text='Archive files for this month, oldest first')
+    row_count = models.PositiveIntegerField(default=0)
+    action_counts = models.JSONField(default=dict, blank=True)
+    archived_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-month']
+        verbose_name = 'User activity archive'
+        verbose_name_plural = 'User activity archives'
+
+    def __str__(self):
+        return f'User activity {self.month:%Y-%m} ({self.row_count} rows)'
+
+
 class PasswordChangeRequest(models.Model):
     """User requests password change. Admin confirms, then new password is sent to user's email."""
     STATUS_PENDING = 'pending'
@@ -218,6 +259,84 @@ class SentEmail(models.Model):
         return f'{self.subject} to {self.recipient_email} at {self.sent_at}'
 
 
+class RequestSample(models.Model):
+    """Sampled request timing written by RequestInstrumentationMiddleware (INSTRUMENTATION_SAMPLE_RATE)."""
+    name = models.CharField(max_length=200, help_text='URL name of the view')
+    path = models.CharField(max_length=500)
+    method = models.CharField(max_length=10)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    db_ms = models.FloatField()
+    queries = models.PositiveIntegerField()
+    response_bytes = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Request sample'
+        verbose_name_plural = 'Request samples'
+        indexes = [
+            models.Index(fields=['name', 'created_at'], name='requestsample_name_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.method} {self.name} {self.duration_ms:.0f} ms'
+
+
+class OutboxEmail(models.Model):
+    """
+    Email waiting to be sent by the outbox worker (see email_utils.send_outbox).
+    Written in the caller's transaction; moved to SentEmail once delivered.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_DEAD, 'Failed'),
+    ]
+
+    recipient_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body_plain = models.TextField(blank=True)
+    email_type = models.CharField(max_length=50, choices=SentEmail.TYPE_CHOICES, default=SentEmail.TYPE_OTHER)
+    sent_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='outbox_emails',
+    )
+    related_user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='outbox_emails_received',
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True, help_text='When a worker claimed this email')
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['next_attempt_at']
+        verbose_name = 'Outbox email'
+        verbose_name_plural = 'Outbox emails'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} to {self.recipient_email} ({self.status})'
+
+
 class AdminOTP(models.Model):
     """Email OTP for sensitive admin actions (e.g. changing passwords)."""
     PURPOSE_PASSWORD_CHANGE = 'password_change'
@@ -0,0 +1,70 @@
+"""
+Permission registry for Staff users.
+
+Each (area, section, action) triple maps to one bit. UserProfile compiles its
+boolean flags into `permission_bits` on save, so a check is a single AND.
+To add a section, add it here and add the matching can_* columns on UserProfile.
+"""
+
+PERMISSION_ACTIONS = ('add', 'edit', 'delete')
+
+PERMISSION_AREAS = {
+    'reference': ('barangay', 'position'),
+    'operations': ('coordinator', 'barangay_official', 'residents_record', 'voters_registration'),
+}
+
+
+def _build_bit_index():
+    index = {}
+    for area, sections in PERMISSION_AREAS.items():
+        for section in sections:
+            for action in PERMISSION_ACTIONS:
+                index[(area, section, action)] = 1 << len(index)
+    return index
+
+
+PERMISSION_BITS = _build_bit_index()
+
+
+def permission_bit(area, section, action):
+    """Bit for (area, section, action); 0 if the triple is not registered."""
+    return PERMISSION_BITS.get((area, section, action), 0)
+
+
+def permission_field_names():
+    """All UserProfile boolean fields edited from the permissions page."""
+    names = []
+    for area, sections in PERMISSION_AREAS.items():
+        names.append(f'can_delete_in_{area}')
+        names.append(f'can_manage_{area}')
+        for section in sections:
+            names.append(f'can_manage_{area}_{section}')
+            for action in PERMISSION_ACTIONS:
+                names.append(f'can_{action}_{area}_{section}')
+    return names
+
+
+def compile_permission_bits(flags):
+    """
+    Resolve manage-all, section and area-delete overrides into effective bits.
+    flags: a UserProfile (or anything with the can_* attributes) or a dict.
+    """
+    if isinstance(flags, dict):
+        get = flags.get
+    else:
+        def get(name, default=False):
+            return getattr(flags, name, default)
+
+    bits = 0
+    for area, sections in PERMISSION_AREAS.items():
+        manage_area = get(f'can_manage_{area}', False)
+        delete_area = get(f'can_delete_in_{area}', False)
+        for section in sections:
+            manage_section = manage_area or get(f'can_manage_{area}_{section}', False)
+            for action in PERMISSION_ACTIONS:
+                granted = manage_section or get(f'can_{action}_{area}_{section}', False)
+                if action == 'delete' and delete_area:
+                    granted = True
+                if granted:
+                    bits |= PERMISSION_BITS[(area, section, action)]
+    return bits
@@ -1,3 +1,453 @@
-from django.test import TestCase
+"""
+Permission bits against the old per-flag rules, query counts of the user lists, the activity log,
+its keyset-paged views and archive, the Performance page and the email outbox.
+"""
+import base64
+import gzip
+import io
+import itertools
+import json
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser, Group, User
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from main.instrumentation import metrics
+
+from . import activity_log, email_utils, utils, views
+from .models import OutboxEmail, SentEmail, UserActivity, UserActivityArchive, UserProfile
+from .permissions import PERMISSION_ACTIONS, PERMISSION_AREAS, compile_permission_bits, permission_bit
+
+SECTIONS = [(area, section) for area, sections in PERMISSION_AREAS.items() for section in sections]
+
+
+def per_flag_check(flags, area, section, action):
+    """The check each user_can_<action>_<area>_<section> made for a Staff profile before bits."""
+    if action == 'delete' and flags.get(f'can_delete_in_{area}'):
+        return True
+    if flags.get(f'can_manage_{area}') or flags.get(f'can_manage_{area}_{section}'):
+        return True
+    return bool(flags.get(f'can_{action}_{area}_{section}'))
+
+
+def flag_combinations(area, section):
+    """Every on/off combination of the flags that can affect (area, section)."""
+    names = [f'can_manage_{area}', f'can_delete_in_{area}', f'can_manage_{area}_{section}']
+    names += [f'can_{action}_{area}_{section}' for action in PERMISSION_ACTIONS]
+    for values in itertools.product((False, True), repeat=len(names)):
+        yield dict(zip(names, values))
+
+
+class CompiledPermissionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        staff_group, _ = Group.objects.get_or_create(name=utils.STAFF_GROUP_NAME)
+        cls.staff = User.objects.create_user('staff', password='x')
+        cls.staff.groups.add(staff_group)
+        cls.profile = UserProfile.objects.create(user=cls.staff)
+
+    def test_bits_match_per_flag_checks_for_every_combination(self):
+        for area, section in SECTIONS:
+            for flags in flag_combinations(area, section):
+                bits = compile_permission_bits(flags)
+                for action in PERMISSION_ACTIONS:
+                    with self.subTest(area=area, section=section, action=action, flags=flags):
+                        self.assertEqual(
+                            bool(bits & permission_bit(area, section, action)),
+                            per_flag_check(flags, area, section, action),
+                        )
+
+    def test_flags_of_one_section_do_not_leak_into_others(self):
+        for area, section in SECTIONS:
+            flags = {f'can_manage_{area}_{section}': True, f'can_delete_in_{area}': False}
+            bits = compile_permission_bits(flags)
+            for other_area, other_section in SECTIONS:
+                if (other_area, other_section) == (area, section):
+                    continue
+                for action in PERMISSION_ACTIONS:
+                    with self.subTest(flags=flags, other=(other_area, other_section, action)):
+                        self.assertFalse(bits & permission_bit(other_area, other_section, action))
+
+    def test_can_and_wrappers_match_per_flag_checks_for_staff(self):
+        for area, section in SECTIONS:
+            for flags in flag_combinations(area, section):
+                UserProfile.objects.filter(user=self.staff).delete()
+                UserProfile.objects.create(user=self.staff, **flags)
+                user = User.objects.get(pk=self.staff.pk)
+                for action in PERMISSION_ACTIONS:
+                    expected = per_flag_check(flags, area, section, action)
+                    wrapper = getattr(utils, f'user_can_{action}_{area}_{section}')
+                    with self.subTest(area=area, section=section, action=action, flags=flags):
+                        self.assertEqual(utils.can(user, area, section, action), expected)
+                        self.assertEqual(wrapper(user), expected)
+
+    def test_admin_and_superuser_can_everything(self):
+        admin_group, _ = Group.objects.get_or_create(name=utils.ADMIN_GROUP_NAME)
+        admin = User.objects.create_user('admin-role', password='x')
+        admin.groups.add(admin_group)
+        superuser = User.objects.create_superuser('root', password='x')
+        for user in (admin, superuser):
+            for area, section in SECTIONS:
+                for action in PERMISSION_ACTIONS:
+                    with self.subTest(user=user.username, area=area, section=section, action=action):
+                        self.assertTrue(utils.can(user, area, section, action))
+
+    def test_anonymous_and_profileless_users_can_nothing(self):
+        no_profile = User.objects.create_user('no-profile', password='x')
+        for user in (AnonymousUser(), no_profile, None):
+            for area, section in SECTIONS:
+                for action in PERMISSION_ACTIONS:
+                    with self.subTest(user=user, area=area, section=section, action=action):
+                        self.assertFalse(utils.can(user, area, section, action))
+
+    def test_unknown_triple_is_denied(self):
+        self.profile.can_manage_operations = True
+        self.profile.save()
+        self.assertFalse(utils.can(self.staff, 'operations', 'unknown', 'edit'))
+
+
+class UserListQueryTests(TestCase):
+    def setUp(self):
+        names = (utils.ADMIN_GROUP_NAME, utils.STAFF_GROUP_NAME)
+        self.groups = [Group.objects.get_or_create(name=name)[0] for name in names]
+        self.client.force_login(User.objects.create_superuser('root', password='x'))
+        self.created = 0
+
+    def _add_users(self, count):
+        for i in range(self.created, self.created + count):
+            user = User.objects.create_user(f'user{i:03d}', is_superuser=i % 5 == 0)
+            user.groups.add(self.groups[i % 2])
+            if i % 3:
+                UserProfile.objects.create(
+                    user=user, can_delete_in_operations=i % 3 == 1, can_delete_in_reference=True,
+                )
+        self.created += count
+
+    def _queries(self, name):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f'administrator:{name}'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f'user{self.created - 1:03d}')
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_users(self):
+        for name in ('user_accounts', 'user_permissions'):
+            with self.subTest(page=name):
+                User.objects.exclude(username='root').delete()
+                self.created = 0
+                self._add_users(5)
+                few = self._queries(name)
+                self._add_users(10)
+                self.assertEqual(self._queries(name), few)
+
+
+@override_settings(ACTIVITY_LOG_BUFFERED=True, ACTIVITY_LOG_BATCH_SIZE=3, ACTIVITY_LOG_FLUSH_SECONDS=60)
+class ActivityBufferTests(TestCase):
+    def setUp(self):
+        self.buffer = activity_log.ActivityBuffer()
+        self.enterContext(mock.patch.object(activity_log, '_buffer', self.buffer))
+        self.enterContext(mock.patch.object(activity_log.ActivityBuffer, '_ensure_timer'))
+
+    def _activity(self, description='x'):
+        return UserActivity(action=UserActivity.ACTION_CREATE, description=description)
+
+    def test_rows_wait_in_the_buffer_until_flushed(self):
+        self.buffer.add(self._activity('a'))
+        self.buffer.add(self._activity('b'))
+        self.assertEqual(len(self.buffer), 2)
+        self.assertFalse(UserActivity.objects.exists())
+        self.assertEqual(activity_log.flush_activity_log(), 2)
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(sorted(UserActivity.objects.values_list('description', flat=True)), ['a', 'b'])
+
+    def test_batch_size_triggers_one_bulk_insert(self):
+        for i in range(2):
+            self.buffer.add(self._activity(str(i)))
+        with self.assertNumQueries(1):
+            self.buffer.add(self._activity('2'))
+        self.assertEqual(UserActivity.objects.count(), 3)
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_rows_are_queued_only_when_the_transaction_commits(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            activity_log.record_activity(None, UserActivity.ACTION_UPDATE, 'edited')
+        self.assertEqual(len(self.buffer), 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(len(self.buffer), 1)
+
+    def test_rolled_back_transaction_queues_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    activity_log.record_activity(None, UserActivity.ACTION_UPDATE, 'edited')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_failed_batch_is_retried_row_by_row(self):
+        self.buffer.add(self._activity('kept'))
+        self.buffer.add(self._activity('bad'))
+        failures = [None, DatabaseError('bad row')]
+        with mock.patch.object(UserActivity.objects, 'bulk_create', side_effect=DatabaseError('down')), \
+                mock.patch.object(UserActivity, 'save', autospec=True, side_effect=failures) as save, \
+                self.assertLogs('administrator.activity_log', 'ERROR') as logs:
+            self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(save.call_count, 2)
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(len(self.buffer), 0)
+
+
+@override_settings(ACTIVITY_LOG_BUFFERED=True, ACTIVITY_LOG_BATCH_SIZE=100, ACTIVITY_LOG_FLUSH_SECONDS=0.1)
+class ActivityTimerTests(TransactionTestCase):
+    def test_timer_flushes_then_closes_its_connection(self):
+        buffer = activity_log.ActivityBuffer()
+        with mock.patch.object(activity_log.connections, 'close_all', wraps=activity_log.connections.close_all) as close:
+            buffer.add(UserActivity(action=UserActivity.ACTION_CREATE, description='timed'))
+            timer = buffer._timer
+            self.assertIsNotNone(timer)
+            timer.join(timeout=5)
+        self.assertFalse(timer.is_alive())
+        self.assertIsNone(buffer._timer)
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(list(UserActivity.objects.values_list('description', flat=True)), ['timed'])
+        close.assert_called_once_with()
+
+
+class ArchiveUserActivityTests(TestCase):
+    def setUp(self):
+        self.root = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        old = timezone.now() - timedelta(days=400)
+        UserActivity.objects.bulk_create(
+            UserActivity(action=UserActivity.ACTION_CREATE, description=str(i), created_at=old) for i in range(5)
+        )
+
+    def _archive(self):
+        call_command('archive_user_activity', months=1, output_dir=str(self.root), stdout=io.StringIO())
+
+    def _archived_ids(self):
+        ids = []
+        for path in self.root.glob('*.jsonl.gz'):
+            with gzip.open(path, 'rt', encoding='utf-8') as fh:
+                ids += [json.loads(line)['id'] for line in fh]
+        return sorted(ids)
+
+    def test_rerun_after_failed_delete_does_not_duplicate_rows(self):
+        expected = sorted(UserActivity.objects.values_list('pk', flat=True))
+        with mock.patch.object(QuerySet, 'delete', side_effect=DatabaseError('down')):
+            with self.assertRaises(DatabaseError):
+                self._archive()
+        self.assertEqual(UserActivity.objects.count(), 5)
+        self.assertFalse(UserActivityArchive.objects.exists())
+        self.assertEqual(self._archived_ids(), expected)  # the file was written before the failure
+
+        self._archive()
+        self.assertEqual(self._archived_ids(), expected)
+        self.assertFalse(UserActivity.objects.exists())
+        archive = UserActivityArchive.objects.get()
+        self.assertEqual(archive.row_count, 5)
+        self.assertEqual(archive.file_paths, [str(path) for path in self.root.glob('*.jsonl.gz')])
+        self.assertEqual(archive.action_counts, {UserActivity.ACTION_CREATE: 5})
+        self.assertEqual(list(self.root.glob('*.tmp')), [])
+
+    def test_rows_added_later_go_to_a_second_file(self):
+        self._archive()
+        first_run = UserActivityArchive.objects.get().file_paths
+        late = UserActivity.objects.create(
+            action=UserActivity.ACTION_DELETE, created_at=timezone.now() - timedelta(days=400),
+        )
+        self._archive()
+        self.assertEqual(len(list(self.root.glob('*.jsonl.gz'))), 2)
+        self.assertIn(late.pk, self._archived_ids())
+        archive = UserActivityArchive.objects.get()
+        self.assertEqual(archive.row_count, 6)
+        self.assertEqual(len(archive.file_paths), 2)
+        self.assertEqual(archive.file_paths[0], first_run[0])  # the first file is still on record
+        self.assertTrue(archive.file_paths[1].endswith(f'-{late.pk}.jsonl.gz'))
+
+
+class ActivityPageTests(TestCase):
+    def setUp(self):
+        self.clerk = User.objects.create_user('clerk')
+        self.client.force_login(User.objects.create_superuser('root', password='x'))
+        self.url = reverse('administrator:user_activity_api')
+
+    def _rows(self, *moments):
+        return UserActivity.objects.bulk_create(
+            UserActivity(user=self.clerk, action=UserActivity.ACTION_UPDATE, created_at=moment) for moment in moments
+        )
+
+    def _get(self, **params):
+        return self.client.get(self.url, {'user': 'clerk', **params}).json()
+
+    def test_cursor_walks_every_row_once_across_tied_timestamps(self):
+        base = timezone.now().replace(microsecond=0)
+        count = views.ACTIVITY_PAGE_SIZE * 2 + 5
+        self._rows(*(base - timedelta(seconds=i // 3) for i in range(count)))  # three rows per timestamp
+        seen, pages, params = [], 0, {}
+        while True:
+            page = self._get(**params)
+            seen += [(row['created_at'], row['id']) for row in page['results']]
+            pages += 1
+            if not page['next_cursor']:
+                break
+            params = {'cursor': page['next_cursor']}
+        self.assertEqual(pages, 3)
+        self.assertEqual(len(seen), count)
+        self.assertEqual(len(set(seen)), count)
+        self.assertEqual(seen, sorted(seen, key=lambda row: (datetime.fromisoformat(row[0]), row[1]), reverse=True))
+
+    def test_date_filter_is_half_open(self):
+        midnight = timezone.make_aware(datetime(2026, 3, 10))
+        inside = self._rows(midnight, midnight + timedelta(days=1, microseconds=-1))
+        self._rows(midnight - timedelta(microseconds=1), midnight + timedelta(days=1))
+        page = self._get(date='2026-03-10')
+        self.assertEqual(sorted(row['id'] for row in page['results']), sorted(row.pk for row in inside))
+        self.assertEqual(len(self._get(date='03/10/2026')['results']), 2)
+
+    def test_bad_cursor_falls_back_to_first_page(self):
+        self._rows(*(timezone.now() - timedelta(seconds=i) for i in range(3)))
+        first = self._get()['results']
+        naive = base64.urlsafe_b64encode(f'{datetime(2026, 1, 1).isoformat()}|5'.encode()).decode()
+        for cursor in ('garbage', naive, base64.urlsafe_b64encode(b'2026-01-01T00:00:00+00:00|x').decode()):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self._get(cursor=cursor)['results'], first)
+        response = self.client.get(reverse('administrator:user_activity'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cursor'], '')
+
+
+class PerformancePageTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.url = reverse('administrator:performance')
+
+    def test_admin_sees_percentiles_and_slowest_sql(self):
+        for ms in range(1, 101):
+            metrics.record_request('reports:summary', ms, ms / 4, 3, 2048, 200)
+        metrics.record_sql('SELECT "slowest"', 90.0, 'reports:summary')
+        self.client.force_login(User.objects.create_superuser('root', password='x'))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        row = next(row for row in response.context['endpoints'] if row['name'] == 'reports:summary')
+        self.assertEqual((row['count'], row['avg_queries'], row['avg_kb']), (100, 3, 2))
+        self.assertLessEqual(row['p50'], row['p95'])
+        self.assertLessEqual(row['p95'], row['p99'])
+        self.assertLessEqual(row['p99'], 100)
+        self.assertContains(response, f'<td class="num">{row["p95"]:.0f}</td>', html=True)
+        self.assertContains(response, 'SELECT &quot;slowest&quot;')
+
+        self.client.post(self.url, {'reset': '1'})
+        self.assertNotIn('reports:summary', [row['name'] for row in metrics.endpoints()])  # only the POST itself
+
+    def test_staff_and_anonymous_users_are_turned_away(self):
+        metrics.record_request('reports:summary', 10, 1, 1, 100, 200)
+        self.assertNotEqual(self.client.get(self.url).status_code, 200)
+        self.client.force_login(User.objects.create_user('clerk', password='x'))
+        response = self.client.get(self.url)
+        self.assertRedirects(response, reverse('mainapplication:dashboard'), fetch_redirect_response=False)
+        self.client.post(self.url, {'reset': '1'})
+        self.assertIn('reports:summary', [row['name'] for row in metrics.endpoints()])
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    EMAIL_OUTBOX_AUTOSEND=False, EMAIL_OUTBOX_MAX_ATTEMPTS=3, EMAIL_OUTBOX_RETRY_SECONDS=60,
+)
+class EmailOutboxTests(TestCase):
+    def _queue(self, **kwargs):
+        email_utils.send_and_log_email('resident@example.com', 'Subject', 'Body')
+        email = OutboxEmail.objects.latest('pk')
+        if kwargs:
+            OutboxEmail.objects.filter(pk=email.pk).update(**kwargs)
+            email.refresh_from_db()
+        return email
+
+    def test_claim_skips_locked_rows_and_marks_the_batch_sending(self):
+        due = self._queue()
+        self._queue(next_attempt_at=timezone.now() + timedelta(hours=1))
+        self._queue(status=OutboxEmail.STATUS_SENDING, locked_at=timezone.now())
+        stale = self._queue(status=OutboxEmail.STATUS_SENDING, locked_at=timezone.now() - timedelta(hours=1))
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True,
+                               side_effect=QuerySet.select_for_update) as select_for_update:
+            claimed = email_utils._claim_batch(10)
+        self.assertEqual(select_for_update.call_args.kwargs, {'skip_locked': True})
+        self.assertEqual(sorted(e.pk for e in claimed), sorted([due.pk, stale.pk]))
+        self.assertTrue(all(e.status == OutboxEmail.STATUS_SENDING and e.locked_at for e in claimed))
+        self.assertEqual(email_utils._claim_batch(10), [])
+
+    def test_sent_email_is_logged(self):
+        email = self._queue()
+        self.assertEqual(email_utils.send_outbox(), (1, 0))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboxEmail.STATUS_SENT, 1))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertTrue(SentEmail.objects.filter(recipient_email='resident@example.com').exists())
+
+    def test_failures_back_off_exponentially_then_go_dead(self):
+        email = self._queue()
+        with mock.patch.object(EmailMessage, 'send', side_effect=OSError('smtp down')):
+            for attempt, delay in ((1, 60), (2, 120)):
+                before = timezone.now()
+                self.assertEqual(email_utils.send_outbox(), (0, 1))
+                email.refresh_from_db()
+                self.assertEqual((email.status, email.attempts), (OutboxEmail.STATUS_PENDING, attempt))
+                self.assertEqual(email.last_error, 'smtp down')
+                self.assertAlmostEqual(
+                    (email.next_attempt_at - before).total_seconds(), delay, delta=5,
+                )
+                self.assertEqual(email_utils.send_outbox(), (0, 0))  # not due yet
+                OutboxEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+            self.assertEqual(email_utils.send_outbox(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboxEmail.STATUS_DEAD, 3))
+        self.assertEqual(email_utils.send_outbox(), (0, 0))
+        self.assertFalse(SentEmail.objects.exists())
+
+    def test_request_during_a_drain_is_not_lost(self):
+        calls = []
+
+        def send_outbox():
+            calls.append(1)
+            if len(calls) == 1:
+                # A row commits while the drain holds the lock and has just found nothing due.
+                email_utils._send_outbox_in_background()
+            return 0, 0
+
+        self.assertTrue(email_utils._drain_lock.acquire(blocking=False))
+        with mock.patch.object(email_utils, 'send_outbox', side_effect=send_outbox), \
+                mock.patch.object(email_utils.threading, 'Thread') as thread, \
+                mock.patch.object(email_utils.connections, 'close_all'):
+            email_utils._drain()
+        thread.assert_not_called()
+        self.assertEqual(len(calls), 2)
+        self.assertFalse(email_utils._drain_lock.locked())
+
+
+class RoleChangeTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('root', password='x')
+        self.user = User.objects.create_user('clerk', password='x')
+        self.client.force_login(self.admin)
+
+    def test_role_change_creates_missing_groups(self):
+        Group.objects.all().delete()
+        url = reverse('administrator:user_permissions_edit', args=[self.user.pk])
+        self.client.post(url, {'role': 'admin'})
+        self.assertTrue(utils.user_is_admin(self.user))
+        self.client.post(url, {'role': 'staff'})
+        self.assertFalse(utils.user_is_admin(self.user))
+        self.assertTrue(utils.user_is_staff_role(self.user))
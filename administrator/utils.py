@@ -1,6 +1,9 @@
 """Permission helpers for Staff vs Admin roles and unrestrict delete per area."""
 from django.conf import settings
 from django.contrib.auth.models import Group
+from django.db.models import Exists, OuterRef, Q
+
+from .permissions import permission_bit
 
 
 ADMIN_GROUP_NAME = 'Admin'
@@ -19,19 +22,28 @@ def is_fixed_admin_user(user):
     return user.username == get_fixed_admin_username()
 
 
-def _ensure_groups():
-    """Create Staff and Admin groups if they don't exist."""
-    Group.objects.get_or_create(name=STAFF_GROUP_NAME)
-    Group.objects.get_or_create(name=ADMIN_GROUP_NAME)
+def with_roles(queryset):
+    """
+    Annotate a User queryset with is_admin_role / is_staff_role and load userprofile,
+    so list pages resolve roles and permission flags in one query instead of per user.
+    """
+    groups = Group.objects.filter(user=OuterRef('pk'))
+    return queryset.select_related('userprofile').annotate(
+        is_admin_role=Q(is_superuser=True) | Exists(groups.filter(name=ADMIN_GROUP_NAME)),
+        is_staff_role=Exists(groups.filter(name=STAFF_GROUP_NAME)),
+    )
 
 
 def user_is_admin(user):
     """True if user is in Admin group or is superuser."""
     if not user or not user.is_authenticated:
         return False
+    if hasattr(user, 'is_admin_role'):
+        # Already resolved by with_roles()
+        return user.is_admin_role
     if user.is_superuser:
         return True
-    _ensure_groups()
+    # A missing group simply matches nothing: no get_or_create writes on read-only requests.
     return user.groups.filter(name=ADMIN_GROUP_NAME).exists()
 
 
@@ -39,7 +51,6 @@ def user_is_staff_role(user):
     """True if user is in Staff group (and not Admin)."""
     if not user or not user.is_authenticated:
         return False
-    _ensure_groups()
     return user.groups.filter(name=STAFF_GROUP_NAME).exists()
 
 
@@ -80,253 +91,92 @@ def _get_profile(user):
         return None
 
 
-# === Reference – per-section, per-action ==========================
-
-def user_can_add_reference_barangay(user):
+def can(user, area, section, action):
+    """
+    True if user may perform action ('add', 'edit', 'delete') on a section of an area,
+    e.g. can(user, 'operations', 'residents_record', 'edit').
+    Admin can always. Staff are checked against the compiled UserProfile.permission_bits.
+    """
     if not user or not user.is_authenticated:
         return False
-    if user_is_admin(user):
-        return True
+    bit = permission_bit(area, section, action)
     profile = _get_profile(user)
-    if not profile:
-        return False
-    # Main toggles (Reference all / Barangay enable) imply full access
-    if profile.can_manage_reference or profile.can_manage_reference_barangay:
+    if profile is not None and profile.permission_bits & bit:
         return True
-    return profile.can_add_reference_barangay
+    return user_is_admin(user)
+
+
+# === Reference – per-section, per-action ==========================
+
+def user_can_add_reference_barangay(user):
+    return can(user, 'reference', 'barangay', 'add')
 
 
 def user_can_edit_reference_barangay(user):
-    if not user or not user.is_authenticated:
-        return False
-    if user_is_admin(user):
-        return True
-    profile = _get_profile(user)
-    if not profile:
-        return False
-    if profile.can_manage_reference or profile.can_manage_reference_barangay:
-        return True
-    return profile.can_edit_reference_barangay
+    return can(user, 'reference', 'barangay', 'edit')
 
 
 def user_can_delete_reference_barangay(user):
-    if not user or not user.is_authenticated:
-        return False
-    if user_is_admin(user):
-        return True
-    profile = _get_profile(user)
-    if not profile:
-        return False
-    # Area-level delete flag still honoured as a fallback
-    if profile.can_delete_in_reference:
-        return True
-    if profile.can_manage_reference or profile.can_manage_reference_barangay:
-        return True
-    return profile.can_delete_reference_barangay
+    return can(user, 'reference', 'barangay', 'delete')
 
 
 def user_can_add_reference_position(user):
-    if not user or not user.is_authenticated:
-        return False
-    if user_is_admin(user):
-        return True
-    profile = _get_profile(user)
-    if not profile:
-        return False
-    if profile.can_manage_reference or profile.can_manage_reference_position:
-        return True
-    return profile.can_add_reference_position
+    return can(user, 'reference', 'position', 'add')
 
 
 def user_can_edit_reference_position(user):
-    if not user or not user.is_authenticated:
-        return False
-    if user_is_admin(user):
-        return True
-    profile = _get_profile(user)
-    if not profile:
-        return False
-    if profile.can_manage_reference or profile.can_manage_reference_position:
-        return True
-    return profile.can_edit_reference_position
+    return can(user, 'reference', 'position', 'edit')
 
 
 def user_can_delete_reference_position(user):
-    if not user or not user.is_authenticated:
-        return False
-    if user_is_admin(user):
-        return True
-    profile = _get_profile(user)
-    if not profile:
-        return False
-    if profile.can_delete_in_reference:
-        return True
-    if profile.can_manage_reference or profile.can_manage_reference_position:
-        return True
-    return profile.can_delete_reference_position
+    return can(user, 'reference', 'position', 'delete')
 
 
 # === Operations – per-section, per-action =========================
 
 def user_can_add_operations_coordinator(user):
-    if not user or not user.is_authenticated:
-        return False
-    if user_is_admin(user):
-        return True
-    profile = _get_profile(user)
-    if not profile:
-        return False
-    if profile.can_manage_operations or profile.can_manage_operations_coordinator:
-        return True
-    return profile.can_add_operations_coordinator
+    return can(user, 'operations', 'coordinator', 'add')
 
 
 def user_can_edit_operations_coordinator(user):
-    if not user or not user.is_authenticated:
-        return False
-    if user_is_admin(user):
-        return True
-    profile = _get_profile(user)
-    if not profile:
-        return False
-    if profile.can_manage_operations or profile.can_manage_operations_coordinator:
-        return True
-    return profile.can_edit_operations_coordinator
+    return can(user, 'operations', 'coordinator', 'edit')
 
 
 def user_can_delete_operations_coordinator(user):
-    if not user or not user.is_authenticated:
-        return False
-    if user_is_admin(user):
-        return True
-    profile = _get_profile(user)
-    if not profile:
-        return False
-    if profile.can_delete_in_operations:
-        return True
-    if profile.can_manage_operations or profile.can_manage_operations_coordinator:
-        return True
-    return profile.can_delete_operations_coordinator
+    return can(user, 'operations', 'coordinator', 'delete')
 
 
 def user_can_add_operations_barangay_official(user):
-    if not user or not user.is_authenticated:
-        return False
-    if user_is_admin(user):
-        return True
-    profile = _get_profile(user)
-    if not profile:
-        return False
-    if profile.can_manage_operations or profile.can_manage_operations_barangay_official:
-        return True
-    return profile.can_add_operations_barangay_official
+    return can(user, 'operations', 'barangay_official', 'add')
 
 
 def user_can_edit_operations_barangay_official(user):
-    if not user or not user.is_authenticated:
-        return False
-    if user_is_admin(user):
-        return True
-    profile = _get_profile(user)
-    if not profile:
-        return False
-    if profile.can_manage_operations or profile.can_manage_operations_barangay_official:
-        return True
-    return profile.can_edit_operations_barangay_official
+    return can(user, 'operations', 'barangay_official', 'edit')
 
 
 def user_can_delete_operations_barangay_official(user):
-    if not user or not user.is_authenticated:
-        return False
-    if user_is_admin(user):
-        return True
-    profile = _get_profile(user)
-    if not profile:
-        return False
-    if profile.can_delete_in_operations:
-        return True
-    if profile.can_manage_operations or profile.can_manage_operations_barangay_official:
-        return True
-    return profile.can_delete_operations_barangay_official
+    return can(user, 'operations', 'barangay_official', 'delete')
 
 
 def user_can_add_operations_residents_record(user):
-    if not user or not user.is_authenticated:
-        return False
-    if user_is_admin(user):
-        return True
-    profile = _get_profile(user)
-    if not profile:
-        return False
-    if profile.can_manage_operations or profile.can_manage_operations_residents_record:
-        return True
-    return profile.can_add_operations_residents_record
+    return can(user, 'operations', 'residents_record', 'add')
 
 
 def user_can_edit_operations_residents_record(user):
-    if not user or not user.is_authenticated:
-        return False
-    if user_is_admin(user):
-        return True
-    profile = _get_profile(user)
-    if not profile:
-        return False
-    if profile.can_manage_operations or profile.can_manage_operations_residents_record:
-        return True
-    return profile.can_edit_operations_residents_record
+    return can(user, 'operations', 'residents_record', 'edit')
 
 
 def user_can_delete_operations_residents_record(user):
-    if not user or not user.is_authenticated:
-        return False
-    if user_is_admin(user):
-        return True
-    profile = _get_profile(user)
-    if not profile:
-        return False
-    if profile.can_delete_in_operations:
-        return True
-    if profile.can_manage_operations or profile.can_manage_operations_residents_record:
-        return True
-    return profile.can_delete_operations_residents_record
+    return can(user, 'operations', 'residents_record', 'delete')
 
 
 def user_can_add_operations_voters_registration(user):
-    if not user or not user.is_authenticated:
-        return False
-    if user_is_admin(user):
-        return True
-    profile = _get_profile(user)
-    if not profile:
-        return False
-    if profile.can_manage_operations or profile.can_manage_operations_voters_registration:
-        return True
-    return profile.can_add_operations_voters_registration
+    return can(user, 'operations', 'voters_registration', 'add')
 
 
 def user_can_edit_operations_voters_registration(user):
-    if not user or not user.is_authenticated:
-        return False
-    if user_is_admin(user):
-        return True
-    profile = _get_profile(user)
-    if not profile:
-        return False
-    if profile.can_manage_operations or profile.can_manage_operations_voters_registration:
-        return True
-    return profile.can_edit_operations_voters_registration
+    return can(user, 'operations', 'voters_registration', 'edit')
 
 
 def user_can_delete_operations_voters_registration(user):
-    if not user or not user.is_authenticated:
-        return False
-    if user_is_admin(user):
-        return True
-    profile = _get_profile(user)
-    if not profile:
-        return False
-    if profile.can_delete_in_operations:
-        return True
-    if profile.can_manage_operations or profile.can_manage_operations_voters_registration:
-        return True
-    return profile.can_delete_operations_voters_registration
+    return can(user, 'operations', 'voters_registration', 'delete')
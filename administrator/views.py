@@ -3,14 +3,23 @@ from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from django.contrib.auth.hashers import make_password, check_password
+import base64
 import secrets
+from datetime import datetime, time, timedelta
+from urllib.parse import urlencode
+
+from main.instrumentation import db_pool_stats, metrics
+from main.transactions import atomic_view
 
 from .models import UserProfile, UserActivity, SentEmail, PasswordChangeRequest, AdminOTP
-from .utils import ADMIN_GROUP_NAME, STAFF_GROUP_NAME, user_is_admin, is_fixed_admin_user, get_fixed_admin_username
-from .activity_log import log_activity
+from .utils import ADMIN_GROUP_NAME, STAFF_GROUP_NAME, user_is_admin, is_fixed_admin_user, get_fixed_admin_username, with_roles
+from .permissions import compile_permission_bits, permission_field_names
+from .activity_log import log_activity, flush_activity_log
 from .email_utils import send_and_log_email
 
 User = get_user_model()
@@ -86,9 +95,9 @@ def sent_emails(request):
                 req.processed_by = request.user
                 req.save()
                 log_activity(request, UserActivity.ACTION_UPDATE, f'Approved password change for {user.username}, sent new password to email.')
-                messages.success(request, f'New password sent to {user.username} ({user_email}).')
+                messages.success(request, f'New password is being sent to {user.username} ({user_email}).')
             else:
-                messages.error(request, 'Failed to send email. Please try again.')
+                messages.error(request, 'Failed to queue email. Please try again.')
 
         reject_id = request.POST.get('reject_id')
         if reject_id:
@@ -116,6 +125,7 @@ def sent_emails(request):
     return render(request, 'administrator/sent_emails.html', {'items': items})
 
 
+@atomic_view
 @admin_required
 def mark_request_read(request, pk):
     """Mark a password change request as read. Uses GET to avoid CSRF for fetch."""
@@ -152,9 +162,9 @@ def system_policy(request):
 @admin_required
 def user_accounts(request):
     """User accounts management – list all registered users."""
-    users = User.objects.all().order_by('-date_joined')
+    users = with_roles(User.objects.all()).order_by('-date_joined')
     users_with_roles = [
-        {'user': u, 'role': 'Admin' if user_is_admin(u) else 'Staff', 'is_admin': user_is_admin(u)}
+        {'user': u, 'role': 'Admin' if u.is_admin_role else 'Staff', 'is_admin': u.is_admin_role}
         for u in users
     ]
     can_manage = user_is_admin(request.user)
@@ -168,17 +178,17 @@ def user_accounts(request):
 @admin_required
 def user_permissions(request):
     """List users with their role and delete permissions; link to edit."""
-    users = User.objects.all().order_by('username')
+    users = with_roles(User.objects.all()).order_by('username')
     fixed_username = get_fixed_admin_username()
     rows = []
     for u in users:
-        is_admin = user_is_admin(u)
+        is_admin = u.is_admin_role
         role = 'Admin' if is_admin else 'Staff'
         try:
             profile = u.userprofile
             can_ops = profile.can_delete_in_operations
             can_ref = profile.can_delete_in_reference
-        except Exception:
+        except UserProfile.DoesNotExist:
             can_ops = can_ref = False
         rows.append({
             'user': u,
@@ -190,6 +200,7 @@ def user_permissions(request):
     return render(request, 'administrator/user_permissions.html', {'rows': rows})
 
 
+@atomic_view
 @admin_required
 @require_http_methods(['GET', 'POST'])
 def user_permissions_edit(request, pk):
@@ -202,106 +213,29 @@ def user_permissions_edit(request, pk):
         'can_delete_in_operations': False,
         'can_delete_in_reference': False,
     })
-    admin_group = None
-    staff_group = None
-    try:
-        from django.contrib.auth.models import Group
-        admin_group = Group.objects.filter(name=ADMIN_GROUP_NAME).first()
-        staff_group = Group.objects.filter(name=STAFF_GROUP_NAME).first()
-    except Exception:
-        pass
 
     if request.method == 'POST':
         role = request.POST.get('role', 'staff').strip().lower()
-        # Area delete flags (legacy – still supported if you keep them in the form)
-        can_ops = request.POST.get('can_delete_in_operations') == 'on'
-        can_ref = request.POST.get('can_delete_in_reference') == 'on'
-
-        # Section-level toggles
-        manage_ref_all = request.POST.get('can_manage_reference') == 'on'
-        manage_ref_barangay = request.POST.get('can_manage_reference_barangay') == 'on'
-        manage_ref_position = request.POST.get('can_manage_reference_position') == 'on'
-
-        manage_ops_all = request.POST.get('can_manage_operations') == 'on'
-        manage_ops_coord = request.POST.get('can_manage_operations_coordinator') == 'on'
-        manage_ops_bo = request.POST.get('can_manage_operations_barangay_official') == 'on'
-        manage_ops_res = request.POST.get('can_manage_operations_residents_record') == 'on'
-        manage_ops_voters = request.POST.get('can_manage_operations_voters_registration') == 'on'
-
-        # Fine-grained actions per subsection
-        # Reference → Barangay
-        add_ref_barangay = request.POST.get('can_add_reference_barangay') == 'on'
-        edit_ref_barangay = request.POST.get('can_edit_reference_barangay') == 'on'
-        delete_ref_barangay = request.POST.get('can_delete_reference_barangay') == 'on'
-
-        # Reference → Position
-        add_ref_position = request.POST.get('can_add_reference_position') == 'on'
-        edit_ref_position = request.POST.get('can_edit_reference_position') == 'on'
-        delete_ref_position = request.POST.get('can_delete_reference_position') == 'on'
-
-        # Operations → Coordinator
-        add_ops_coord = request.POST.get('can_add_operations_coordinator') == 'on'
-        edit_ops_coord = request.POST.get('can_edit_operations_coordinator') == 'on'
-        delete_ops_coord = request.POST.get('can_delete_operations_coordinator') == 'on'
-
-        # Operations → Barangay Official
-        add_ops_bo = request.POST.get('can_add_operations_barangay_official') == 'on'
-        edit_ops_bo = request.POST.get('can_edit_operations_barangay_official') == 'on'
-        delete_ops_bo = request.POST.get('can_delete_operations_barangay_official') == 'on'
-
-        # Operations → Residents Record
-        add_ops_res = request.POST.get('can_add_operations_residents_record') == 'on'
-        edit_ops_res = request.POST.get('can_edit_operations_residents_record') == 'on'
-        delete_ops_res = request.POST.get('can_delete_operations_residents_record') == 'on'
-
-        # Operations → Voters Registration
-        add_ops_voters = request.POST.get('can_add_operations_voters_registration') == 'on'
-        edit_ops_voters = request.POST.get('can_edit_operations_voters_registration') == 'on'
-        delete_ops_voters = request.POST.get('can_delete_operations_voters_registration') == 'on'
-
-        if admin_group and staff_group:
-            if role == 'admin':
-                user.groups.remove(staff_group)
-                user.groups.add(admin_group)
-            else:
-                user.groups.remove(admin_group)
-                user.groups.add(staff_group)
-
-        profile.can_delete_in_operations = can_ops
-        profile.can_delete_in_reference = can_ref
-        profile.can_manage_reference = manage_ref_all
-        profile.can_manage_reference_barangay = manage_ref_barangay
-        profile.can_manage_reference_position = manage_ref_position
-        profile.can_manage_operations = manage_ops_all
-        profile.can_manage_operations_coordinator = manage_ops_coord
-        profile.can_manage_operations_barangay_official = manage_ops_bo
-        profile.can_manage_operations_residents_record = manage_ops_res
-        profile.can_manage_operations_voters_registration = manage_ops_voters
-
-        profile.can_add_reference_barangay = add_ref_barangay
-        profile.can_edit_reference_barangay = edit_ref_barangay
-        profile.can_delete_reference_barangay = delete_ref_barangay
-
-        profile.can_add_reference_position = add_ref_position
-        profile.can_edit_reference_position = edit_ref_position
-        profile.can_delete_reference_position = delete_ref_position
-
-        profile.can_add_operations_coordinator = add_ops_coord
-        profile.can_edit_operations_coordinator = edit_ops_coord
-        profile.can_delete_operations_coordinator = delete_ops_coord
-
-        profile.can_add_operations_barangay_official = add_ops_bo
-        profile.can_edit_operations_barangay_official = edit_ops_bo
-        profile.can_delete_operations_barangay_official = delete_ops_bo
-
-        profile.can_add_operations_residents_record = add_ops_res
-        profile.can_edit_operations_residents_record = edit_ops_res
-        profile.can_delete_operations_residents_record = delete_ops_res
-
-        profile.can_add_operations_voters_registration = add_ops_voters
-        profile.can_edit_operations_voters_registration = edit_ops_voters
-        profile.can_delete_operations_voters_registration = delete_ops_voters
-        profile.save()
+        # Area delete flags (legacy – still supported if you keep them in the form),
+        # section toggles and fine-grained actions: every can_* checkbox on the page.
+        flags = {name: request.POST.get(name) == 'on' for name in permission_field_names()}
+
+        # The groups come with migration 0018; recreate them if they were deleted since.
+        _ensure_groups()
+        admin_group = Group.objects.get(name=ADMIN_GROUP_NAME)
+        staff_group = Group.objects.get(name=STAFF_GROUP_NAME)
+        if role == 'admin':
+            user.groups.remove(staff_group)
+            user.groups.add(admin_group)
+        else:
+            user.groups.remove(admin_group)
+            user.groups.add(staff_group)
+
+        # Single UPDATE for all flags plus the compiled bitmask (update() skips save()).
+        UserProfile.objects.filter(pk=profile.pk).update(
+            permission_bits=compile_permission_bits(flags),
+            **flags,
+        )
         log_activity(request, UserActivity.ACTION_UPDATE, f'Updated permissions for user "{user.username}".')
         messages.success(request, f'Permissions for {user.username} updated.')
         return redirect('administrator:user_permissions')
@@ -311,8 +245,6 @@ def user_permissions_edit(request, pk):
         'user': user,
         'profile': profile,
         'is_admin': is_admin,
-        'admin_group': admin_group,
-        'staff_group': staff_group,
     })
 
 
@@ -498,61 +430,146 @@ def user_edit(request, pk):
     return render(request, 'administrator/user_edit.html', {'target_user': target_user, 'is_fixed_admin': is_fixed})
 
 
-@admin_required
-def user_activity(request):
-    """User activity logs – show real activity from UserActivity model."""
-    activities_qs = UserActivity.objects.select_related('user').all()
+ACTIVITY_PAGE_SIZE = 100
+
 
-    # Filters from query params
+def _encode_activity_cursor(activity):
+    raw = f'{activity.created_at.isoformat()}|{activity.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_activity_cursor(cursor):
+    """Return (created_at, pk) from a cursor string, or None if it is missing or invalid."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_raw, pk_raw = raw.rsplit('|', 1)
+        created_at = datetime.fromisoformat(created_raw)
+        if timezone.is_naive(created_at):
+            return None
+        return created_at, int(pk_raw)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _parse_activity_date(date_str):
+    """HTML date input typically sends YYYY-MM-DD; fall back to MM/DD/YYYY if manually typed."""
+    for fmt in ('%Y-%m-%d', '%m/%d/%Y'):
+        try:
+            return datetime.strptime(date_str, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _activity_page(request):
+    """
+    Filter UserActivity from query params and return one keyset page, newest first.
+    Pages are walked with ?cursor=<next_cursor>; the date filter is a half-open
+    [day, day + 1) range so the (user, created_at) / (action, created_at) indexes apply.
+    """
     username = request.GET.get('user') or ''
     action = request.GET.get('action') or ''
     date_str = request.GET.get('date') or ''
+    cursor = request.GET.get('cursor') or ''
 
+    activities_qs = UserActivity.objects.select_related('user')
     if username:
         activities_qs = activities_qs.filter(user__username=username)
-
     if action:
         activities_qs = activities_qs.filter(action=action)
+    day = _parse_activity_date(date_str) if date_str else None
+    if day:
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        activities_qs = activities_qs.filter(created_at__gte=start, created_at__lt=start + timedelta(days=1))
+
+    position = _decode_activity_cursor(cursor)
+    if position:
+        created_at, pk = position
+        activities_qs = activities_qs.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+        )
 
-    if date_str:
-        # HTML date input typically sends YYYY-MM-DD; keep it simple and safe
-        from datetime import datetime
+    page = list(activities_qs.order_by('-created_at', '-pk')[:ACTIVITY_PAGE_SIZE + 1])
+    has_next = len(page) > ACTIVITY_PAGE_SIZE
+    page = page[:ACTIVITY_PAGE_SIZE]
+    return {
+        'activities': page,
+        'next_cursor': _encode_activity_cursor(page[-1]) if has_next else '',
+        'filter_user': username,
+        'filter_action': action,
+        'filter_date': date_str,
+        'cursor': cursor if position else '',
+    }
 
-        try:
-            # Try ISO format (default for type="date")
-            day = datetime.strptime(date_str, '%Y-%m-%d').date()
-        except ValueError:
-            try:
-                # Fallback to MM/DD/YYYY if manually typed
-                day = datetime.strptime(date_str, '%m/%d/%Y').date()
-            except ValueError:
-                day = None
 
-        if day:
-            activities_qs = activities_qs.filter(created_at__date=day)
+@admin_required
+def user_activity(request):
+    """User activity logs – show real activity from UserActivity model."""
+    flush_activity_log()
+    context = _activity_page(request)
 
-    activities = activities_qs[:500]
+    params = {k: v for k, v in (('user', context['filter_user']), ('action', context['filter_action']),
+                                ('date', context['filter_date'])) if v}
+    if context['next_cursor']:
+        context['next_page_query'] = urlencode({**params, 'cursor': context['next_cursor']})
+    context['first_page_query'] = urlencode(params)
 
     # Distinct users and actions for dropdowns
-    user_list = (
-        User.objects.filter(activity_logs__isnull=False)
-        .distinct()
+    context['activity_users'] = (
+        User.objects.filter(Exists(UserActivity.objects.filter(user=OuterRef('pk'))))
         .order_by('username')
     )
-    action_choices = UserActivity.ACTION_CHOICES
-
-    context = {
-        'activities': activities,
-        'filter_user': username,
-        'filter_action': action,
-        'filter_date': date_str,
-        'activity_users': user_list,
-        'activity_actions': action_choices,
-    }
+    context['activity_actions'] = UserActivity.ACTION_CHOICES
 
     return render(request, 'administrator/user_activity.html', context)
 
 
+@admin_required
+def user_activity_api(request):
+    """API: one page of activity logs as JSON. Same filters as the page; follow next_cursor for more."""
+    flush_activity_log()
+    context = _activity_page(request)
+    return JsonResponse({
+        'results': [
+            {
+                'id': act.pk,
+                'created_at': act.created_at.isoformat(),
+                'user_id': act.user_id,
+                'username': act.user.username if act.user else '',
+                'action': act.action,
+                'description': act.description,
+                'ip_address': act.ip_address,
+            }
+            for act in context['activities']
+        ],
+        'next_cursor': context['next_cursor'] or None,
+    })
+
+
+@admin_required
+@require_http_methods(['GET', 'POST'])
+def performance(request):
+    """Per-endpoint p50/p95/p99 latency, DB time and slowest SQL for this server process."""
+    if request.method == 'POST' and request.POST.get('reset'):
+        metrics.reset()
+        messages.success(request, 'Performance statistics reset.')
+        return redirect('administrator:performance')
+    endpoints = metrics.endpoints()
+    for row in endpoints:
+        row['avg_kb'] = row['avg_bytes'] / 1024
+    pools = [
+        dict(stats, alias=alias, in_use=stats.get('pool_size', 0) - stats.get('pool_available', 0))
+        for alias, stats in db_pool_stats().items()
+    ]
+    return render(request, 'administrator/performance.html', {
+        'endpoints': endpoints,
+        'slow_sql': metrics.slow_sql(),
+        'pools': pools,
+    })
+
+
 @admin_required
 @require_http_methods(['GET', 'POST'])
 def user_delete(request, pk):
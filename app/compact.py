@@ -0,0 +1,133 @@
+"""
+Compact MessagePack responses for the scanner APIs.
+
+A client that sends Accept: application/x-msgpack gets the data of the JSON endpoints in a smaller
+form. Residents are arrays in RESIDENT_FIELDS order. Choice fields are enum codes: indexes into
+the schema's [value, label] lists, not display labels. Dates are YYYYMMDD integers and
+updated_at is epoch milliseconds. Barangay names come once per response as [id, name] pairs.
+The age and PDF URL are left for the client to derive.
+
+Every body carries "schema", the id of the field layout and enum tables served by app:api_schema.
+Clients cache the schema and fetch it again when the id changes. Bump LAYOUT_VERSION when the
+layout changes; changed choices change the id by themselves.
+"""
+import functools
+import hashlib
+import json
+
+import msgpack
+from asgiref.sync import iscoroutinefunction
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from operations.models import Resident
+
+from .serializers import resident_profile_url
+
+CONTENT_TYPE = 'application/x-msgpack'
+MEDIA_TYPES = (CONTENT_TYPE, 'application/msgpack', 'application/vnd.msgpack')
+LAYOUT_VERSION = 1
+
+ENUM_FIELDS = ('gender', 'status', 'civil_status', 'educational_attainment', 'health_status', 'economic_status')
+RESIDENT_FIELDS = (
+    'id', 'resident_id', 'full_name', 'profile_picture', 'contact_no', 'gender', 'status',
+    'date_of_birth', 'place_of_birth', 'address', 'purok', 'barangay_id', 'civil_status', 'occupation',
+    'citizenship', 'educational_attainment', 'health_status', 'economic_status', 'remarks', 'updated_at',
+)
+SEARCH_FIELDS = ('id', 'resident_id', 'full_name', 'barangay_id')
+
+
+@functools.lru_cache(maxsize=None)
+def schema():
+    """The layout and enum tables compact bodies refer to, with their id under "schema"."""
+    body = {
+        'layout': LAYOUT_VERSION,
+        'resident': list(RESIDENT_FIELDS),
+        'search': list(SEARCH_FIELDS),
+        'enums': {
+            name: [[value, str(label)] for value, label in Resident._meta.get_field(name).flatchoices]
+            for name in ENUM_FIELDS
+        },
+    }
+    digest = hashlib.blake2b(json.dumps(body, sort_keys=True).encode(), digest_size=4).hexdigest()
+    return {'schema': f'{LAYOUT_VERSION}.{digest}', **body}
+
+
+@functools.lru_cache(maxsize=None)
+def _codes():
+    return {name: {value: i for i, (value, _) in enumerate(table)} for name, table in schema()['enums'].items()}
+
+
+def wants_compact(request):
+    """True if the Accept header names a MessagePack type."""
+    accept = request.headers.get('Accept', '')
+    return any(part.split(';')[0].strip().lower() in MEDIA_TYPES for part in accept.split(','))
+
+
+def _date(value):
+    return value.year * 10000 + value.month * 100 + value.day if value else None
+
+
+def resident_row(resident, request):
+    """One resident (from api_residents()) as a list in RESIDENT_FIELDS order."""
+    codes = _codes()
+    return [
+        resident.id,
+        resident.resident_id or '',
+        resident.get_full_name(),
+        resident_profile_url(resident, request),
+        resident.contact_no or '',
+        codes['gender'].get(resident.gender),
+        codes['status'].get(resident.status),
+        _date(resident.date_of_birth),
+        resident.place_of_birth or '',
+        resident.address or '',
+        resident.purok or '',
+        resident.barangay_id,
+        codes['civil_status'].get(resident.civil_status),
+        resident.occupation or '',
+        resident.citizenship or '',
+        codes['educational_attainment'].get(resident.educational_attainment),
+        codes['health_status'].get(resident.health_status),
+        codes['economic_status'].get(resident.economic_status),
+        resident.remarks or '',
+        round(resident.updated_at.timestamp() * 1000),
+    ]
+
+
+def search_row(resident):
+    return [resident.id, resident.resident_id or '', resident.get_full_name(), resident.barangay_id]
+
+
+def barangay_pairs(residents):
+    """[id, name] of the barangays of residents (loaded with select_related), each once."""
+    barangays = {r.barangay_id: r.barangay for r in residents if r.barangay_id}
+    return [[pk, barangay.name] for pk, barangay in barangays.items()]
+
+
+class CompactResponse(HttpResponse):
+    """A MessagePack body stamped with the current schema id."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', CONTENT_TYPE)
+        super().__init__(msgpack.packb({'schema': schema()['schema'], **data}), **kwargs)
+
+
+def negotiated(view_func):
+    """Add Vary: Accept to a view that answers in JSON or MessagePack (see wants_compact)."""
+    if iscoroutinefunction(view_func):
+        @functools.wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            response = await view_func(request, *args, **kwargs)
+            patch_vary_headers(response, ('Accept',))
+            return response
+
+        return async_wrapper
+
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        response = view_func(request, *args, **kwargs)
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+    return wrapper
@@ -0,0 +1,179 @@
+"""
+Resident profile PDF (app:resident_profile_pdf), cached on disk.
+
+A PDF only changes when the resident or their barangay changes (and, through the age line, on the
+resident's birthday), so profile_pdf_etag() hashes exactly those inputs. cached_profile_pdf() builds
+the document once per ETag under FILE_CACHE_ROOT/profile-pdf and replaces the resident's previous
+file, so repeat downloads are a file read and the view can answer If-None-Match with 304.
+A PDF built without a photo the resident has (the fetch failed) is served but cached neither here
+nor by the client, so the next download tries the photo again.
+"""
+import hashlib
+import io
+import os
+import threading
+
+from main.image_cache import cache_root, fetch_image
+from main.instrumentation import metrics
+
+# Bump when the document layout below changes, so cached PDFs are rebuilt.
+LAYOUT_VERSION = 1
+
+
+def _profile_image_path(resident):
+    """Local path of the profile picture (Supabase URL via the shared image cache, or ImageField)."""
+    if resident.profile_picture_url:
+        return fetch_image(resident.profile_picture_url, not_before=resident.updated_at)
+    if resident.profile_picture:
+        try:
+            return resident.profile_picture.path
+        except Exception:
+            return None
+    return None
+
+
+def profile_pdf_last_modified(resident):
+    barangay = resident.barangay
+    return max(resident.updated_at, barangay.updated_at) if barangay else resident.updated_at
+
+
+def profile_pdf_etag(resident):
+    """Quoted ETag over everything the PDF shows. Expects resident.barangay to be loaded."""
+    barangay = resident.barangay
+    parts = [
+        LAYOUT_VERSION, resident.pk, resident.updated_at.isoformat(),
+        barangay.updated_at.isoformat() if barangay else '',
+        resident.get_age() if resident.date_of_birth else '',
+    ]
+    return '"' + hashlib.sha256(repr(parts).encode()).hexdigest()[:32] + '"'
+
+
+def _has_picture(resident):
+    return bool(resident.profile_picture_url or resident.profile_picture)
+
+
+def build_profile_pdf(resident, img_path):
+    """Render the profile PDF and return its bytes. img_path: local profile picture, or None."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        rightMargin=0.75 * inch,
+        leftMargin=0.75 * inch,
+        topMargin=0.75 * inch,
+        bottomMargin=0.75 * inch,
+    )
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        spaceAfter=10,
+    )
+    body_style = ParagraphStyle(
+        'CustomBody',
+        parent=styles['Normal'],
+        fontSize=11,
+        spaceAfter=6,
+    )
+
+    elements = []
+    elements.append(Paragraph("PPS Palawan Profiling System", title_style))
+    elements.append(Spacer(1, 0.15 * inch))
+
+    # Profile picture + name (left: photo, right: name)
+    try:
+        if img_path:
+            img = Image(img_path, width=1.2 * inch, height=1.2 * inch)
+            tbl = Table(
+                [[img, Paragraph(f"<b>{resident.get_full_name()}</b>", body_style)]],
+                colWidths=[1.5 * inch, 4 * inch],
+            )
+            tbl.setStyle(TableStyle([
+                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+                ('LEFTPADDING', (0, 0), (0, -1), 0),
+                ('RIGHTPADDING', (0, 0), (0, -1), 12),
+            ]))
+            elements.append(tbl)
+        else:
+            elements.append(Paragraph(f"<b>{resident.get_full_name()}</b>", body_style))
+        elements.append(Spacer(1, 0.15 * inch))
+    except Exception:
+        elements.append(Paragraph(f"<b>{resident.get_full_name()}</b>", body_style))
+        elements.append(Spacer(1, 0.1 * inch))
+
+    # Birthdate, Age, Gender, Contact No
+    birthdate_str = resident.date_of_birth.strftime('%b-%d-%Y') if resident.date_of_birth else '—'
+    age_val = resident.get_age() if resident.date_of_birth else ''
+    age_str = f"{age_val}" if age_val else '—'
+    gender_str = resident.get_gender_display()
+    contact_str = resident.contact_no or '—'
+    line1 = (
+        f"<b>Birthdate:</b> {birthdate_str}&nbsp;&nbsp;  "
+        f"<b>Age:</b> {age_str}&nbsp;&nbsp;  "
+        f"<b>Gender:</b> {gender_str}&nbsp;&nbsp;  "
+        f"<b>Contact No:</b> {contact_str}"
+    )
+    elements.append(Paragraph(line1, body_style))
+
+    # Address line
+    addr = resident.address or '—'
+    if resident.purok:
+        addr = f"{addr}, {resident.purok}"
+    elements.append(Paragraph(f"<b>Address:</b> {addr}", body_style))
+
+    # Barangay
+    barangay_str = resident.barangay.name if resident.barangay else '—'
+    elements.append(Paragraph(f"<b>Barangay:</b> {barangay_str}", body_style))
+
+    # PWD / SENIOR / VOTERS badges
+    badges = []
+    if resident.health_status == 'PWD':
+        badges.append('PWD')
+    if resident.economic_status == 'SENIOR CITIZEN':
+        badges.append('SENIOR')
+    if getattr(resident, 'is_voter', False):
+        badges.append('VOTERS')
+    badges_str = ', '.join(badges) if badges else '—'
+    elements.append(Paragraph(f"<b>Remarks:</b> {badges_str}", body_style))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def cached_profile_pdf(resident, etag=None):
+    """
+    (open binary file, cacheable) for the resident's PDF under the current ETag, building it on a
+    miss. The file is opened before any cleanup, so a request replacing it cannot pull it away.
+    cacheable is False when the photo could not be fetched and the PDF was built without it.
+    """
+    etag = etag or profile_pdf_etag(resident)
+    directory = cache_root() / 'profile-pdf'
+    digest = etag.strip('"')
+    path = directory / f'{resident.pk}-{digest}.pdf'
+    try:
+        fh = open(path, 'rb')
+    except FileNotFoundError:
+        pass
+    else:
+        metrics.record_cache('profile_pdf', True)
+        return fh, True
+    metrics.record_cache('profile_pdf', False)
+    img_path = _profile_image_path(resident)
+    data = build_profile_pdf(resident, img_path)
+    if img_path is None and _has_picture(resident):
+        return io.BytesIO(data), False
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    tmp.write_bytes(data)
+    fh = open(tmp, 'rb')
+    os.replace(tmp, path)
+    for old in directory.glob(f'{resident.pk}-*.pdf'):
+        if old != path:
+            old.unlink(missing_ok=True)  # keep one PDF per resident
+    return fh, True
@@ -0,0 +1,60 @@
+"""
+Resident payload shared by the scanner APIs (resident_api, residents_batch_api, residents_sync).
+
+Querysets load only RESIDENT_API_COLUMNS (plus the barangay name), so a batch of residents is
+one narrow query and every endpoint returns the same fields for a resident.
+"""
+from operations.models import Resident
+
+RESIDENT_API_COLUMNS = (
+    'resident_id', 'firstname', 'middlename', 'lastname', 'suffix', 'profile_picture',
+    'profile_picture_url', 'contact_no', 'gender', 'status', 'date_of_birth', 'place_of_birth',
+    'address', 'purok', 'barangay__name', 'civil_status', 'occupation', 'citizenship',
+    'educational_attainment', 'health_status', 'economic_status', 'remarks', 'updated_at',
+)
+
+
+def api_residents():
+    """Residents with just the columns resident_data() reads."""
+    return Resident.objects.select_related('barangay').only(*RESIDENT_API_COLUMNS)
+
+
+def resident_profile_url(resident, request):
+    """Profile image URL: Supabase Storage or Django media."""
+    if resident.profile_picture_url:
+        return resident.profile_picture_url
+    if resident.profile_picture:
+        try:
+            return request.build_absolute_uri(resident.profile_picture.url)
+        except Exception:
+            pass
+    return ''
+
+
+def resident_data(resident, request):
+    """The scanner app's JSON for one resident (from api_residents())."""
+    return {
+        'id': resident.id,
+        'resident_id': resident.resident_id or '',
+        'full_name': resident.get_full_name(),
+        'profile_picture': resident_profile_url(resident, request),
+        'contact_no': resident.contact_no or '',
+        'gender': resident.get_gender_display(),
+        'status': resident.get_status_display(),
+        'date_of_birth': resident.date_of_birth.strftime('%Y-%m-%d') if resident.date_of_birth else '',
+        'age': resident.get_age(),
+        'place_of_birth': resident.place_of_birth or '',
+        'address': resident.address or '',
+        'purok': resident.purok or '',
+        'barangay': resident.barangay.name if resident.barangay else '',
+        'barangay_id': resident.barangay_id,
+        'civil_status': resident.get_civil_status_display(),
+        'occupation': resident.occupation or '',
+        'citizenship': resident.citizenship or '',
+        'educational_attainment': resident.get_educational_attainment_display(),
+        'health_status': resident.get_health_status_display(),
+        'economic_status': resident.get_economic_status_display(),
+        'remarks': resident.remarks or '',
+        'updated_at': resident.updated_at.isoformat(),
+        'pdf_url': request.build_absolute_uri(f'/app/resident/{resident.id}/pdf/'),
+    }
@@ -0,0 +1,100 @@
+"""
+Delta sync of a barangay's residents for the scanner app (app:residents_sync).
+
+A device keeps a local copy per barangay and asks for what changed since its cursor. Pages are
+keyset-ordered by (updated_at, id) on the resident_brgy_updated_idx index, so a page costs the same
+at any depth. Residents that left the barangay (deleted or moved) come back as ResidentTombstone
+primary keys in "deleted"; clients apply deletes before upserts.
+
+Rows younger than SYNC_SETTLE_SECONDS are held back: updated_at is set before the saving
+transaction commits, so a row could otherwise become visible behind a cursor already handed out.
+A cursor older than SYNC_TOMBSTONE_DAYS (the tombstone retention) may have missed deletions, so
+the client is told to reset and download the barangay again.
+"""
+import base64
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from operations.models import ResidentTombstone
+
+from .serializers import api_residents
+
+SYNC_PAGE_SIZE = 500
+SYNC_MAX_PAGE_SIZE = 2000
+
+
+def settle_seconds():
+    return max(0, int(getattr(settings, 'SYNC_SETTLE_SECONDS', 60)))
+
+
+def tombstone_days():
+    return max(1, int(getattr(settings, 'SYNC_TOMBSTONE_DAYS', 90)))
+
+
+def encode_cursor(updated_at, pk=None):
+    """pk None means "everything up to and including updated_at"."""
+    raw = f'{updated_at.isoformat()}|{"" if pk is None else pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (updated_at, pk or None) from a cursor string, or None if it is invalid."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        updated_raw, pk_raw = raw.rsplit('|', 1)
+        updated_at = datetime.fromisoformat(updated_raw)
+        if timezone.is_naive(updated_at):
+            return None
+        return updated_at, int(pk_raw) if pk_raw else None
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+async def sync_page(barangay_pk, cursor='', limit=SYNC_PAGE_SIZE):
+    """
+    One page of changes for the barangay after cursor ('' = from the start). Returns a dict with
+    residents (api_residents() instances, oldest change first), deleted (resident pks), cursor
+    (pass it back next time), more (another page is ready now) and reset (drop the local copy first).
+    """
+    now = timezone.now()
+    horizon = now - timedelta(seconds=settle_seconds())
+    position = decode_cursor(cursor) if cursor else None
+    reset = bool(cursor) and (position is None or position[0] < now - timedelta(days=tombstone_days()))
+    if reset:
+        position = None
+
+    residents = api_residents().filter(barangay_id=barangay_pk, updated_at__lte=horizon)
+    if position:
+        updated_at, pk = position
+        if pk is None:
+            residents = residents.filter(updated_at__gt=updated_at)
+        else:
+            residents = residents.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, pk__gt=pk))
+    page = [r async for r in residents.order_by('updated_at', 'pk')[:limit + 1]]
+    more = len(page) > limit
+    page = page[:limit]
+
+    if more:
+        end = (page[-1].updated_at, page[-1].pk)
+    elif position is None or horizon >= position[0]:
+        end = (horizon, None)
+    else:
+        end = position  # the clock went back; keep the client where it is
+
+    deleted = []
+    if position and end[0] > position[0]:
+        deleted = [
+            pk async for pk in ResidentTombstone.objects.filter(
+                barangay_pk=barangay_pk, deleted_at__gt=position[0], deleted_at__lte=end[0],
+            ).order_by().values_list('resident_pk', flat=True).distinct()
+        ]
+    return {
+        'residents': page,
+        'deleted': deleted,
+        'cursor': encode_cursor(*end),
+        'more': more,
+        'reset': reset,
+    }
@@ -0,0 +1,293 @@
+"""Scanner app: cached profile PDFs, async APIs, batch lookup, MessagePack responses and delta sync."""
+import gzip
+import json
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import mock
+
+import msgpack
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from operations.models import Resident
+from reference.models import Barangay, Municipality
+
+from .compact import schema as compact_schema
+from .profile_pdf import cached_profile_pdf, profile_pdf_etag
+from .sync import encode_cursor
+
+
+class ProfilePdfCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        municipality = Municipality.objects.create(name='Municipality')
+        barangay = Barangay.objects.create(name='Barangay', municipality=municipality)
+        cls.resident = Resident.objects.create(
+            barangay=barangay, lastname='Cruz', firstname='Juan', gender=Resident.GENDER_MALE,
+            date_of_birth=date(1980, 1, 1), status=Resident.STATUS_ALIVE,
+        )
+
+    def setUp(self):
+        self.root = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(FILE_CACHE_ROOT=str(self.root)))
+        self.url = reverse('app:resident_profile_pdf', kwargs={'pk': self.resident.pk})
+
+    def test_pdf_is_built_once_and_revalidated_with_etag(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        body = b''.join(first.streaming_content)
+        self.assertTrue(body.startswith(b'%PDF'))
+        etag = first['ETag']
+
+        with mock.patch('app.profile_pdf.build_profile_pdf') as build:
+            again = self.client.get(self.url)
+            self.assertEqual(b''.join(again.streaming_content), body)
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        build.assert_not_called()
+
+        self.resident.contact_no = '0917'
+        self.resident.save()
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+        b''.join(changed.streaming_content)
+        self.assertEqual(len(list((self.root / 'profile-pdf').glob(f'{self.resident.pk}-*.pdf'))), 1)
+
+    def _photo(self):
+        from PIL import Image
+        path = self.root / 'photo.png'
+        Image.new('RGB', (8, 8), 'white').save(path)
+        return path
+
+    def test_pdf_without_its_photo_is_not_cached(self):
+        Resident.objects.filter(pk=self.resident.pk).update(profile_picture_url='https://example.com/p.png')
+        with mock.patch('app.profile_pdf.fetch_image', return_value=None):
+            failed = self.client.get(self.url)
+        self.assertEqual(failed.status_code, 200)
+        self.assertTrue(b''.join(failed.streaming_content).startswith(b'%PDF'))
+        self.assertIn('no-store', failed['Cache-Control'])
+        self.assertFalse(failed.has_header('ETag'))
+        self.assertEqual(list(self.root.glob('profile-pdf/*.pdf')), [])
+
+        with mock.patch('app.profile_pdf.fetch_image', return_value=self._photo()):
+            fetched = self.client.get(self.url)
+        b''.join(fetched.streaming_content)
+        self.assertTrue(fetched.has_header('ETag'))
+        self.assertEqual(len(list(self.root.glob('profile-pdf/*.pdf'))), 1)
+
+    def test_open_pdf_survives_a_concurrent_rebuild(self):
+        first, _ = cached_profile_pdf(self.resident)
+        served, _ = cached_profile_pdf(self.resident)  # a hit, opened before the rebuild below
+        self.resident.contact_no = '0917'
+        self.resident.save()
+        rebuilt, _ = cached_profile_pdf(self.resident)  # removes the previous file
+        with first, served, rebuilt:
+            self.assertTrue(served.read().startswith(b'%PDF'))
+        self.assertEqual(len(list(self.root.glob('profile-pdf/*.pdf'))), 1)
+
+    def test_file_removed_after_the_lookup_is_rebuilt(self):
+        etag = profile_pdf_etag(self.resident)
+        cached_profile_pdf(self.resident, etag)[0].close()
+        for path in self.root.glob('profile-pdf/*.pdf'):
+            path.unlink()
+        pdf, cacheable = cached_profile_pdf(self.resident, etag)
+        with pdf:
+            self.assertTrue(pdf.read().startswith(b'%PDF'))
+        self.assertTrue(cacheable)
+
+
+class AsyncScannerApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        barangay = Barangay.objects.create(name='Barangay', municipality=Municipality.objects.create(name='M'))
+        cls.resident = Resident.objects.create(
+            barangay=barangay, lastname='Cruz', firstname='Juan', gender=Resident.GENDER_MALE,
+            date_of_birth=date(1980, 1, 1), status=Resident.STATUS_ALIVE,
+        )
+
+    async def test_scanner_endpoints_under_asgi(self):
+        search = await self.async_client.get(reverse('app:residents_search'), {'q': 'cruz'})
+        self.assertEqual(search.json()['results'][0]['barangay'], 'Barangay')
+        profile = await self.async_client.get(reverse('app:resident_profile', kwargs={'pk': self.resident.pk}))
+        self.assertContains(profile, 'Barangay')
+        url = reverse('app:resident_api', kwargs={'pk': self.resident.pk})
+        first = await self.async_client.get(url)
+        self.assertEqual(first.json()['barangay'], 'Barangay')
+        again = await self.async_client.get(url, headers={'if-none-match': first['ETag']})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], first['ETag'])
+        missing = await self.async_client.get(reverse('app:resident_api', kwargs={'pk': 0}))
+        self.assertEqual(missing.status_code, 404)
+
+    @override_settings(SYNC_API_TOKEN='device-token')
+    def test_batch_lookup_is_one_query_and_gzipped(self):
+        other = Resident.objects.create(
+            barangay=self.resident.barangay, lastname='Reyes', firstname='Ana', gender=Resident.GENDER_FEMALE,
+            date_of_birth=date(1990, 1, 1), status=Resident.STATUS_ALIVE,
+        )
+        url = reverse('app:residents_batch')
+        body = {'ids': [other.pk, 0, self.resident.pk], 'resident_ids': [self.resident.resident_id, 'nope']}
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                url, body, content_type='application/json',
+                headers={'accept-encoding': 'gzip', 'authorization': 'Bearer device-token'},
+            )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        data = json.loads(gzip.decompress(response.content))
+        single = self.client.get(reverse('app:resident_api', kwargs={'pk': other.pk})).json()
+        self.assertEqual(data['results'][0], single)
+        self.assertEqual([r['id'] for r in data['results']], [other.pk, self.resident.pk])
+        self.assertEqual(data['missing'], {'ids': [0], 'resident_ids': ['nope']})
+        too_many = self.client.post(
+            url, {'ids': list(range(1000))}, content_type='application/json',
+            headers={'authorization': 'Bearer device-token'},
+        )
+        self.assertEqual(too_many.status_code, 400)
+
+    @override_settings(SYNC_API_TOKEN='device-token')
+    def test_batch_lookup_needs_the_sync_token_or_a_session(self):
+        url = reverse('app:residents_batch')
+        body = {'ids': [self.resident.pk]}
+        for headers in ({}, {'authorization': 'Bearer wrong'}):
+            with self.subTest(headers=headers):
+                response = self.client.post(url, body, content_type='application/json', headers=headers)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+                self.assertNotContains(response, 'Cruz', status_code=401)
+        self.client.force_login(User.objects.create_user('clerk'))
+        response = self.client.post(url, body, content_type='application/json')
+        self.assertEqual(response.json()['results'][0]['id'], self.resident.pk)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class CompactApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.barangay = Barangay.objects.create(name='Barangay', municipality=Municipality.objects.create(name='M'))
+        cls.resident = Resident.objects.create(
+            barangay=cls.barangay, lastname='Cruz', firstname='Juan', gender=Resident.GENDER_FEMALE,
+            date_of_birth=date(1980, 2, 3), status=Resident.STATUS_ALIVE, civil_status='MARRIED',
+            educational_attainment='COLLEGE GRADUATE', health_status='PWD', economic_status='SENIOR CITIZEN',
+        )
+
+    def get(self, url, data=None, **kwargs):
+        response = self.client.get(url, data, headers={'accept': 'application/x-msgpack'}, **kwargs)
+        self.assertEqual(response['Content-Type'], 'application/x-msgpack')
+        self.assertIn('Accept', response['Vary'])
+        return response, msgpack.unpackb(response.content)
+
+    def test_resident_uses_schema_codes_and_matches_json(self):
+        url = reverse('app:resident_api', kwargs={'pk': self.resident.pk})
+        _, schema = self.get(reverse('app:api_schema'))
+        response, body = self.get(url)
+        self.assertEqual(body['schema'], schema['schema'])
+        resident = dict(zip(schema['resident'], body['resident']))
+        as_json = self.client.get(url)
+        self.assertEqual(as_json['Content-Type'], 'application/json')
+        expected = as_json.json()
+        for field in ('gender', 'status', 'civil_status', 'educational_attainment', 'health_status', 'economic_status'):
+            self.assertEqual(schema['enums'][field][resident[field]][1], expected[field], field)
+        self.assertEqual(resident['date_of_birth'], 19800203)
+        self.assertEqual(body['barangays'], [[self.barangay.pk, 'Barangay']])
+        self.assertNotEqual(response['ETag'], as_json['ETag'])
+        self.assertLess(len(response.content), len(as_json.content) / 2)
+
+    def test_schema_etag_differs_per_representation(self):
+        url = reverse('app:api_schema')
+        compact, _ = self.get(url)
+        as_json = self.client.get(url)
+        self.assertNotEqual(compact['ETag'], as_json['ETag'])
+        self.assertEqual(self.client.get(url, headers={'if-none-match': as_json['ETag']}).status_code, 304)
+        stale = self.client.get(url, headers={'if-none-match': as_json['ETag'], 'accept': 'application/x-msgpack'})
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(msgpack.unpackb(stale.content)['schema'], compact_schema()['schema'])
+
+    def test_lists_are_compact_rows(self):
+        _, search = self.get(reverse('app:residents_search'), {'q': 'cruz'})
+        self.assertEqual(search['rows'], [[self.resident.pk, self.resident.resident_id, 'Juan Cruz', self.barangay.pk]])
+        self.client.force_login(User.objects.create_user('clerk', password='x'))
+        _, page = self.get(reverse('app:residents_sync'), {'barangay': self.barangay.pk})
+        self.assertEqual(page['barangay'], [self.barangay.pk, 'Barangay', ''])
+        self.assertEqual(len(page['rows'][0]), len(compact_schema()['resident']))
+        response = self.client.post(
+            reverse('app:residents_batch'), {'ids': [self.resident.pk]}, content_type='application/json',
+            headers={'accept': 'application/x-msgpack'},
+        )
+        self.assertEqual(msgpack.unpackb(response.content)['rows'][0], page['rows'][0])
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+@override_settings(SYNC_API_TOKEN='device-token')
+class ResidentSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        municipality = Municipality.objects.create(name='M')
+        cls.home = Barangay.objects.create(name='Home', municipality=municipality)
+        cls.other = Barangay.objects.create(name='Other', municipality=municipality)
+        cls.residents = [
+            Resident.objects.create(
+                barangay=cls.home, lastname=f'Cruz{i}', firstname='Juan', gender=Resident.GENDER_MALE,
+                date_of_birth=date(1980, 1, 1), status=Resident.STATUS_ALIVE,
+            )
+            for i in range(3)
+        ]
+
+    def sync(self, barangay, cursor='', limit=2):
+        response = self.client.get(
+            reverse('app:residents_sync'), {'barangay': barangay.pk, 'cursor': cursor, 'limit': limit},
+            headers={'authorization': 'Bearer device-token'},
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_then_tombstones_for_deleted_and_moved_residents(self):
+        first = self.sync(self.home)
+        self.assertTrue(first['more'])
+        second = self.sync(self.home, first['cursor'])
+        self.assertFalse(second['more'])
+        ids = [row[first['fields'].index('id')] for row in first['rows'] + second['rows']]
+        self.assertEqual(ids, [r.pk for r in self.residents])
+        self.assertEqual(self.sync(self.home, second['cursor'])['rows'], [])
+
+        deleted, moved, edited = self.residents
+        deleted_pk = deleted.pk
+        deleted.delete()
+        moved.barangay = self.other
+        moved.save()
+        edited.remarks = 'Edited'
+        edited.save()
+        changes = self.sync(self.home, second['cursor'])
+        self.assertCountEqual(changes['deleted'], [deleted_pk, moved.pk])
+        self.assertEqual([row[0] for row in changes['rows']], [edited.pk])
+        self.assertEqual([row[0] for row in self.sync(self.other)['rows']], [moved.pk])
+
+    def test_expired_or_invalid_cursor_resets(self):
+        old = encode_cursor(timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS + 1))
+        for cursor in (old, 'garbage'):
+            page = self.sync(self.home, cursor, limit=10)
+            self.assertTrue(page['reset'])
+            self.assertEqual(len(page['rows']), 3)
+        response = self.client.get(reverse('app:residents_sync'), headers={'authorization': 'Bearer device-token'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_the_token_or_a_session(self):
+        url = reverse('app:residents_sync')
+        query = {'barangay': self.home.pk}
+        for headers in ({}, {'authorization': 'Bearer wrong'}, {'authorization': 'device-token'}):
+            with self.subTest(headers=headers):
+                response = self.client.get(url, query, headers=headers)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+                self.assertNotIn('rows', response.json())
+        with override_settings(SYNC_API_TOKEN=''):
+            self.assertEqual(self.client.get(url, query, headers={'authorization': 'Bearer '}).status_code, 401)
+        self.client.force_login(User.objects.create_user('clerk', password='x'))
+        self.assertEqual(self.client.get(url, query).status_code, 200)
+
+    @override_settings(SYNC_SETTLE_SECONDS=3600)
+    def test_recent_changes_are_held_back(self):
+        self.assertEqual(self.sync(self.home)['rows'], [])
@@ -7,6 +7,9 @@ urlpatterns = [
     path('', views.app_info, name='app_info'),
     path('api/residents/search/', views.residents_search_api, name='residents_search'),
     path('api/resident/<int:pk>/', views.resident_api, name='resident_api'),
+    path('api/residents/batch/', views.residents_batch_api, name='residents_batch'),
+    path('api/sync/residents/', views.residents_sync, name='residents_sync'),
+    path('api/schema/', views.api_schema, name='api_schema'),
     path('resident/<int:pk>/', views.resident_profile, name='resident_profile'),
     path('resident/<int:pk>/pdf/', views.resident_profile_pdf, name='resident_profile_pdf'),
 ]
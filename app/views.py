@@ -1,145 +1,65 @@
-"""Public resident profile - QR scanner app and API (no login required)."""
-from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse, JsonResponse
+"""
+Public resident profile - QR scanner app and API (no login required).
+
+The scanner APIs and resident_profile are async views: phones poll them in bursts and each waits
+on the (remote) database, so under an ASGI server (see main/asgi.py) one worker keeps many of them
+in flight. They use the async ORM and load everything they render up
+front (select_related), because a lazy query inside an async view raises SynchronousOnlyOperation.
+The delta sync hands out whole barangays, so it also needs SYNC_API_TOKEN or a signed-in user.
+"""
+import json
+import secrets
+
+from django.conf import settings
+from django.shortcuts import aget_object_or_404, render, get_object_or_404, redirect
+from django.http import FileResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_POST
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils import timezone
+from django.utils.http import http_date
 from django.db.models import Q
+from main.conditional import arow_etag, revalidated
+from main.public_routes import public_route
+from main.transactions import async_view, read_only_view
 from operations.models import Resident
+from reference.models import Barangay
 
-
-def _get_profile_image_path(resident):
-    """Return (path, is_temp) for profile image. is_temp=True means caller should delete the file."""
-    import os
-    import tempfile
-    import urllib.request
-
-    # Supabase or external URL - fetch to temp file
-    if resident.profile_picture_url:
-        try:
-            with urllib.request.urlopen(resident.profile_picture_url, timeout=10) as resp:
-                data = resp.read()
-            fd, path = tempfile.mkstemp(suffix='.jpg')
-            with os.fdopen(fd, 'wb') as f:
-                f.write(data)
-            return path, True
-        except Exception:
-            return None, False
-
-    # Django ImageField (local file)
-    if resident.profile_picture:
-        try:
-            return resident.profile_picture.path, False
-        except Exception:
-            return None, False
-    return None, False
+from .compact import (
+    CompactResponse, barangay_pairs, negotiated, resident_row, schema, search_row, wants_compact,
+)
+from .serializers import api_residents, resident_data, resident_profile_url
+from .profile_pdf import cached_profile_pdf, profile_pdf_etag, profile_pdf_last_modified
+from .sync import SYNC_MAX_PAGE_SIZE, SYNC_PAGE_SIZE, sync_page
 
 
+@public_route
 def resident_profile_pdf(request, pk):
-    """Generate and return resident profile PDF with profile picture and info."""
-    import os
-    import tempfile
-    from reportlab.lib.pagesizes import letter
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
-
-    resident = get_object_or_404(Resident, pk=pk)
-    response = HttpResponse(content_type='application/pdf')
-    filename = f"resident_profile_{resident.resident_id or resident.id}.pdf"
-    response['Content-Disposition'] = f'attachment; filename=\"{filename}\"'
-
-    buffer = response
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=letter,
-        rightMargin=0.75 * inch,
-        leftMargin=0.75 * inch,
-        topMargin=0.75 * inch,
-        bottomMargin=0.75 * inch,
-    )
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        spaceAfter=10,
-    )
-    body_style = ParagraphStyle(
-        'CustomBody',
-        parent=styles['Normal'],
-        fontSize=11,
-        spaceAfter=6,
-    )
-
-    elements = []
-    elements.append(Paragraph("PPS Palawan Profiling System", title_style))
-    elements.append(Spacer(1, 0.15 * inch))
-
-    # Profile picture + name (left: photo, right: name)
-    img_path, img_is_temp = _get_profile_image_path(resident)
-    try:
-        if img_path:
-            img = Image(img_path, width=1.2 * inch, height=1.2 * inch)
-            tbl = Table(
-                [[img, Paragraph(f"<b>{resident.get_full_name()}</b>", body_style)]],
-                colWidths=[1.5 * inch, 4 * inch],
-            )
-            tbl.setStyle(TableStyle([
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('LEFTPADDING', (0, 0), (0, -1), 0),
-                ('RIGHTPADDING', (0, 0), (0, -1), 12),
-            ]))
-            elements.append(tbl)
-        else:
-            elements.append(Paragraph(f"<b>{resident.get_full_name()}</b>", body_style))
-        elements.append(Spacer(1, 0.15 * inch))
-    except Exception:
-        elements.append(Paragraph(f"<b>{resident.get_full_name()}</b>", body_style))
-        elements.append(Spacer(1, 0.1 * inch))
-    finally:
-        if img_path and img_is_temp:
-            try:
-                os.unlink(img_path)
-            except Exception:
-                pass
-
-    # Birthdate, Age, Gender, Contact No
-    birthdate_str = resident.date_of_birth.strftime('%b-%d-%Y') if resident.date_of_birth else '—'
-    age_val = resident.get_age() if resident.date_of_birth else ''
-    age_str = f"{age_val}" if age_val else '—'
-    gender_str = resident.get_gender_display()
-    contact_str = resident.contact_no or '—'
-    line1 = (
-        f"<b>Birthdate:</b> {birthdate_str}&nbsp;&nbsp;  "
-        f"<b>Age:</b> {age_str}&nbsp;&nbsp;  "
-        f"<b>Gender:</b> {gender_str}&nbsp;&nbsp;  "
-        f"<b>Contact No:</b> {contact_str}"
-    )
-    elements.append(Paragraph(line1, body_style))
-
-    # Address line
-    addr = resident.address or '—'
-    if resident.purok:
-        addr = f"{addr}, {resident.purok}"
-    elements.append(Paragraph(f"<b>Address:</b> {addr}", body_style))
-
-    # Barangay
-    barangay_str = resident.barangay.name if resident.barangay else '—'
-    elements.append(Paragraph(f"<b>Barangay:</b> {barangay_str}", body_style))
-
-    # PWD / SENIOR / VOTERS badges
-    badges = []
-    if resident.health_status == 'PWD':
-        badges.append('PWD')
-    if resident.economic_status == 'SENIOR CITIZEN':
-        badges.append('SENIOR')
-    if getattr(resident, 'is_voter', False):
-        badges.append('VOTERS')
-    badges_str = ', '.join(badges) if badges else '—'
-    elements.append(Paragraph(f"<b>Remarks:</b> {badges_str}", body_style))
-
-    doc.build(elements)
+    """
+    Resident profile PDF with profile picture and info. Served from the on-disk PDF cache
+    (app.profile_pdf) with ETag / Last-Modified, so a repeat download can be a 304.
+    """
+    resident = get_object_or_404(Resident.objects.select_related('barangay'), pk=pk)
+    etag = profile_pdf_etag(resident)
+    last_modified = profile_pdf_last_modified(resident)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified.timestamp())
+    if not_modified is not None:
+        response = not_modified
+    else:
+        pdf, cacheable = cached_profile_pdf(resident, etag)
+        filename = f"resident_profile_{resident.resident_id or resident.id}.pdf"
+        response = FileResponse(pdf, as_attachment=True, filename=filename, content_type='application/pdf')
+        if not cacheable:
+            patch_cache_control(response, no_store=True)
+            return response
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
     return response
 
 
+@public_route
 def app_info(request):
     """Info page - use the PPS app on your phone. Redirect ?res=id to profiling page."""
     res_id = request.GET.get('res')
@@ -148,15 +68,22 @@ def app_info(request):
     return render(request, 'app/info.html')
 
 
-def residents_search_api(request):
-    """Public API: search residents by name or ID (for scanner app)."""
+@public_route
+@async_view
+@negotiated
+async def residents_search_api(request):
+    """Public API: search residents by name or ID (for scanner app). JSON or MessagePack (app.compact)."""
     q = (request.GET.get('q') or '').strip()
+    compact = wants_compact(request)
     if not q or len(q) < 2:
-        return JsonResponse({'results': []})
+        return CompactResponse({'rows': [], 'barangays': []}) if compact else JsonResponse({'results': []})
     qs = Resident.objects.filter(
         Q(firstname__icontains=q) | Q(lastname__icontains=q) | Q(middlename__icontains=q)
         | Q(resident_id__icontains=q)
     ).select_related('barangay')[:30]
+    if compact:
+        residents = [r async for r in qs]
+        return CompactResponse({'rows': [search_row(r) for r in residents], 'barangays': barangay_pairs(residents)})
     results = [
         {
             'id': r.id,
@@ -164,59 +91,185 @@ def residents_search_api(request):
             'full_name': r.get_full_name(),
             'barangay': r.barangay.name if r.barangay else '',
         }
-        for r in qs
+        async for r in qs
     ]
     return JsonResponse({'results': results})
 
 
-def _resident_profile_url(resident, request):
-    """Profile image URL: Supabase Storage or Django media."""
-    if resident.profile_picture_url:
-        return resident.profile_picture_url
-    if resident.profile_picture:
-        try:
-            return request.build_absolute_uri(resident.profile_picture.url)
-        except Exception:
-            pass
-    return ''
-
-
-def resident_api(request, pk):
-    """Public API: resident data as JSON (for scanner app)."""
-    resident = get_object_or_404(Resident, pk=pk)
-    profile_url = _resident_profile_url(resident, request)
-    pdf_url = request.build_absolute_uri(f'/app/resident/{pk}/pdf/')
-    date_of_birth_str = resident.date_of_birth.strftime('%Y-%m-%d') if resident.date_of_birth else ''
-    data = {
-        'id': resident.id,
-        'resident_id': resident.resident_id or '',
-        'full_name': resident.get_full_name(),
-        'profile_picture': profile_url,
-        'contact_no': resident.contact_no or '',
-        'gender': resident.get_gender_display(),
-        'status': resident.get_status_display(),
-        'date_of_birth': date_of_birth_str,
-        'age': resident.get_age(),
-        'place_of_birth': resident.place_of_birth or '',
-        'address': resident.address or '',
-        'purok': resident.purok or '',
-        'barangay': resident.barangay.name if resident.barangay else '',
-        'civil_status': resident.get_civil_status_display(),
-        'occupation': resident.occupation or '',
-        'citizenship': resident.citizenship or '',
-        'educational_attainment': resident.get_educational_attainment_display(),
-        'health_status': resident.get_health_status_display(),
-        'economic_status': resident.get_economic_status_display(),
-        'remarks': resident.remarks or '',
-        'pdf_url': pdf_url,
+async def _resident_api_etag(request, pk):
+    # The payload includes the age, so the tag also changes daily.
+    etag = await arow_etag(Resident.objects.filter(pk=pk), 'updated_at', 'barangay__updated_at')
+    return etag and f'{etag}-{timezone.localdate():%Y%m%d}{"-c" if wants_compact(request) else ""}'
+
+
+@public_route
+@async_view
+@negotiated
+@revalidated(_resident_api_etag)
+async def resident_api(request, pk):
+    """Public API: resident data as JSON or MessagePack (for scanner app)."""
+    resident = await aget_object_or_404(api_residents(), pk=pk)
+    if wants_compact(request):
+        return CompactResponse({'resident': resident_row(resident, request), 'barangays': barangay_pairs([resident])})
+    return JsonResponse(resident_data(resident, request))
+
+
+BATCH_MAX_RESIDENTS = 200
+
+
+def _batch_keys(request):
+    """(ids, resident_ids) from a JSON body {"ids": [...], "resident_ids": [...]}; raises ValueError."""
+    try:
+        body = json.loads(request.body or b'{}')
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Body must be JSON.')
+    if not isinstance(body, dict):
+        raise ValueError('Body must be a JSON object.')
+    ids, resident_ids = body.get('ids') or [], body.get('resident_ids') or []
+    if not isinstance(ids, list) or not isinstance(resident_ids, list):
+        raise ValueError('ids and resident_ids must be lists.')
+    if len(ids) + len(resident_ids) > BATCH_MAX_RESIDENTS:
+        raise ValueError(f'At most {BATCH_MAX_RESIDENTS} residents per request.')
+    try:
+        ids = [int(i) for i in ids]
+    except (TypeError, ValueError):
+        raise ValueError('ids must be integers.')
+    return list(dict.fromkeys(ids)), list(dict.fromkeys(str(r) for r in resident_ids))
+
+
+async def _sync_allowed(request):
+    """'Authorization: Bearer <SYNC_API_TOKEN>' (the scanner app) or a signed-in user."""
+    token = getattr(settings, 'SYNC_API_TOKEN', '')
+    auth = request.headers.get('Authorization', '')
+    if token and secrets.compare_digest(auth.encode(), f'Bearer {token}'.encode()):
+        return True
+    return (await request.auser()).is_authenticated
+
+
+def _authentication_required():
+    response = JsonResponse({'error': 'authentication required'}, status=401)
+    response['WWW-Authenticate'] = 'Bearer'
+    return response
+
+
+@public_route
+@csrf_exempt
+@read_only_view
+@async_view
+@require_POST
+@gzip_page
+@negotiated
+async def residents_batch_api(request):
+    """
+    Several residents in one request (for scanner app queues). POST JSON
+    {"ids": [pk, ...], "resident_ids": ["00012", ...]} (up to BATCH_MAX_RESIDENTS in total); the
+    response lists them in request order, in the resident_api format, plus the keys not found.
+    Loaded with one query; gzip-compressed when the client accepts it. JSON or MessagePack.
+    Hands out many residents per call, so like residents_sync it requires SYNC_API_TOKEN or a
+    session (see _sync_allowed); anything else gets 401.
+    """
+    if not await _sync_allowed(request):
+        return _authentication_required()
+    try:
+        ids, resident_ids = _batch_keys(request)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    by_pk, by_resident_id = {}, {}
+    if ids or resident_ids:
+        async for resident in api_residents().filter(Q(pk__in=ids) | Q(resident_id__in=resident_ids)):
+            by_pk[resident.pk] = by_resident_id[resident.resident_id] = resident
+    found = [by_pk[pk] for pk in ids if pk in by_pk]
+    found += [by_resident_id[r] for r in resident_ids if r in by_resident_id]
+    found = list(dict.fromkeys(found))
+    missing = {
+        'ids': [pk for pk in ids if pk not in by_pk],
+        'resident_ids': [r for r in resident_ids if r not in by_resident_id],
     }
-    return JsonResponse(data)
+    if wants_compact(request):
+        return CompactResponse({
+            'rows': [resident_row(resident, request) for resident in found],
+            'barangays': barangay_pairs(found),
+            'missing': missing,
+        })
+    return JsonResponse({'results': [resident_data(resident, request) for resident in found], 'missing': missing})
+
+
+# The resident_data() fields a synced row carries: the barangay is sent once per page, and the age
+# and pdf_url are derived on the device.
+SYNC_FIELDS = [
+    'id', 'resident_id', 'full_name', 'profile_picture', 'contact_no', 'gender', 'status',
+    'date_of_birth', 'place_of_birth', 'address', 'purok', 'civil_status', 'occupation', 'citizenship',
+    'educational_attainment', 'health_status', 'economic_status', 'remarks', 'updated_at',
+]
+
+
+@public_route
+@async_view
+@negotiated
+async def residents_sync(request):
+    """
+    Residents of ?barangay=<pk> changed since ?cursor= (see app.sync), for the scanner
+    app's offline copy. Rows are lists in the order of "fields"; keep calling with the returned
+    cursor while "more" is true. ?limit= sets the page size (up to SYNC_MAX_PAGE_SIZE). In
+    MessagePack, rows use the app.compact layout and the barangay is [id, name, code].
+    Requires SYNC_API_TOKEN or a session (see _sync_allowed); anything else gets 401.
+    """
+    if not await _sync_allowed(request):
+        return _authentication_required()
+    try:
+        barangay_pk = int(request.GET.get('barangay', ''))
+    except ValueError:
+        return JsonResponse({'error': 'barangay is required'}, status=400)
+    try:
+        limit = int(request.GET.get('limit') or SYNC_PAGE_SIZE)
+    except ValueError:
+        limit = SYNC_PAGE_SIZE
+    limit = max(1, min(limit, SYNC_MAX_PAGE_SIZE))
+    barangay = await aget_object_or_404(Barangay, pk=barangay_pk)
+    page = await sync_page(barangay.pk, request.GET.get('cursor') or '', limit)
+    if wants_compact(request):
+        return CompactResponse({
+            'barangay': [barangay.pk, barangay.name, barangay.code],
+            'rows': [resident_row(resident, request) for resident in page['residents']],
+            'deleted': page['deleted'],
+            'cursor': page['cursor'],
+            'more': page['more'],
+            'reset': page['reset'],
+        })
+    return JsonResponse({
+        'barangay': {'id': barangay.pk, 'name': barangay.name, 'code': barangay.code},
+        'fields': SYNC_FIELDS,
+        'rows': [
+            [data[field] for field in SYNC_FIELDS]
+            for data in (resident_data(resident, request) for resident in page['residents'])
+        ],
+        'deleted': page['deleted'],
+        'cursor': page['cursor'],
+        'more': page['more'],
+        'reset': page['reset'],
+    })
+
+
+def _api_schema_etag(request):
+    return schema()['schema'] + ('-c' if wants_compact(request) else '')
+
+
+@public_route
+@negotiated
+@revalidated(_api_schema_etag)
+def api_schema(request):
+    """Public API: field layout and enum tables of the MessagePack responses (app.compact)."""
+    if wants_compact(request):
+        return CompactResponse(schema())
+    return JsonResponse(schema())
 
 
-def resident_profile(request, pk):
+@public_route
+@async_view
+async def resident_profile(request, pk):
     """Show profiling template when QR is scanned (profile picture, barangay, QR, economic status)."""
-    resident = get_object_or_404(Resident, pk=pk)
-    profile_picture_url = _resident_profile_url(resident, request)
+    resident = await aget_object_or_404(Resident.objects.select_related('barangay'), pk=pk)
+    profile_picture_url = resident_profile_url(resident, request)
     return render(request, 'app/profiling.html', {
         'resident': resident,
         'profile_picture_url': profile_picture_url,
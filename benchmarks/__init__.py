@@ -0,0 +1,9 @@
+"""
+Load-test and benchmark suite (no models).
+
+    python manage.py seed_benchmark_data --size 100k --seed 1
+    python manage.py run_benchmarks --output bench.json
+    python manage.py run_benchmarks --compare bench.json      # after a change
+    python manage.py benchmark_payloads                       # JSON vs MessagePack scanner APIs
+    python manage.py seed_benchmark_data --clear
+"""
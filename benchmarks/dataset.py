@@ -0,0 +1,138 @@
+"""
+Seeded, production-shaped benchmark data.
+
+seed_dataset() adds residents, barangay officials and User Activity rows in large batches
+(bulk_create, or COPY on PostgreSQL) using the generators in operations.fake_data, so 10k / 100k /
+1M rows take seconds to minutes instead of hours. The same --seed gives the same rows. Everything created here is tagged (resident remarks,
+activity description, bench_ usernames) so clear_dataset() removes only benchmark data.
+"""
+from django.contrib.auth import get_user_model
+from itertools import islice
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from administrator.models import UserActivity
+from operations.fake_data import (
+    AS_OF,
+    OFFICIAL_TITLES,
+    ResidentPlan,
+    create_activity,
+    create_officials,
+    create_residents,
+    next_resident_seq,
+)
+from operations.models import BarangayOfficial, Resident, ResidentTombstone
+from reference.models import Barangay, Municipality, Position
+from reports.sidebar import bump_sidebar_version
+
+User = get_user_model()
+
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+SEED_TAG = '[bench]'
+BENCH_USER_PREFIX = 'bench_'
+BATCH_SIZE = 5000
+
+
+def _ensure_reference_data(barangay_count):
+    """Active barangays and positions to attach rows to; create bench ones if there are too few."""
+    barangays = list(Barangay.objects.filter(is_active=True).order_by('pk'))
+    if len(barangays) < barangay_count:
+        municipality, _ = Municipality.objects.get_or_create(name='Bench Municipality')
+        existing = set(Barangay.objects.filter(municipality=municipality).values_list('name', flat=True))
+        Barangay.objects.bulk_create([
+            Barangay(name=f'Bench Barangay {i:03d}', municipality=municipality)
+            for i in range(barangay_count - len(barangays))
+            if f'Bench Barangay {i:03d}' not in existing
+        ])
+        barangays = list(Barangay.objects.filter(is_active=True).order_by('pk'))
+    positions = list(Position.objects.filter(is_active=True).order_by('pk'))
+    if not positions:
+        positions = Position.objects.bulk_create([Position(name=name) for name in OFFICIAL_TITLES])
+    return barangays, positions
+
+
+def _ensure_bench_users(count=5):
+    users = []
+    for i in range(count):
+        user, created = User.objects.get_or_create(username=f'{BENCH_USER_PREFIX}staff{i}')
+        if created:
+            user.set_unusable_password()
+            user.save(update_fields=['password'])
+        users.append(user)
+    return users
+
+
+def seed_dataset(residents, seed=1, barangays=50, activity_per_resident=1.0, officials_per_barangay=10,
+                 use_copy=None, workers=1, progress=None, as_of=AS_OF):
+    """
+    Add `residents` residents plus officials and activity rows. Returns a dict of row counts.
+    use_copy: None = COPY on PostgreSQL, bulk_create elsewhere.
+    as_of: reference date for ages and activity dates (see operations.fake_data).
+    progress: optional callable(message).
+    """
+    if use_copy is None:
+        use_copy = connection.vendor == 'postgresql'
+    report = progress or (lambda message: None)
+
+    with transaction.atomic():
+        barangay_list, positions = _ensure_reference_data(barangays)
+        users = _ensure_bench_users()
+    barangay_ids = [b.pk for b in barangay_list]
+
+    plan = ResidentPlan(
+        residents, seed, barangay_ids, first_seq=next_resident_seq(), batch_size=BATCH_SIZE,
+        remarks=SEED_TAG, use_copy=use_copy, as_of=as_of,
+    )
+    created = create_residents(plan, workers=workers, progress=report)
+
+    officials = create_officials(
+        barangay_ids, positions, officials_per_barangay, seed, resident_filter={'remarks': SEED_TAG}, as_of=as_of,
+    )
+    report(f'officials: {officials}')
+
+    activity = create_activity(
+        users, int(residents * activity_per_resident), seed,
+        description_prefix=f'{SEED_TAG} ', batch_size=BATCH_SIZE, progress=report, as_of=as_of,
+    )
+    return {'residents': created, 'officials': officials, 'activity': activity}
+
+
+def clear_dataset():
+    """Delete everything seed_dataset() created (reference rows it added are kept)."""
+    with transaction.atomic():
+        activity, _ = UserActivity.objects.filter(description__startswith=SEED_TAG).delete()
+        officials, _ = BarangayOfficial.objects.filter(resident__remarks=SEED_TAG).delete()
+        residents = _delete_residents(SEED_TAG)
+        transaction.on_commit(bump_sidebar_version)
+    return {'residents': residents, 'officials': officials, 'activity': activity}
+
+
+def _delete_residents(remarks):
+    """
+    Delete the residents with these remarks in one DELETE statement, writing the ResidentTombstone
+    rows the post_delete signal would, so synced devices drop them. Officials must already be gone:
+    nothing cascades. QuerySet.delete() would load up to a million rows and signal each one instead.
+    """
+    now = timezone.now()
+    rows = Resident.objects.filter(remarks=remarks).values_list('pk', 'barangay_id')
+    rows = rows.iterator(chunk_size=BATCH_SIZE)
+    while chunk := list(islice(rows, BATCH_SIZE)):
+        ResidentTombstone.objects.bulk_create(
+            ResidentTombstone(resident_pk=pk, barangay_pk=barangay_pk, deleted_at=now)
+            for pk, barangay_pk in chunk
+        )
+    quote = connection.ops.quote_name
+    column = Resident._meta.get_field('remarks').column
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {quote(Resident._meta.db_table)} WHERE {quote(column)} = %s', [remarks])
+        return cursor.rowcount
+
+
+def dataset_counts():
+    return {
+        'residents': Resident.objects.count(),
+        'officials': BarangayOfficial.objects.count(),
+        'activity': UserActivity.objects.count(),
+        'barangays': Barangay.objects.count(),
+    }
@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.dataset import dataset_counts
+from benchmarks.payloads import payload_targets, run
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare JSON and MessagePack responses of the scanner APIs: body size (raw and gzipped), '
+        'server latency and client decode time, as JSON. Seed data first with seed_benchmark_data '
+        '(the sync page only serves rows older than SYNC_SETTLE_SECONDS and needs SYNC_API_TOKEN).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Requests per endpoint and format (default 50)')
+        parser.add_argument('--endpoints', type=str, default='', help='Comma-separated subset of endpoint names')
+        parser.add_argument('--seed', type=int, default=1, help='Seed for picking residents and search terms (default 1)')
+        parser.add_argument('--output', type=str, default='', help='Write the JSON results to this file')
+
+    def handle(self, *args, **options):
+        targets = payload_targets()
+        if not targets:
+            raise CommandError('No residents; seed data first with seed_benchmark_data.')
+        if options['endpoints']:
+            wanted = [name.strip() for name in options['endpoints'].split(',') if name.strip()]
+            unknown = sorted(set(wanted) - set(targets))
+            if unknown:
+                raise CommandError(f'Unknown endpoints: {", ".join(unknown)}. Available: {", ".join(targets)}')
+            targets = {name: targets[name] for name in wanted}
+
+        results = run(
+            targets, requests=options['requests'], seed=options['seed'],
+            progress=lambda message: self.stdout.write(f'  {message}'),
+        )
+        results['meta']['dataset'] = dataset_counts()
+
+        text = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                fh.write(text + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+        else:
+            self.stdout.write(text)
@@ -0,0 +1,94 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.dataset import dataset_counts
+from benchmarks.runner import CONNECTION_MODES, INTERFACES, compare, connection_mode, default_targets, run
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the key pages and APIs with concurrent clients and report requests/s, latency '
+        'percentiles and queries per request as JSON. Seed data first with seed_benchmark_data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help='Requests per endpoint (default 100)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients (default 8)')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per endpoint (default 5)')
+        parser.add_argument('--endpoints', type=str, default='', help='Comma-separated subset of endpoint names')
+        parser.add_argument('--user', type=str, default='', help='Username to sign in as (default: first superuser)')
+        parser.add_argument('--base-url', type=str, default='', help='Benchmark a running server over HTTP instead of in-process')
+        parser.add_argument(
+            '--connection-mode', choices=CONNECTION_MODES, default='configured',
+            help='In-process only: override how DB connections are handled, e.g. run once with '
+                 'per-request and once with pool and --compare the two (default: as in settings)',
+        )
+        parser.add_argument(
+            '--interface', choices=INTERFACES, default='wsgi',
+            help='In-process only: send requests through the WSGI handler from threads (default) or the '
+                 'ASGI handler as asyncio tasks. Over HTTP, compare a gunicorn and a uvicorn worker instead',
+        )
+        parser.add_argument('--seed', type=int, default=1, help='Seed for picking residents and search terms (default 1)')
+        parser.add_argument('--output', type=str, default='', help='Write the JSON results to this file')
+        parser.add_argument('--compare', type=str, default='', help='Earlier JSON results to compare against')
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f'No user "{options["user"]}".')
+        else:
+            user = User.objects.filter(is_superuser=True, is_active=True).order_by('pk').first()
+            if user is None:
+                raise CommandError('No active superuser to sign in as; pass --user.')
+
+        targets = default_targets(seed=options['seed'])
+        if options['endpoints']:
+            wanted = [name.strip() for name in options['endpoints'].split(',') if name.strip()]
+            unknown = sorted(set(wanted) - set(targets))
+            if unknown:
+                raise CommandError(f'Unknown endpoints: {", ".join(unknown)}. Available: {", ".join(targets)}')
+            targets = {name: targets[name] for name in wanted}
+
+        mode = options['connection_mode']
+        if mode != 'configured' and options['base_url']:
+            raise CommandError('--connection-mode applies to in-process runs; configure the server instead.')
+        try:
+            with connection_mode(mode):
+                results = run(
+                    targets,
+                    requests=options['requests'],
+                    concurrency=options['concurrency'],
+                    user=user,
+                    base_url=options['base_url'] or None,
+                    seed=options['seed'],
+                    warmup=options['warmup'],
+                    progress=lambda message: self.stdout.write(f'  {message}'),
+                    interface=options['interface'],
+                )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        results['meta']['connection_mode'] = mode
+        results['meta']['dataset'] = dataset_counts()
+
+        text = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                fh.write(text + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+        else:
+            self.stdout.write(text)
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as fh:
+                baseline = json.load(fh)
+            self.stdout.write(self.style.SUCCESS(
+                f'\n=== Compared with {baseline.get("meta", {}).get("commit") or options["compare"]} ==='
+            ))
+            for name, metric, old, new, change in compare(baseline, results):
+                delta = f'{change:+.1f}%' if change is not None else 'n/a'
+                self.stdout.write(f'  {name:<28} {metric:<8} {old!s:>10} -> {new!s:<10} {delta}')
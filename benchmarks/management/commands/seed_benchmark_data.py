@@ -0,0 +1,58 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from benchmarks.dataset import SIZES, clear_dataset, dataset_counts, seed_dataset
+from operations.fake_data import AS_OF
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed residents, barangay officials and User Activity rows for load tests '
+        '(10k / 100k / 1m presets). Rows are tagged so --clear removes only benchmark data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=sorted(SIZES), default='10k', help='Preset number of residents (default 10k)')
+        parser.add_argument('--residents', type=int, help='Exact number of residents (overrides --size)')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed; the same seed gives the same rows (default 1)')
+        parser.add_argument(
+            '--as-of', type=date.fromisoformat, default=AS_OF,
+            help=f'Reference date (YYYY-MM-DD) for ages and activity dates (default {AS_OF:%Y-%m-%d})',
+        )
+        parser.add_argument('--barangays', type=int, default=50, help='Minimum number of active barangays (default 50)')
+        parser.add_argument('--activity-per-resident', type=float, default=1.0, help='User Activity rows per resident (default 1)')
+        parser.add_argument('--officials-per-barangay', type=int, default=10, help='Officials per barangay (default 10)')
+        parser.add_argument('--workers', type=int, default=1, help='Parallel insert processes (default 1; ignored on SQLite)')
+        parser.add_argument('--no-copy', action='store_true', help='Use bulk_create even on PostgreSQL')
+        parser.add_argument('--clear', action='store_true', help='Delete previously seeded benchmark rows and exit')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            removed = clear_dataset()
+            self.stdout.write(self.style.SUCCESS(f'Removed benchmark rows: {removed}'))
+            return
+
+        residents = options['residents'] if options['residents'] is not None else SIZES[options['size']]
+        if residents < 0:
+            raise CommandError('--residents must be positive.')
+
+        start = time.monotonic()
+        created = seed_dataset(
+            residents,
+            seed=options['seed'],
+            barangays=options['barangays'],
+            activity_per_resident=options['activity_per_resident'],
+            officials_per_barangay=options['officials_per_barangay'],
+            use_copy=False if options['no_copy'] else None,
+            workers=options['workers'] if connection.vendor != 'sqlite' else 1,
+            progress=lambda message: self.stdout.write(f'  {message}'),
+            as_of=options['as_of'],
+        )
+        elapsed = time.monotonic() - start
+        rate = created['residents'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} in {elapsed:.1f}s ({rate:,.0f} residents/s). Totals now: {dataset_counts()}'
+        ))
@@ -0,0 +1,112 @@
+"""
+JSON vs MessagePack (app.compact) comparison for the scanner APIs.
+
+Each target is requested `requests` times in each format through Django's test Client, one
+request at a time. Results hold the body size (raw and gzip-compressed, as sent by a server that
+compresses), the server latency and the time to decode the body on the client side. Requests carry
+SYNC_API_TOKEN like the scanner app does; without it the sync and batch endpoints answer 401.
+"""
+import gzip
+import json
+import random
+import time
+
+import msgpack
+from django.conf import settings
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from operations.models import Resident
+from reference.models import Barangay
+
+from .runner import _git_commit, _percentile
+
+FORMATS = {
+    'json': ('application/json', json.loads),
+    'msgpack': ('application/x-msgpack', msgpack.unpackb),
+}
+BATCH_SIZE = 100
+
+
+def payload_targets():
+    """{name: make_request(rng) -> (method, path, JSON body or None)}, or {} without residents."""
+    pks = list(Resident.objects.order_by('pk').values_list('pk', flat=True)[:5000])
+    barangay = Barangay.objects.filter(residents__isnull=False).order_by('pk').values_list('pk', flat=True).first()
+    if not pks:
+        return {}
+    sync = reverse('app:residents_sync')
+    return {
+        'resident': lambda r: ('GET', reverse('app:resident_api', kwargs={'pk': r.choice(pks)}), None),
+        'search': lambda r: ('GET', reverse('app:residents_search') + '?q=' + r.choice(['san', 'cruz', 'maria']), None),
+        f'batch_{BATCH_SIZE}': lambda r: ('POST', reverse('app:residents_batch'), {'ids': r.sample(pks, min(BATCH_SIZE, len(pks)))}),
+        'sync_page': lambda r: ('GET', f'{sync}?barangay={barangay}&limit=500', None),
+    }
+
+
+def _measure(client, method, path, body, media_type, decode):
+    headers = {'accept': media_type, 'accept-encoding': 'identity'}
+    if getattr(settings, 'SYNC_API_TOKEN', ''):
+        headers['authorization'] = f'Bearer {settings.SYNC_API_TOKEN}'  # sync and batch need it
+    start = time.perf_counter()
+    if method == 'POST':
+        response = client.post(path, body, content_type='application/json', headers=headers)
+    else:
+        response = client.get(path, headers=headers)
+    served = (time.perf_counter() - start) * 1000
+    content = response.content
+    start = time.perf_counter()
+    decode(content)
+    decoded = (time.perf_counter() - start) * 1000
+    return served, decoded, len(content), len(gzip.compress(content)), response.status_code
+
+
+def _summary(samples):
+    served = sorted(s[0] for s in samples)
+    decoded = sorted(s[1] for s in samples)
+    n = len(samples)
+    return {
+        'requests': n,
+        'non_2xx': sum(1 for s in samples if not 200 <= s[4] < 300),
+        'bytes_mean': round(sum(s[2] for s in samples) / n),
+        'gzip_bytes_mean': round(sum(s[3] for s in samples) / n),
+        'server_ms': {'p50': round(_percentile(served, 50), 2), 'p95': round(_percentile(served, 95), 2)},
+        'decode_ms': {'p50': round(_percentile(decoded, 50), 3), 'p95': round(_percentile(decoded, 95), 3)},
+    }
+
+
+def _saved(before, after):
+    return round((before - after) / before * 100, 1) if before else None
+
+
+def run(targets, requests=50, seed=1, progress=None):
+    """Compare the formats on each target; returns {'meta': ..., 'endpoints': {name: {...}}}."""
+    report = progress or (lambda message: None)
+    client = Client(raise_request_exception=False)
+    results = {}
+    for name, make_request in targets.items():
+        calls = [make_request(random.Random(f'{seed}:{name}:{i}')) for i in range(requests + 1)]
+        endpoint = {}
+        for format_name, (media_type, decode) in FORMATS.items():
+            _measure(client, *calls[0], media_type, decode)  # warm-up
+            endpoint[format_name] = _summary([_measure(client, *call, media_type, decode) for call in calls[1:]])
+        endpoint['bytes_saved_pct'] = _saved(endpoint['json']['bytes_mean'], endpoint['msgpack']['bytes_mean'])
+        endpoint['gzip_bytes_saved_pct'] = _saved(
+            endpoint['json']['gzip_bytes_mean'], endpoint['msgpack']['gzip_bytes_mean'],
+        )
+        results[name] = endpoint
+        report(
+            f'{name}: {endpoint["json"]["bytes_mean"]} -> {endpoint["msgpack"]["bytes_mean"]} bytes '
+            f'({endpoint["bytes_saved_pct"]}% smaller, {endpoint["gzip_bytes_saved_pct"]}% gzipped), '
+            f'server p50 {endpoint["json"]["server_ms"]["p50"]} -> {endpoint["msgpack"]["server_ms"]["p50"]} ms'
+        )
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': timezone.now().isoformat(),
+            'database': settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1],
+            'requests_per_format': requests,
+            'seed': seed,
+        },
+        'endpoints': results,
+    }
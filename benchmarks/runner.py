@@ -0,0 +1,319 @@
+"""
+Concurrent endpoint load runner.
+
+Each target is requested `requests` times by `concurrency` worker threads. By default requests go
+through Django's test Client inside this process (no server needed) and SQL is counted on the
+worker's own connection. interface='asgi' sends them through Django's ASGI handler instead, as
+`concurrency` asyncio tasks on one event loop (like one ASGI worker; queries are not counted). With
+base_url they go over HTTP to a running server; query counts then come from the Server-Timing
+header (set INSTRUMENTATION_SERVER_TIMING = True on that server).
+Results are plain dicts so they can be written as JSON and compared between commits.
+"""
+import asyncio
+import copy
+import random
+import re
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connection, connections
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from operations.models import Resident
+from reference.models import Barangay
+
+_SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+REPORT_NAMES = [
+    'list_male', 'list_female', 'list_pwd', 'list_solo_parent', 'list_senior_citizen',
+    'list_4ps_member', 'list_voters', 'list_residents_record', 'list_deceased', 'list_birth_by_year',
+]
+
+
+def default_targets(seed=1):
+    """
+    {name: make_path(rng)} for the key pages and APIs. Resident-specific endpoints pick a
+    random resident per request so caches and indexes see a realistic spread.
+    """
+    rng = random.Random(seed)
+    resident_pks = []
+    max_pk = Resident.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    min_pk = Resident.objects.order_by('pk').values_list('pk', flat=True).first() or 0
+    if max_pk:
+        # Sample without ORDER BY random(): cheap on a million rows.
+        probes = sorted({rng.randint(min_pk, max_pk) for _ in range(400)})
+        resident_pks = list(Resident.objects.filter(pk__in=probes).values_list('pk', flat=True))
+    barangay = (
+        Barangay.objects.filter(residents__is_voter=True).order_by('pk').values_list('pk', flat=True).first()
+        or Barangay.objects.order_by('pk').values_list('pk', flat=True).first()
+    )
+
+    def resident_path(url_name):
+        return lambda r: reverse(url_name, kwargs={'pk': r.choice(resident_pks)}) if resident_pks else None
+
+    targets = {
+        'residents_record': lambda r: reverse('operations:residents_record'),
+        'dashboard': lambda r: reverse('mainapplication:dashboard'),
+        'voters_api': lambda r: reverse('operations:get_voters_by_barangay', kwargs={'pk': barangay}) if barangay else None,
+        'search': lambda r: reverse('app:residents_search') + '?q=' + r.choice(['san', 'cruz', 'maria', 'juan', 'rey']),
+        'qr': resident_path('operations:resident_qr'),
+        'profile_pdf': resident_path('app:resident_profile_pdf'),
+        'scanner_api': resident_path('app:resident_api'),
+        'scanner_profile': resident_path('app:resident_profile'),
+    }
+    for name in REPORT_NAMES:
+        targets[f'report_{name[5:]}'] = (lambda url_name: lambda r: reverse(url_name))(f'reports:{name}')
+    return targets
+
+
+CONNECTION_MODES = ('configured', 'per-request', 'persistent', 'pool')
+INTERFACES = ('wsgi', 'asgi')
+
+
+@contextmanager
+def connection_mode(mode, alias=DEFAULT_DB_ALIAS):
+    """
+    Run in-process benchmarks with a different connection strategy than settings.py:
+    per-request (new connection per request), persistent (CONN_MAX_AGE=60) or pool
+    (psycopg 3 pool sized to the worker count). Worker threads started inside the block
+    build their connections from the patched settings.
+    """
+    if mode == 'configured':
+        yield
+        return
+    original = connections.settings[alias]
+    patched = copy.copy(original)
+    patched['OPTIONS'] = {k: v for k, v in original.get('OPTIONS', {}).items() if k != 'pool'}
+    patched['CONN_MAX_AGE'] = 60 if mode == 'persistent' else 0
+    if mode == 'pool':
+        if patched['ENGINE'] != 'django.db.backends.postgresql':
+            raise ValueError('Connection pooling needs PostgreSQL with psycopg 3.')
+        patched['OPTIONS']['pool'] = {
+            'min_size': 2,
+            'max_size': max(getattr(settings, 'DB_POOL_MAX_SIZE', 4), 2),
+            'timeout': getattr(settings, 'DB_POOL_TIMEOUT', 10.0),
+        }
+    connections.settings[alias] = patched
+    try:
+        yield
+    finally:
+        if mode == 'pool':
+            connections.create_connection(alias).close_pool()
+        connections.settings[alias] = original
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def summarise(samples, elapsed):
+    """samples: list of (ms, status, bytes, queries or None)."""
+    latencies = sorted(s[0] for s in samples)
+    queries = [s[3] for s in samples if s[3] is not None]
+    n = len(samples) or 1
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for s in samples if s[1] >= 500 or s[1] == 0),
+        'non_2xx': sum(1 for s in samples if not 200 <= s[1] < 400),
+        'rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': {
+            'mean': round(sum(latencies) / n, 2),
+            'p50': round(_percentile(latencies, 50), 2),
+            'p90': round(_percentile(latencies, 90), 2),
+            'p95': round(_percentile(latencies, 95), 2),
+            'p99': round(_percentile(latencies, 99), 2),
+            'max': round(latencies[-1], 2) if latencies else 0.0,
+        },
+        'queries': {
+            'mean': round(sum(queries) / len(queries), 2) if queries else None,
+            'max': max(queries) if queries else None,
+        },
+        'bytes_mean': round(sum(s[2] for s in samples) / n),
+    }
+
+
+class _InProcessWorker:
+    def __init__(self, user):
+        self.client = Client(raise_request_exception=False)
+        if user is not None:
+            self.client.force_login(user)
+
+    def get(self, path):
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(path)
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+        return (time.perf_counter() - start) * 1000, response.status_code, len(body), len(ctx.captured_queries)
+
+
+class _AsgiWorker:
+    """In-process requests through the ASGI handler. Like an ASGI server, each request gets its own DB thread."""
+
+    def __init__(self, user):
+        self.client = AsyncClient(raise_request_exception=False)
+        if user is not None:
+            self.client.force_login(user)
+
+    async def get(self, path):
+        start = time.perf_counter()
+        async with ThreadSensitiveContext():
+            response = await self.client.get(path)
+            if not response.streaming:
+                body = response.content
+            elif response.is_async:
+                body = b''.join([chunk async for chunk in response.streaming_content])
+            else:
+                body = b''.join(response.streaming_content)
+            await sync_to_async(close_old_connections)()  # request_finished, on the request's thread
+        return (time.perf_counter() - start) * 1000, response.status_code, len(body), None
+
+
+def _drive_asgi(worker, paths, concurrency):
+    async def main():
+        slots = asyncio.Semaphore(concurrency)
+
+        async def one(path):
+            async with slots:
+                return await worker.get(path)
+
+        return await asyncio.gather(*(one(path) for path in paths))
+
+    return asyncio.run(main())
+
+
+class _HttpWorker:
+    def __init__(self, base_url, session_cookie):
+        self.base_url = base_url.rstrip('/')
+        self.headers = {'Cookie': f'{settings.SESSION_COOKIE_NAME}={session_cookie}'} if session_cookie else {}
+
+    def get(self, path):
+        request = urllib.request.Request(self.base_url + path, headers=self.headers)
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                body = response.read()
+                status, timing = response.status, response.headers.get('Server-Timing', '')
+        except urllib.error.HTTPError as exc:
+            body, status, timing = exc.read(), exc.code, exc.headers.get('Server-Timing', '')
+        except OSError:
+            return (time.perf_counter() - start) * 1000, 0, 0, None
+        match = _SERVER_TIMING_QUERIES.search(timing)
+        return (time.perf_counter() - start) * 1000, status, len(body), int(match.group(1)) if match else None
+
+
+def run(
+    targets, requests=200, concurrency=8, user=None, base_url=None, seed=1, warmup=5, progress=None,
+    interface='wsgi',
+):
+    """
+    Drive each target and return {'meta': ..., 'endpoints': {name: summary}}.
+    user: account the workers sign in as (an Admin sees every page).
+    """
+    report = progress or (lambda message: None)
+    if interface not in INTERFACES:
+        raise ValueError(f'interface must be one of {INTERFACES}.')
+    if interface == 'asgi' and base_url:
+        raise ValueError('interface applies to in-process runs; run the server under ASGI instead.')
+    session_cookie = None
+    if base_url and user is not None:
+        client = Client()
+        client.force_login(user)  # writes a session row the server can read
+        session_cookie = client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    local = threading.local()
+
+    def worker():
+        if not hasattr(local, 'worker'):
+            local.worker = _HttpWorker(base_url, session_cookie) if base_url else _InProcessWorker(user)
+        return local.worker
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        if interface == 'asgi':
+            asgi_worker = _AsgiWorker(user)
+
+            def fetch(paths):
+                return _drive_asgi(asgi_worker, paths, concurrency)
+        else:
+            def fetch(paths):
+                return list(pool.map(lambda p: worker().get(p), paths))
+
+        for name, make_path in targets.items():
+            rng = random.Random(f'{seed}:{name}')
+            paths = [make_path(rng) for _ in range(requests + warmup)]
+            if not paths or paths[0] is None:
+                report(f'{name}: skipped (no data)')
+                continue
+            fetch(paths[:warmup])
+            start = time.perf_counter()
+            samples = fetch(paths[warmup:])
+            elapsed = time.perf_counter() - start
+            results[name] = summarise(samples, elapsed)
+            report(
+                f'{name}: {results[name]["rps"]} req/s, p95 {results[name]["latency_ms"]["p95"]} ms, '
+                f'{results[name]["queries"]["mean"]} queries'
+            )
+
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': timezone.now().isoformat(),
+            'mode': 'http' if base_url else 'in-process',
+            'interface': '' if base_url else interface,
+            'base_url': base_url or '',
+            'database': connection.vendor,
+            'db_pool': bool(connections.settings[DEFAULT_DB_ALIAS].get('OPTIONS', {}).get('pool')),
+            'conn_max_age': connections.settings[DEFAULT_DB_ALIAS].get('CONN_MAX_AGE'),
+            'get_transactions': (
+                'atomic' if connections.settings[DEFAULT_DB_ALIAS].get('ATOMIC_REQUESTS')
+                else getattr(settings, 'SAFE_REQUEST_TRANSACTIONS', 'autocommit')
+            ),
+            'requests_per_endpoint': requests,
+            'concurrency': concurrency,
+            'seed': seed,
+        },
+        'endpoints': results,
+    }
+
+
+def compare(baseline, current):
+    """Rows of (endpoint, metric, before, after, change %) for endpoints present in both runs."""
+    rows = []
+    for name, now in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if not before:
+            continue
+        for label, get in (
+            ('rps', lambda d: d['rps']),
+            ('p95 ms', lambda d: d['latency_ms']['p95']),
+            ('queries', lambda d: d['queries']['mean']),
+        ):
+            old, new = get(before), get(now)
+            change = ((new - old) / old * 100) if old and new is not None else None
+            rows.append((name, label, old, new, change))
+    return rows
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
@@ -3,6 +3,16 @@ ASGI config for main project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The scanner API (app.views) is async, and every middleware in settings.MIDDLEWARE can run async, so
+under an ASGI server one worker keeps many of those requests in flight while they wait on the
+database; sync views still run, each in a thread. For example (needs uvicorn-worker):
+
+    gunicorn main.asgi:application -k uvicorn_worker.UvicornWorker -w 4
+
+Each ASGI request runs its queries on its own thread, so persistent connections (CONN_MAX_AGE)
+would pile up; set DB_POOL=True to reuse connections through psycopg's pool instead.
+Compare with the WSGI server using run_benchmarks (--interface asgi, or --base-url against each).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -0,0 +1,88 @@
+"""
+Conditional GET for JSON endpoints.
+
+@revalidated(etag_func) wraps Django's condition(): etag_func(request, *args, **kwargs) computes the
+ETag from updated_at with one small query, and a matching If-None-Match is answered with 304 before
+the view builds its payload. Responses carry Cache-Control: private, no-cache, so browsers and the
+scanner app keep the body and revalidate on every use. etag_func returns None to skip the check
+(e.g. the object does not exist and the view should 404).
+
+row_etag() covers detail endpoints and list_etag() list endpoints: the newest updated_at plus the
+row count, so a deleted row changes the tag too. Bump PAYLOAD_VERSION when a payload's shape
+changes, so clients holding an old tag refetch.
+
+Async views take an async etag_func (e.g. using arow_etag): condition() would call it synchronously.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition
+
+from .instrumentation import metrics
+
+PAYLOAD_VERSION = 3
+
+
+def make_etag(*parts):
+    return hashlib.blake2b(repr((PAYLOAD_VERSION,) + parts).encode(), digest_size=12).hexdigest()
+
+
+def row_etag(queryset, *fields):
+    """ETag from fields (e.g. 'updated_at', 'barangay__updated_at') of the first row, or None if there is none."""
+    row = queryset.values_list(*fields).first()
+    return None if row is None else make_etag(queryset.model._meta.label, *row)
+
+
+async def arow_etag(queryset, *fields):
+    """Async row_etag()."""
+    row = await queryset.values_list(*fields).afirst()
+    return None if row is None else make_etag(queryset.model._meta.label, *row)
+
+
+def list_etag(queryset, *extra):
+    """ETag from the newest updated_at and the number of rows in queryset (unsliced)."""
+    stats = queryset.order_by().aggregate(newest=Max('updated_at'), rows=Count('pk'))
+    return make_etag(queryset.model._meta.label, stats['newest'], stats['rows'], *extra)
+
+
+def _finish(request, response):
+    if response.status_code in (200, 304):
+        patch_cache_control(response, private=True, no_cache=True)
+    if 'HTTP_IF_NONE_MATCH' in request.META:
+        metrics.record_cache('conditional_get', response.status_code == 304)
+    return response
+
+
+def revalidated(etag_func):
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                etag = None
+                if request.method in ('GET', 'HEAD'):
+                    etag = await etag_func(request, *args, **kwargs)
+                    etag = quote_etag(etag) if etag else None
+                    not_modified = get_conditional_response(request, etag=etag)
+                    if not_modified is not None:
+                        not_modified['ETag'] = etag
+                        return _finish(request, not_modified)
+                response = await view_func(request, *args, **kwargs)
+                if etag and response.status_code == 200 and not response.has_header('ETag'):
+                    response['ETag'] = etag
+                return _finish(request, response)
+
+            return async_wrapper
+
+        conditional_view = condition(etag_func=etag_func)(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            return _finish(request, conditional_view(request, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
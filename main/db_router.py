@@ -0,0 +1,107 @@
+"""
+Read-replica routing.
+
+When a 'replica' database is configured (DB_REPLICA_HOST, see settings), ReplicaRoutingMiddleware
+marks GET/HEAD requests to the views in DB_REPLICA_VIEWS (reports, dashboard, app APIs, voter
+lists) and ReplicaRouter sends their reads to the replica. Everything else and every write stays
+on 'default'; GET views marked @atomic_view (they write) are never routed. The replica is skipped
+when:
+  - its replication lag is above DB_REPLICA_MAX_LAG seconds, or it cannot be reached
+    (checked at most every DB_REPLICA_LAG_CHECK_SECONDS per process);
+  - the browser wrote within the last DB_REPLICA_STICKY_SECONDS (the PIN_PRIMARY_COOKIE set after
+    a POST), so a user sees their own edit on the next page.
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from .instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+REPLICA_ALIAS = 'replica'
+PIN_PRIMARY_COOKIE = 'db_pin_primary'
+
+replica_reads = ContextVar('replica_reads', default=False)  # set per request by the middleware
+
+# NULL when the server is not a standby (e.g. the replica alias points at the primary).
+_LAG_SQL = (
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+class _LagMonitor:
+    """Per-process cache of the replica's replication lag (None = unreachable)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self.lag = None
+
+    def measure(self):
+        connection = connections[REPLICA_ALIAS]
+        try:
+            if connection.vendor != 'postgresql':
+                return 0.0
+            with connection.cursor() as cursor:
+                cursor.execute(_LAG_SQL)
+                lag = cursor.fetchone()[0]
+            return float(lag or 0)
+        except DatabaseError as exc:
+            logger.warning('Read replica unavailable, using the primary: %s', exc)
+            connection.close()
+            return None
+
+    def current(self):
+        interval = getattr(settings, 'DB_REPLICA_LAG_CHECK_SECONDS', 5)
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < interval:
+                return self.lag
+            self._checked_at = now  # other threads keep the old value while this one measures
+        self.lag = self.measure()
+        return self.lag
+
+    def reset(self):
+        with self._lock:
+            self._checked_at = None
+            self.lag = None
+
+
+lag_monitor = _LagMonitor()
+
+
+def replica_usable():
+    lag = lag_monitor.current()
+    return lag is not None and lag <= getattr(settings, 'DB_REPLICA_MAX_LAG', 5)
+
+
+class ReplicaRouter:
+    """Reads go to the replica only while replica_reads is set and the replica is fresh enough."""
+
+    def db_for_read(self, model, **hints):
+        if not replica_reads.get():
+            return None
+        if replica_usable():
+            metrics.inc('db_reads_routed', {'alias': REPLICA_ALIAS})
+            return REPLICA_ALIAS
+        metrics.inc('db_reads_routed', {'alias': DEFAULT_DB_ALIAS})
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # both aliases hold the same data
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS  # the replica is populated by replication
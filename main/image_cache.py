@@ -0,0 +1,143 @@
+"""
+Shared on-disk cache for remote images (Supabase profile pictures) used by PDF and document generation.
+
+fetch_image(url) returns a local file path. A copy younger than IMAGE_CACHE_SECONDS is used as is;
+an older one is revalidated with If-None-Match / If-Modified-Since, so an unchanged picture costs a
+304 and no body. Pass not_before (e.g. resident.updated_at) to revalidate copies fetched before the
+record last changed: profile pictures are re-uploaded under the same URL. Each thread keeps one
+keep-alive connection per host, so repeat fetches skip TCP and TLS setup. Files live under
+FILE_CACHE_ROOT/images and are shared by every worker process on the machine.
+"""
+import hashlib
+import http.client
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+from urllib.request import url2pathname
+
+from django.conf import settings
+
+from .instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_MAX_REDIRECTS = 3
+
+
+def cache_root():
+    return Path(getattr(settings, 'FILE_CACHE_ROOT', Path(settings.BASE_DIR) / '.cache'))
+
+
+def _connection(scheme, netloc):
+    connections = _local.__dict__.setdefault('connections', {})
+    conn = connections.get((scheme, netloc))
+    if conn is None:
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        conn = connections[(scheme, netloc)] = cls(netloc, timeout=10)
+    return conn
+
+
+def _drop_connection(scheme, netloc):
+    conn = _local.__dict__.get('connections', {}).pop((scheme, netloc), None)
+    if conn is not None:
+        conn.close()
+
+
+def _get(url, headers):
+    """GET url on a reused connection. Returns (status, headers, body); follows a few redirects."""
+    for _ in range(_MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f'Unsupported image URL: {url!r}')
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        for attempt in range(2):
+            conn = _connection(parts.scheme, parts.netloc)
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                _drop_connection(parts.scheme, parts.netloc)  # server closed the idle connection
+                if attempt:
+                    raise
+        if response.will_close:
+            _drop_connection(parts.scheme, parts.netloc)
+        if response.status in (301, 302, 303, 307, 308) and response.headers.get('Location'):
+            url = urljoin(url, response.headers['Location'])
+            continue
+        return response.status, response.headers, body
+    raise http.client.HTTPException(f'Too many redirects for {url!r}')
+
+
+def _write_atomic(path, data):
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    tmp.write_bytes(data)
+    os.replace(tmp, path)  # readers never see a half-written file
+
+
+def _local_file(url):
+    """Path for file:// and MEDIA_URL-relative URLs (the storage emulator's), else None."""
+    parts = urlsplit(url)
+    if parts.scheme == 'file':
+        return Path(url2pathname(parts.path))
+    if not parts.scheme and parts.path.startswith(settings.MEDIA_URL):
+        root = Path(settings.MEDIA_ROOT).resolve()
+        path = (root / parts.path[len(settings.MEDIA_URL):]).resolve()
+        return path if root in path.parents else None
+    return None
+
+
+def fetch_image(url, not_before=None):
+    """Local path of the image at url, or None if it cannot be fetched and nothing is cached."""
+    if not url:
+        return None
+    local = _local_file(url)
+    if local is not None:
+        return local if local.exists() else None
+    directory = cache_root() / 'images'
+    path = directory / hashlib.sha256(url.encode()).hexdigest()
+    meta_path = path.with_suffix('.json')
+    headers = {}
+    if path.exists():
+        fetched_at = path.stat().st_mtime
+        fresh = time.time() - fetched_at < getattr(settings, 'IMAGE_CACHE_SECONDS', 86400)
+        if fresh and (not_before is None or fetched_at >= not_before.timestamp()):
+            metrics.record_cache('image', True)
+            return path
+        try:
+            validators = json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            validators = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+    try:
+        status, response_headers, body = _get(url, headers)
+    except (http.client.HTTPException, OSError, ValueError) as exc:
+        logger.warning('Image fetch failed for %s: %s', url, exc)
+        return path if path.exists() else None  # a stale copy beats no picture
+
+    if status == 304 and path.exists():
+        os.utime(path)
+        metrics.record_cache('image', True)
+        return path
+    if status != 200:
+        logger.warning('Image fetch for %s returned HTTP %s', url, status)
+        return None
+    directory.mkdir(parents=True, exist_ok=True)
+    _write_atomic(path, body)
+    _write_atomic(meta_path, json.dumps({
+        'url': url,
+        'etag': response_headers.get('ETag', ''),
+        'last_modified': response_headers.get('Last-Modified', ''),
+    }).encode())
+    metrics.record_cache('image', False)
+    return path
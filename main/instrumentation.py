@@ -0,0 +1,315 @@
+"""
+In-process request metrics for RequestInstrumentationMiddleware.
+
+Per URL name we keep a fixed-bucket latency histogram plus totals for DB time, query count
+and response size, and process-wide we keep the N slowest SQL statements. Memory stays
+bounded no matter how long the process runs; percentiles are estimated from the buckets.
+Other code can add labelled counters (metrics.inc) and histograms (metrics.observe), e.g.
+cache hits or Supabase uploads. prometheus_text() renders everything for the /metrics endpoint.
+Numbers are per worker process and reset on restart.
+"""
+import heapq
+import threading
+
+from django.db.backends.signals import connection_created
+
+# Upper bounds (milliseconds) of the latency buckets; the last bucket is open-ended.
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 75, 100, 150, 250, 400, 600, 1000, 1500, 2500, 5000, 10000)
+
+# HELP text for counters (metrics.inc) and histograms (metrics.observe) in prometheus_text().
+METRIC_HELP = {
+    'db_queries': 'SQL queries run by requests.',
+    'db_seconds': 'Time requests spent in SQL.',
+    'db_connections_opened': 'Database connections opened.',
+    'db_reads_routed': 'Read-only requests routed to each database.',
+    'cache_requests': 'Cache lookups by cache and result.',
+    'supabase_upload_failures': 'Failed Supabase Storage uploads.',
+    'supabase_upload': 'Supabase Storage upload latency.',
+}
+
+
+class Histogram:
+    """Cumulative-friendly fixed-bucket histogram of millisecond values."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, pct):
+        """Estimate the pct (0-100) percentile by interpolating inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = self.count * pct / 100.0
+        seen = 0
+        lower = 0.0
+        for i, n in enumerate(self.counts):
+            upper = self.bounds[i] if i < len(self.bounds) else self.max
+            if n and seen + n >= rank:
+                fraction = (rank - seen) / n
+                return min(lower + (upper - lower) * fraction, self.max)
+            seen += n
+            lower = upper
+        return self.max
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.db_ms = 0.0
+        self.queries = 0
+        self.response_bytes = 0
+        self.errors = 0
+
+    def as_dict(self, name):
+        n = self.latency.count or 1
+        return {
+            'name': name,
+            'count': self.latency.count,
+            'p50': self.latency.percentile(50),
+            'p95': self.latency.percentile(95),
+            'p99': self.latency.percentile(99),
+            'max': self.latency.max,
+            'avg_ms': self.latency.total / n,
+            'avg_db_ms': self.db_ms / n,
+            'avg_queries': self.queries / n,
+            'avg_bytes': self.response_bytes / n,
+            'errors': self.errors,
+        }
+
+
+class MetricsStore:
+    """Thread-safe registry of EndpointStats keyed by URL name, plus the slowest SQL."""
+
+    def __init__(self, slow_sql_limit=20):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._slow_sql = []  # min-heap of (duration_ms, seq, entry)
+        self._seq = 0
+        self._counters = {}  # (name, labels) -> float
+        self._histograms = {}  # (name, labels) -> Histogram
+        self.slow_sql_limit = slow_sql_limit
+
+    def inc(self, name, labels=None, value=1):
+        """Add value to the counter name{labels}."""
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value_ms, labels=None):
+        """Record value_ms in the histogram name{labels}."""
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram()
+            hist.observe(value_ms)
+
+    def record_cache(self, cache, hit):
+        """Count one lookup in a named cache (exported as a hit ratio)."""
+        self.inc('cache_requests', {'cache': cache, 'result': 'hit' if hit else 'miss'})
+
+    def record_request(self, name, duration_ms, db_ms, queries, response_bytes, status_code):
+        with self._lock:
+            stats = self._endpoints.get(name)
+            if stats is None:
+                stats = self._endpoints[name] = EndpointStats()
+            stats.latency.observe(duration_ms)
+            for key, value in ((('db_queries', ()), queries), (('db_seconds', ()), db_ms / 1000.0)):
+                self._counters[key] = self._counters.get(key, 0) + value
+            stats.db_ms += db_ms
+            stats.queries += queries
+            stats.response_bytes += response_bytes
+            if status_code >= 500:
+                stats.errors += 1
+
+    def record_sql(self, sql, duration_ms, name):
+        with self._lock:
+            if len(self._slow_sql) >= self.slow_sql_limit and duration_ms <= self._slow_sql[0][0]:
+                return
+            self._seq += 1
+            entry = {'sql': sql[:2000], 'duration_ms': duration_ms, 'name': name}
+            item = (duration_ms, self._seq, entry)
+            if len(self._slow_sql) < self.slow_sql_limit:
+                heapq.heappush(self._slow_sql, item)
+            else:
+                heapq.heapreplace(self._slow_sql, item)
+
+    def endpoints(self):
+        """List of per-endpoint summaries, slowest p95 first."""
+        with self._lock:
+            rows = [stats.as_dict(name) for name, stats in self._endpoints.items()]
+        return sorted(rows, key=lambda r: r['p95'], reverse=True)
+
+    def histograms(self):
+        """Snapshot of {name: (bounds, bucket counts, count, total_ms)} for exporters."""
+        with self._lock:
+            return {
+                name: (s.latency.bounds, list(s.latency.counts), s.latency.count, s.latency.total)
+                for name, s in self._endpoints.items()
+            }
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def named_histograms(self):
+        """Snapshot of {(name, labels): (bounds, bucket counts, count, total_ms)}."""
+        with self._lock:
+            return {
+                key: (h.bounds, list(h.counts), h.count, h.total)
+                for key, h in self._histograms.items()
+            }
+
+    def slow_sql(self):
+        with self._lock:
+            return [entry for _, _, entry in sorted(self._slow_sql, reverse=True)]
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._slow_sql.clear()
+            self._counters.clear()
+            self._histograms.clear()
+
+
+metrics = MetricsStore()
+
+
+def _count_new_connection(sender, connection, **kwargs):
+    metrics.inc('db_connections_opened', {'alias': connection.alias})
+
+
+connection_created.connect(_count_new_connection, dispatch_uid='main.instrumentation.connection_created')
+
+
+def db_pool_stats():
+    """{alias: psycopg_pool stats dict} for every open pool (connections configured with DB_POOL)."""
+    from django.db import connections
+
+    stats = {}
+    for conn in connections.all():
+        pool = getattr(conn, 'pool', None)  # PostgreSQL backend with OPTIONS['pool'] only
+        if pool is not None and not pool.closed:  # opened by the first request that needs it
+            stats[conn.alias] = pool.get_stats()
+    return stats
+
+
+def db_pool_gauges():
+    """Pool size, availability, saturation and wait totals as prometheus_text() gauges."""
+    gauges = []
+    for alias, s in db_pool_stats().items():
+        labels = {'alias': alias}
+        in_use = s.get('pool_size', 0) - s.get('pool_available', 0)
+        pool_max = s.get('pool_max') or 1
+        gauges += [
+            ('db_pool_max', 'Maximum connections in this worker\'s pool.', labels, s.get('pool_max', 0)),
+            ('db_pool_size', 'Connections currently open in the pool.', labels, s.get('pool_size', 0)),
+            ('db_pool_in_use', 'Connections lent out to requests.', labels, in_use),
+            ('db_pool_saturation', 'In-use connections / pool max (1 = saturated).', labels, in_use / pool_max),
+            ('db_pool_requests_waiting', 'Requests queued for a free connection right now.', labels,
+             s.get('requests_waiting', 0)),
+            ('db_pool_requests_queued', 'Requests that had to wait for a connection since start.', labels,
+             s.get('requests_queued', 0)),
+            ('db_pool_wait_seconds', 'Total time requests waited for a connection since start.', labels,
+             s.get('requests_wait_ms', 0) / 1000),
+            ('db_pool_timeouts', 'Requests that gave up waiting for a connection since start.', labels,
+             s.get('requests_errors', 0)),
+            ('db_pool_connection_errors', 'Failed connection attempts since start.', labels,
+             s.get('connections_errors', 0)),
+        ]
+    return gauges
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + '}'
+
+
+def _help(name):
+    return METRIC_HELP.get(name) or name.replace('_', ' ').capitalize() + '.'
+
+
+def _histogram_lines(name, labels, bounds, counts, count, total_ms):
+    lines = []
+    cumulative = 0
+    for bound, n in zip(bounds, counts):
+        cumulative += n
+        lines.append(f'{name}_bucket{_labels(labels + (("le", f"{bound / 1000:g}"),))} {cumulative}')
+    lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {count}')
+    lines.append(f'{name}_sum{_labels(labels)} {total_ms / 1000:.6f}')
+    lines.append(f'{name}_count{_labels(labels)} {count}')
+    return lines
+
+
+def prometheus_text(gauges=()):
+    """
+    Render metrics in the Prometheus text exposition format (version 0.0.4).
+    gauges: iterable of (name, help, labels dict, value) computed by the caller (e.g. DB totals).
+    All names are prefixed with 'pgso_'.
+    """
+    out = []
+
+    out.append('# HELP pgso_request_duration_seconds Request latency per view.')
+    out.append('# TYPE pgso_request_duration_seconds histogram')
+    for view, (bounds, counts, count, total_ms) in sorted(metrics.histograms().items()):
+        out.extend(_histogram_lines('pgso_request_duration_seconds', (('view', view),), bounds, counts, count, total_ms))
+
+    counters = metrics.counters()
+    by_name = {}
+    for (name, labels), value in counters.items():
+        by_name.setdefault(name, []).append((labels, value))
+    for name in sorted(by_name):
+        out.append(f'# HELP pgso_{name}_total {_help(name)}')
+        out.append(f'# TYPE pgso_{name}_total counter')
+        for labels, value in sorted(by_name[name]):
+            out.append(f'pgso_{name}_total{_labels(labels)} {value:g}')
+
+    hits = {}
+    for labels, value in by_name.get('cache_requests', []):
+        label_map = dict(labels)
+        entry = hits.setdefault(label_map.get('cache', ''), [0, 0])
+        entry[0 if label_map.get('result') == 'hit' else 1] += value
+    if hits:
+        out.append('# HELP pgso_cache_hit_ratio Cache hits / lookups since process start.')
+        out.append('# TYPE pgso_cache_hit_ratio gauge')
+        for cache, (hit, miss) in sorted(hits.items()):
+            out.append(f'pgso_cache_hit_ratio{_labels((("cache", cache),))} {hit / (hit + miss):.4f}')
+
+    histograms = {}
+    for (name, labels), data in metrics.named_histograms().items():
+        histograms.setdefault(name, []).append((labels, data))
+    for name in sorted(histograms):
+        out.append(f'# HELP pgso_{name}_seconds {_help(name)}')
+        out.append(f'# TYPE pgso_{name}_seconds histogram')
+        for labels, (bounds, counts, count, total_ms) in sorted(histograms[name]):
+            out.extend(_histogram_lines(f'pgso_{name}_seconds', labels, bounds, counts, count, total_ms))
+
+    seen = set()
+    for name, help_text, labels, value in gauges:
+        if name not in seen:
+            out.append(f'# HELP pgso_{name} {help_text}')
+            out.append(f'# TYPE pgso_{name} gauge')
+            seen.add(name)
+        out.append(f'pgso_{name}{_labels(tuple(sorted((labels or {}).items())))} {value:g}')
+
+    return '\n'.join(out) + '\n'
@@ -1,42 +1,353 @@
-"""Middleware to require login for all views except sign-in, sign-out, and admin."""
+"""
+Middleware: login requirement for non-public routes, per-view request/SQL instrumentation and
+per-request transaction and read-replica routing.
+
+Every class here runs in both modes (see _SyncAndAsyncMiddleware). Under ASGI a single sync-only
+middleware would make Django run the whole chain below it through a thread, so async views (the
+scanner API in app.views) only stay on the event loop if the chain is async end to end; that is
+also why WhiteNoise is wrapped by StaticFilesMiddleware.
+"""
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.shortcuts import redirect
 from django.conf import settings
-class LoginRequiredMiddleware:
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .db_router import PIN_PRIMARY_COOKIE, replica_configured, replica_reads
+from .instrumentation import metrics
+from .public_routes import compile_public_matcher
+from .query_budget import repeated_shapes
+from .transactions import (
+    ATOMIC, AUTOCOMMIT, SAFE_METHODS, SAFE_MODES, is_read_only_view, read_only_transaction,
+    request_transaction_mode, safe_request_mode,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class _SyncAndAsyncMiddleware:
     """
-    Redirect unauthenticated users to the login page for any URL
-    except login, logout, admin, and static.
+    Base for middleware usable in a sync (WSGI) and an async (ASGI) chain. Subclasses implement
+    handle(request) and ahandle(request); Django picks the mode from the rest of the chain.
     """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.ahandle(request)
+        return self.handle(request)
+
+
+def _wrap_connections(stack, wrapper):
+    for conn in connections.all():
+        stack.enter_context(conn.execute_wrapper(wrapper))
+
+
+async def _awrap_connections(stack, wrapper):
+    # The async ORM runs queries through sync_to_async on the request's own thread (connections are
+    # per thread), so the wrappers have to be installed, and later removed, on that thread.
+    await sync_to_async(_wrap_connections)(stack, wrapper)
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoiseMiddleware that can also sit in an async chain (WhiteNoise itself is sync only)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        return super().__call__(request)
+
+    async def _acall(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class LoginRequiredMiddleware(_SyncAndAsyncMiddleware):
+    """
+    Redirect unauthenticated users to the login page for any URL
+    except public routes (see main.public_routes).
+    Public routes are matched before request.user is touched, so anonymous
+    requests to them never load the session or the user.
+    """
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.public_matcher = compile_public_matcher()
+
+    def handle(self, request):
+        if self.public_matcher.match(request.path_info):
+            request.is_public_route = True
+            return self.get_response(request)
         if not request.user.is_authenticated:
-            path = request.path
-            # Allow login, logout, admin, static
-            login_url = getattr(settings, 'LOGIN_URL', '/sign-in/').rstrip('/')
-            if path.rstrip('/') == login_url:
-                return self.get_response(request)
-            if path == '/sign-out/':
-                return self.get_response(request)
-            if path.startswith('/admin/'):
-                return self.get_response(request)
-            if path.startswith('/static/'):
-                return self.get_response(request)
-            if path.startswith('/app/'):
-                return self.get_response(request)
-            if path.startswith('/operations/resident/qr/'):
-                return self.get_response(request)
-            if path.startswith('/media/'):
-                return self.get_response(request)
-            if path == '/favicon.ico':
-                return self.get_response(request)
-            if path.startswith('/password-reset/'):
-                return self.get_response(request)
-            if path == '/password-reset':
-                return self.get_response(request)
-            if path.startswith('/admin-forgot-password/'):
-                return self.get_response(request)
-            if path == '/admin-forgot-password':
-                return self.get_response(request)
             return redirect(settings.LOGIN_URL + '?next=' + request.get_full_path())
         return self.get_response(request)
+
+    async def ahandle(self, request):
+        if self.public_matcher.match(request.path_info):
+            request.is_public_route = True
+            return await self.get_response(request)
+        if not (await request.auser()).is_authenticated:
+            return redirect(settings.LOGIN_URL + '?next=' + request.get_full_path())
+        return await self.get_response(request)
+
+
+class _QueryTimer:
+    """connection.execute_wrapper hook: counts queries, sums DB time, keeps the slowest few."""
+    keep = 5
+
+    def __init__(self):
+        self.count = 0
+        self.ms = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            self.count += 1
+            self.ms += ms
+            if len(self.slowest) < self.keep:
+                self.slowest.append((ms, sql))
+            else:
+                fastest = min(range(self.keep), key=lambda i: self.slowest[i][0])
+                if ms > self.slowest[fastest][0]:
+                    self.slowest[fastest] = (ms, sql)
+
+
+class RequestInstrumentationMiddleware(_SyncAndAsyncMiddleware):
+    """
+    Record wall time, DB time, query count and response size per URL name into
+    main.instrumentation.metrics (shown on Administrator Control → Performance).
+    With INSTRUMENTATION_SAMPLE_RATE > 0 a fraction of requests is also saved to RequestSample.
+    """
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.sample_rate = float(getattr(settings, 'INSTRUMENTATION_SAMPLE_RATE', 0) or 0)
+        self.server_timing = getattr(settings, 'INSTRUMENTATION_SERVER_TIMING', False)
+
+    def handle(self, request):
+        timer = _QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            _wrap_connections(stack, timer)
+            response = self.get_response(request)
+        duration_ms = (time.perf_counter() - start) * 1000
+        sample = self._record(request, response, duration_ms, timer)
+        if sample:
+            self._save_sample(*sample)
+        return response
+
+    async def ahandle(self, request):
+        timer = _QueryTimer()
+        start = time.perf_counter()
+        stack = ExitStack()
+        await _awrap_connections(stack, timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        duration_ms = (time.perf_counter() - start) * 1000
+        sample = self._record(request, response, duration_ms, timer)
+        if sample:
+            await sync_to_async(self._save_sample)(*sample)
+        return response
+
+    def _record(self, request, response, duration_ms, timer):
+        """Update metrics and Server-Timing; return _save_sample() arguments if this request is sampled."""
+        match = getattr(request, 'resolver_match', None)
+        name = (match.view_name if match else '') or '<unresolved>'
+        if getattr(response, 'streaming', False):
+            size = int(response.get('Content-Length') or 0)
+        else:
+            size = len(response.content)
+
+        metrics.record_request(name, duration_ms, timer.ms, timer.count, size, response.status_code)
+        for ms, sql in timer.slowest:
+            metrics.record_sql(sql, ms, name)
+
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'app;dur={duration_ms:.1f}, db;dur={timer.ms:.1f};desc="{timer.count} queries"'
+            )
+        if self.sample_rate and random.random() < self.sample_rate:
+            return request, name, response.status_code, duration_ms, timer, size
+        return None
+
+    def _save_sample(self, request, name, status_code, duration_ms, timer, size):
+        from administrator.models import RequestSample
+        try:
+            RequestSample.objects.create(
+                name=name[:200],
+                path=request.path[:500],
+                method=request.method[:10],
+                status_code=status_code,
+                duration_ms=duration_ms,
+                db_ms=timer.ms,
+                queries=timer.count,
+                response_bytes=size,
+            )
+        except Exception:
+            pass  # sampling must never break the request
+
+
+class NPlusOneDetectionMiddleware(_SyncAndAsyncMiddleware):
+    """
+    DEBUG only: warn (logger 'main.middleware') when a request runs the same SQL shape
+    N_PLUS_ONE_THRESHOLD or more times. Set N_PLUS_ONE_RAISE = True to fail the request instead.
+    """
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.threshold = getattr(settings, 'N_PLUS_ONE_THRESHOLD', 5)
+
+    @staticmethod
+    def _collector(statements):
+        def collect(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+        return collect
+
+    def handle(self, request):
+        statements = []
+        with ExitStack() as stack:
+            _wrap_connections(stack, self._collector(statements))
+            response = self.get_response(request)
+        self._check(request, statements)
+        return response
+
+    async def ahandle(self, request):
+        statements = []
+        stack = ExitStack()
+        await _awrap_connections(stack, self._collector(statements))
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self._check(request, statements)
+        return response
+
+    def _check(self, request, statements):
+        repeats = repeated_shapes(statements, self.threshold)
+        if repeats:
+            match = getattr(request, 'resolver_match', None)
+            name = match.view_name if match else request.path
+            details = '; '.join(f'{n}x {shape[:200]}' for shape, n in repeats)
+            if getattr(settings, 'N_PLUS_ONE_RAISE', False):
+                raise AssertionError(f'Possible N+1 queries in {name}: {details}')
+            logger.warning('Possible N+1 queries in %s: %s', name, details)
+
+
+class ReplicaRoutingMiddleware(_SyncAndAsyncMiddleware):
+    """
+    Let GET/HEAD requests (and any request to a @read_only_view) to DB_REPLICA_VIEWS (URL names or
+    whole namespaces) read from the replica (see main.db_router). After any other POST/PUT/PATCH/
+    DELETE the browser gets a short-lived cookie that keeps its reads on the primary, so the next
+    page shows the user's own change.
+    Only used when a 'replica' database is configured; place it before TransactionRoutingMiddleware.
+    """
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.views = tuple(getattr(settings, 'DB_REPLICA_VIEWS', ()))
+        self.sticky_seconds = getattr(settings, 'DB_REPLICA_STICKY_SECONDS', 10)
+
+    def handle(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            token = getattr(request, '_replica_token', None)
+            if token is not None:
+                replica_reads.reset(token)
+        return self._pin_after_write(request, response)
+
+    async def ahandle(self, request):
+        try:
+            response = await self.get_response(request)
+        finally:
+            # process_view ran in a thread and its token belongs to another Context; just clear the flag.
+            if getattr(request, '_replica_token', None) is not None:
+                replica_reads.set(False)
+        return self._pin_after_write(request, response)
+
+    def _pin_after_write(self, request, response):
+        wrote = request.method not in SAFE_METHODS and not getattr(request, '_read_only_view', False)
+        if wrote and self.sticky_seconds:
+            response.set_cookie(
+                PIN_PRIMARY_COOKIE, '1', max_age=self.sticky_seconds, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def _routed(self, view_name):
+        return any(view_name == v or view_name.startswith(v + ':') for v in self.views)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # @read_only_view views (e.g. a POST lookup API) read like a GET and do not pin the primary.
+        request._read_only_view = is_read_only_view(view_func)
+        if request.method not in ('GET', 'HEAD') and not request._read_only_view:
+            return None
+        if PIN_PRIMARY_COOKIE in request.COOKIES:
+            return None
+        if request_transaction_mode(request.method, view_func) == ATOMIC:
+            return None  # the view writes
+        if self._routed(request.resolver_match.view_name):
+            request._replica_token = replica_reads.set(True)
+        return None
+
+
+class TransactionRoutingMiddleware(_SyncAndAsyncMiddleware):
+    """
+    Replaces ATOMIC_REQUESTS on the default database: unsafe methods run the view in
+    transaction.atomic, GET/HEAD/OPTIONS in autocommit or a READ ONLY transaction
+    (see main.transactions). Must be last in MIDDLEWARE so every other process_view runs first.
+    Not used when the database still has ATOMIC_REQUESTS on (Django already wraps every view).
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'TRANSACTION_ROUTING', True):
+            raise MiddlewareNotUsed
+        if connections.settings[DEFAULT_DB_ALIAS].get('ATOMIC_REQUESTS'):
+            raise MiddlewareNotUsed
+        if safe_request_mode() not in SAFE_MODES:
+            raise ImproperlyConfigured(f'SAFE_REQUEST_TRANSACTIONS must be one of {SAFE_MODES}.')
+        super().__init__(get_response)
+
+    def handle(self, request):
+        return self.get_response(request)
+
+    async def ahandle(self, request):
+        return await self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if iscoroutinefunction(view_func):
+            return None  # async views run in autocommit (@async_view); @read_only_view only routes them
+        mode = request_transaction_mode(request.method, view_func)
+        if mode == AUTOCOMMIT:
+            return None
+        with transaction.atomic() if mode == ATOMIC else read_only_transaction():
+            return view_func(request, *view_args, **view_kwargs)
@@ -0,0 +1,67 @@
+"""
+Registry of routes that anonymous users may reach (used by LoginRequiredMiddleware).
+
+A route is public if its view is marked with @public_route, its URL name is listed in
+settings.PUBLIC_URL_NAMES, or its path starts with one of settings.PUBLIC_PATH_PREFIXES.
+Everything is compiled once into a single regex, so the per-request check is one match.
+Routes match the whole path; a prefix never matches a path with a '.' or '..' segment after it,
+so '/static/../operations/' is not public.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.urls import URLResolver, get_resolver
+
+_NAMED_GROUP = re.compile(r'\(\?P<[^>]+>')
+_NO_DOT_SEGMENTS = r'(?!(?:.*/)?\.\.?(?:/|\Z))'
+
+
+def public_route(view_func):
+    """Mark a view as reachable without signing in."""
+    view_func.public_route = True
+    return view_func
+
+
+def _strip_anchors(regex):
+    if regex.startswith('^'):
+        regex = regex[1:]
+    for end in ('\\Z', '$'):
+        if regex.endswith(end):
+            regex = regex[:-len(end)]
+    # Group names repeat across routes (pk, path...) and are not needed for matching.
+    return _NAMED_GROUP.sub('(?:', regex)
+
+
+def _public_patterns(patterns, prefix='', namespaces=()):
+    public_names = set(getattr(settings, 'PUBLIC_URL_NAMES', ()))
+    for pattern in patterns:
+        regex = prefix + _strip_anchors(pattern.pattern.regex.pattern)
+        if isinstance(pattern, URLResolver):
+            ns = namespaces + (pattern.namespace,) if pattern.namespace else namespaces
+            yield from _public_patterns(pattern.url_patterns, regex, ns)
+            continue
+        name = ':'.join(namespaces + (pattern.name,)) if pattern.name else None
+        view = pattern.callback
+        view_class = getattr(view, 'view_class', None)
+        if (
+            getattr(view, 'public_route', False)
+            or getattr(view_class, 'public_route', False)
+            or (name and name in public_names)
+        ):
+            # Accept the route with or without its trailing slash (before APPEND_SLASH redirects).
+            yield regex + '?' if regex.endswith('/') else regex
+
+
+@lru_cache(maxsize=None)
+def compile_public_matcher(urlconf=None):
+    """Return a compiled regex matching request.path_info of every public route."""
+    routes = sorted(set(_public_patterns(get_resolver(urlconf).url_patterns)))
+    prefixes = [re.escape(p) + _NO_DOT_SEGMENTS for p in getattr(settings, 'PUBLIC_PATH_PREFIXES', ()) if p]
+    alternatives = []
+    if routes:
+        alternatives.append('/(?:' + '|'.join(routes) + r')\Z')
+    alternatives.extend(prefixes)
+    if not alternatives:
+        return re.compile(r'(?!)')
+    return re.compile('^(?:' + '|'.join(alternatives) + ')')
@@ -0,0 +1,79 @@
+"""
+Query budgets and N+1 detection.
+
+query_budget(n) is a context manager / decorator that fails when the wrapped code runs more
+than n queries; the error lists the SQL and any statement shape that repeated, which is the
+usual sign of an N+1. NPlusOneDetectionMiddleware (main.middleware) uses the same shape
+grouping at runtime in DEBUG.
+"""
+import re
+from collections import Counter
+from contextlib import ContextDecorator
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_WHITESPACE = re.compile(r'\s+')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?|[-\d.]+|\'[^\']*\')\s*,?)+\)', re.IGNORECASE)
+_NUMBER = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+
+
+def sql_shape(sql):
+    """Normalise SQL so the same statement with different parameters groups together."""
+    shape = _STRING.sub('?', sql)
+    shape = _IN_LIST.sub('IN (...)', shape)
+    shape = _NUMBER.sub('?', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+def repeated_shapes(statements, threshold=3):
+    """[(shape, count)] for statement shapes run at least threshold times, most repeated first."""
+    counts = Counter(sql_shape(sql) for sql in statements)
+    return [(shape, n) for shape, n in counts.most_common() if n >= threshold]
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class query_budget(ContextDecorator):
+    """
+    Fail if the wrapped block runs more than max_queries queries:
+
+        with query_budget(5, label='residents_record'):
+            client.get(url)
+
+        @query_budget(3)
+        def test_something(self): ...
+    """
+
+    def __init__(self, max_queries, using=DEFAULT_DB_ALIAS, label=''):
+        self.max_queries = max_queries
+        self.using = using
+        self.label = label
+
+    def __enter__(self):
+        from django.test.utils import CaptureQueriesContext
+
+        self.capture = CaptureQueriesContext(connections[self.using])
+        self.capture.__enter__()
+        return self.capture
+
+    def __exit__(self, exc_type, exc, tb):
+        self.capture.__exit__(exc_type, exc, tb)
+        if exc_type is not None:
+            return False
+        executed = len(self.capture)
+        if executed > self.max_queries:
+            statements = [q['sql'] for q in self.capture.captured_queries]
+            lines = [
+                f'{self.label + ": " if self.label else ""}{executed} queries run, budget is {self.max_queries}.'
+            ]
+            repeats = repeated_shapes(statements, threshold=2)
+            if repeats:
+                lines.append('Repeated statements (possible N+1):')
+                lines.extend(f'  {n}x {shape}' for shape, n in repeats)
+            lines.append('All queries:')
+            lines.extend(f'  {i}. {sql}' for i, sql in enumerate(statements, 1))
+            raise QueryBudgetExceeded('\n'.join(lines))
+        return False
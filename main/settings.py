@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import copy
 from pathlib import Path
 from decouple import config
 
@@ -45,11 +46,13 @@ INSTALLED_APPS = [
     'reports',
     'administrator',
     'app',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'main.middleware.StaticFilesMiddleware',  # WhiteNoise, usable in an async chain
+    'main.middleware.RequestInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -57,6 +60,9 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'main.middleware.LoginRequiredMiddleware',
+    'main.middleware.NPlusOneDetectionMiddleware',  # active only when DEBUG
+    'main.middleware.ReplicaRoutingMiddleware',  # active only with DB_REPLICA_HOST
+    'main.middleware.TransactionRoutingMiddleware',  # keep last: it calls the view from process_view
 ]
 
 ROOT_URLCONF = 'main.urls'
@@ -85,23 +91,152 @@ WSGI_APPLICATION = 'main.wsgi.application'
 # All data—including user accounts (auth_user), residents, barangays, etc.—is stored in Supabase.
 # Set SUPABASE_DB_HOST, SUPABASE_DB_PASSWORD (and optionally NAME, USER, PORT) in .env
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
-
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': config('SUPABASE_DB_NAME', default='postgres'),
-        'USER': config('SUPABASE_DB_USER', default='postgres'),
-        'PASSWORD': config('SUPABASE_DB_PASSWORD'),
-        'HOST': config('SUPABASE_DB_HOST'),
-        'PORT': config('SUPABASE_DB_PORT', default='5432'),
-        'CONN_MAX_AGE': 60,  # Keep connections open for 60 seconds
-        'ATOMIC_REQUESTS': True,  # Wrap each request in a transaction
-        'OPTIONS': {
-            'connect_timeout': 10,
+#
+# OFFLINE_MODE=True runs without any network service: a local database (LOCAL_DB_ENGINE=sqlite,
+# the default, or postgres), the filesystem storage emulator instead of Supabase Storage and the
+# in-memory email backend. Use it for tests and reproducible benchmarks on an isolated machine.
+OFFLINE_MODE = config('OFFLINE_MODE', default=False, cast=bool)
+
+# Transactions per request. TRANSACTION_ROUTING=True (default) replaces ATOMIC_REQUESTS with
+# main.middleware.TransactionRoutingMiddleware: POST/PUT/PATCH/DELETE still run in one atomic
+# transaction, GET/HEAD/OPTIONS skip BEGIN/COMMIT ('autocommit') or run as BEGIN READ ONLY
+# ('read_only', rejects writes: use it to find GET views that need @atomic_view).
+# See main.transactions for the @atomic_view / @read_only_view decorators.
+TRANSACTION_ROUTING = config('TRANSACTION_ROUTING', default=True, cast=bool)
+SAFE_REQUEST_TRANSACTIONS = config('SAFE_REQUEST_TRANSACTIONS', default='autocommit')
+
+if OFFLINE_MODE and config('LOCAL_DB_ENGINE', default='sqlite') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('LOCAL_DB_NAME', default=str(BASE_DIR / 'db.offline.sqlite3')),
+            'ATOMIC_REQUESTS': not TRANSACTION_ROUTING,
+            'OPTIONS': {
+                'timeout': 30,  # wait for the single writer instead of failing under load
+            },
+        }
+    }
+elif OFFLINE_MODE:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('LOCAL_DB_NAME', default='pgso'),
+            'USER': config('LOCAL_DB_USER', default='postgres'),
+            'PASSWORD': config('LOCAL_DB_PASSWORD', default=''),
+            'HOST': config('LOCAL_DB_HOST', default='localhost'),
+            'PORT': config('LOCAL_DB_PORT', default='5432'),
+            'CONN_MAX_AGE': 60,
+            'ATOMIC_REQUESTS': not TRANSACTION_ROUTING,
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('SUPABASE_DB_NAME', default='postgres'),
+            'USER': config('SUPABASE_DB_USER', default='postgres'),
+            'PASSWORD': config('SUPABASE_DB_PASSWORD'),
+            'HOST': config('SUPABASE_DB_HOST'),
+            'PORT': config('SUPABASE_DB_PORT', default='5432'),
+            'CONN_MAX_AGE': 60,  # Keep connections open for 60 seconds
+            'ATOMIC_REQUESTS': not TRANSACTION_ROUTING,  # see TRANSACTION_ROUTING above
+            'OPTIONS': {
+                'connect_timeout': 10,
+            }
         }
     }
-}
 
+# Connection handling for PostgreSQL. Persistent connections are health-checked before reuse, so
+# a connection Supabase dropped while idle is replaced instead of failing the request.
+# DB_POOL=True switches to psycopg 3's connection pool (Django 5.1+): each worker process keeps
+# DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE open connections and requests borrow one instead of paying
+# TCP/TLS/auth setup. Size per process: max_size ~ threads per worker, and
+# workers x DB_POOL_MAX_SIZE must stay below the database's connection limit.
+# Saturation (in use / max, waiting requests, wait time) is exported on /metrics.
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+DB_POOL_MIN_SIZE = config('DB_POOL_MIN_SIZE', default=2, cast=int)
+DB_POOL_MAX_SIZE = config('DB_POOL_MAX_SIZE', default=4, cast=int)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10.0, cast=float)  # seconds to wait for a free connection
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+    if DB_POOL:
+        # Django checks each connection as it leaves the pool (ConnectionPool.check_connection).
+        DATABASES['default']['CONN_MAX_AGE'] = 0  # the pool owns connection lifetime
+        DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+            'max_idle': 300,
+            'max_lifetime': 1800,
+        }
+
+# Read replica (optional). With DB_REPLICA_HOST set, GET requests to DB_REPLICA_VIEWS read from a
+# 'replica' alias (same credentials as default unless DB_REPLICA_* says otherwise); writes, other
+# views and a browser's reads for DB_REPLICA_STICKY_SECONDS after its own POST stay on the primary.
+# The replica is skipped while its lag exceeds DB_REPLICA_MAX_LAG seconds or it is unreachable.
+# Try it locally: OFFLINE_MODE=True LOCAL_DB_ENGINE=postgres DB_REPLICA_HOST=localhost DB_REPLICA_PORT=5433
+# with a streaming standby (or a second copy of the database) on port 5433. See main.db_router.
+DB_REPLICA_HOST = config('DB_REPLICA_HOST', default='')
+if DB_REPLICA_HOST and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': config('DB_REPLICA_NAME', default=DATABASES['default']['NAME']),
+        'USER': config('DB_REPLICA_USER', default=DATABASES['default']['USER']),
+        'PASSWORD': config('DB_REPLICA_PASSWORD', default=DATABASES['default']['PASSWORD']),
+        'HOST': DB_REPLICA_HOST,
+        'PORT': config('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'ATOMIC_REQUESTS': False,
+        'OPTIONS': copy.deepcopy(DATABASES['default'].get('OPTIONS', {})),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['main.db_router.ReplicaRouter']
+DB_REPLICA_VIEWS = [
+    'reports',
+    'mainapplication:dashboard',
+    'mainapplication:dashboard_activity_chart',
+    'mainapplication:dashboard_birth_death_list',
+    'app',
+    'operations:voters_registration',
+    'operations:voters_registration_barangay',
+    'operations:get_voters_by_barangay',
+]
+DB_REPLICA_MAX_LAG = config('DB_REPLICA_MAX_LAG', default=5.0, cast=float)
+DB_REPLICA_LAG_CHECK_SECONDS = config('DB_REPLICA_LAG_CHECK_SECONDS', default=5.0, cast=float)
+DB_REPLICA_STICKY_SECONDS = config('DB_REPLICA_STICKY_SECONDS', default=10, cast=int)
+
+# Cache. LocMemCache is per process, so with several workers a write only invalidates cached
+# fragments in its own process (others catch up within SIDEBAR_CACHE_SECONDS). Set REDIS_URL
+# (needs the redis package) to share one cache, and its invalidation, across every worker.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pgso'}}
+
+# On-disk caches shared by the worker processes on one machine: generated resident PDFs and
+# remote images (main.image_cache; copies older than IMAGE_CACHE_SECONDS are revalidated).
+FILE_CACHE_ROOT = config('FILE_CACHE_ROOT', default=str(BASE_DIR / '.cache'))
+IMAGE_CACHE_SECONDS = config('IMAGE_CACHE_SECONDS', default=86400, cast=int)
+
+# Worker processes that draw batch ID-card PDFs and DOCX forms (operations.id_cards); 1 works
+# in the request. PROFILING_TEMPLATE is the DOCX layout the forms are filled from.
+ID_CARD_WORKERS = config('ID_CARD_WORKERS', default=2, cast=int)
+PROFILING_TEMPLATE = config(
+    'PROFILING_TEMPLATE', default=str(BASE_DIR / 'static' / 'profiling format' / 'Profiling-template.docx'),
+)
+
+# Rendered municipality → barangay sidebar trees (reports.sidebar); 0 disables the cache.
+SIDEBAR_CACHE_SECONDS = config('SIDEBAR_CACHE_SECONDS', default=300, cast=int)
+
+# Scanner delta sync (app.sync): rows changed in the last SYNC_SETTLE_SECONDS are held back until
+# their transaction has surely committed (keep it above DB_REPLICA_MAX_LAG); tombstones of deleted or
+# moved residents are kept SYNC_TOMBSTONE_DAYS (prune_sync_tombstones), older cursors resync.
+SYNC_SETTLE_SECONDS = config('SYNC_SETTLE_SECONDS', default=60, cast=int)
+SYNC_TOMBSTONE_DAYS = config('SYNC_TOMBSTONE_DAYS', default=90, cast=int)
+# Bearer token the scanner app sends to the sync API (whole barangays of resident data). Signed-in
+# users can always sync; with no token set, devices cannot.
+SYNC_API_TOKEN = config('SYNC_API_TOKEN', default='')
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -153,9 +288,39 @@ LOGIN_URL = '/sign-in/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/sign-in/'
 
+# Routes anonymous users may reach (main.public_routes). Views can also be marked with
+# @public_route; URL names here use the namespaced form, e.g. 'app:resident_api'.
+PUBLIC_PATH_PREFIXES = ['/admin/', STATIC_URL, MEDIA_URL]
+PUBLIC_URL_NAMES = []
+
 # Fixed admin account: this username cannot be modified (no password change or permissions edit from app)
 FIXED_ADMIN_USERNAME = 'admin'
 
+# Activity log (administrator.activity_log): buffer UserActivity rows in-process and write them
+# with bulk_create. Set ACTIVITY_LOG_BUFFERED=False to write each row synchronously (e.g. tests).
+ACTIVITY_LOG_BUFFERED = config('ACTIVITY_LOG_BUFFERED', default=True, cast=bool)
+ACTIVITY_LOG_BATCH_SIZE = config('ACTIVITY_LOG_BATCH_SIZE', default=50, cast=int)
+ACTIVITY_LOG_FLUSH_SECONDS = config('ACTIVITY_LOG_FLUSH_SECONDS', default=5.0, cast=float)
+
+# Activity retention: `manage.py archive_user_activity` moves UserActivity rows older than
+# ACTIVITY_RETENTION_MONTHS into gzipped JSONL files (one per month and run) under ACTIVITY_ARCHIVE_DIR.
+ACTIVITY_RETENTION_MONTHS = config('ACTIVITY_RETENTION_MONTHS', default=12, cast=int)
+ACTIVITY_ARCHIVE_DIR = config('ACTIVITY_ARCHIVE_DIR', default=str(BASE_DIR / 'archives' / 'user_activity'))
+
+# Request instrumentation (main.middleware.RequestInstrumentationMiddleware): fraction of requests
+# (0.0-1.0) also saved to administrator.RequestSample; in-process histograms are always kept.
+INSTRUMENTATION_SAMPLE_RATE = config('INSTRUMENTATION_SAMPLE_RATE', default=0.0, cast=float)
+# Add a Server-Timing header (total and DB time, query count) to every response; used by
+# `manage.py run_benchmarks --base-url`. Leave off in production: it exposes timings to clients.
+INSTRUMENTATION_SERVER_TIMING = config('INSTRUMENTATION_SERVER_TIMING', default=False, cast=bool)
+
+# Bearer token for the Prometheus /metrics endpoint (Admin sessions can always read it).
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# N+1 detector (DEBUG only): warn when one request repeats the same SQL shape this many times.
+N_PLUS_ONE_THRESHOLD = config('N_PLUS_ONE_THRESHOLD', default=5, cast=int)
+N_PLUS_ONE_RAISE = config('N_PLUS_ONE_RAISE', default=False, cast=bool)
+
 # Network access for QR codes and mobile devices. Set to your network IP (e.g. http://192.168.1.32:8000)
 # when accessing from other devices. If not set, we try to detect from request.
 SITE_URL = config('SITE_URL', default='')
@@ -165,12 +330,24 @@ SUPABASE_URL = config('SUPABASE_URL', default='')
 SUPABASE_SERVICE_ROLE_KEY = config('SUPABASE_SERVICE_ROLE_KEY', default='')
 SUPABASE_STORAGE_BUCKET_PROFILES = config('SUPABASE_STORAGE_BUCKET_PROFILES', default='profiles')
 SUPABASE_STORAGE_BUCKET_QR = config('SUPABASE_STORAGE_BUCKET_QR', default='qr')
+# Local stand-in for Supabase Storage (operations.storage_emulator): files go under MEDIA_ROOT.
+SUPABASE_STORAGE_EMULATOR = config('SUPABASE_STORAGE_EMULATOR', default=OFFLINE_MODE, cast=bool)
+SUPABASE_STORAGE_EMULATOR_ROOT = MEDIA_ROOT / 'storage-emulator'
 
 # Email (Gmail SMTP for ProfilingSystem)
-EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+EMAIL_BACKEND = config(
+    'EMAIL_BACKEND',
+    default='django.core.mail.backends.locmem.EmailBackend' if OFFLINE_MODE else 'django.core.mail.backends.smtp.EmailBackend',
+)
 EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
 EMAIL_PORT = config('EMAIL_PORT', default=587)
 EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default=config('EMAIL_HOST_USER', default=''))
+
+# Email outbox (administrator.email_utils): emails are queued in OutboxEmail and sent in batches
+# over one SMTP connection, by a background thread after commit and/or `manage.py send_outbox_emails`.
+EMAIL_OUTBOX_AUTOSEND = config('EMAIL_OUTBOX_AUTOSEND', default=True, cast=bool)
+EMAIL_OUTBOX_MAX_ATTEMPTS = config('EMAIL_OUTBOX_MAX_ATTEMPTS', default=6, cast=int)
+EMAIL_OUTBOX_RETRY_SECONDS = config('EMAIL_OUTBOX_RETRY_SECONDS', default=60, cast=int)
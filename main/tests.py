@@ -0,0 +1,622 @@
+"""
+Query budgets for every page and API, public routes, the per-request transaction policy, replica
+routing, the async middleware chain, request instrumentation, /metrics and the shared image cache.
+Tests of the features behind the views live in their apps (app, operations, reports).
+
+Each URL name below has a maximum number of SQL queries for a signed-in Admin GET, counting the
+session, user and transaction (savepoint) queries. The fixture has several rows per list so an
+N+1 (one query per row) blows the budget and the failure message lists the repeated statement.
+Budgets were measured on SQLite with a little headroom; when a view legitimately needs more
+queries, raise its number in the same commit.
+
+Run with: python manage.py test   (OFFLINE_MODE=True needs no database server)
+"""
+import http.server
+import re
+import tempfile
+import threading
+from datetime import date
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.handlers.base import BaseHandler
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver, reverse
+
+from administrator.models import PasswordChangeRequest, RequestSample, SentEmail, UserActivity, UserProfile
+from operations.models import BarangayOfficial, Coordinator, CoordinatorPosition, Resident
+from reference.models import Barangay, Municipality, Position
+
+from .db_router import PIN_PRIMARY_COOKIE, REPLICA_ALIAS, ReplicaRouter, lag_monitor, replica_reads
+from .image_cache import fetch_image
+from .instrumentation import MetricsStore, metrics
+from .middleware import ReplicaRoutingMiddleware, TransactionRoutingMiddleware, _QueryTimer
+from .public_routes import compile_public_matcher
+from .query_budget import QueryBudgetExceeded, query_budget, repeated_shapes, sql_shape
+from .transactions import ATOMIC, AUTOCOMMIT, READ_ONLY, atomic_view, read_only_view, request_transaction_mode
+
+ROWS = 6  # per list; above any budget slack so per-row queries are caught
+
+# url name -> (max queries, kwargs key or None, query string)
+# kwargs keys refer to objects created in setUpTestData (see _kwargs).
+BUDGETS = {
+    'metrics': (8, None, ''),
+    'login': (4, None, ''),
+    'logout': (9, None, ''),
+    'password_reset': (4, None, ''),
+    'password_reset_done': (4, None, ''),
+    'admin_password_reset': (4, None, ''),
+    'admin_password_reset_verify': (4, None, ''),
+
+    'mainapplication:dashboard': (25, None, ''),
+    'mainapplication:dashboard_birth_death_list': (7, None, ''),
+    'mainapplication:dashboard_activity_chart': (8, None, ''),
+
+    'reference:index': (7, None, ''),
+    'reference:barangay_list': (9, None, ''),
+    'reference:barangay_add': (9, None, ''),
+    'reference:barangay_edit': (10, 'barangay', ''),
+    'reference:barangay_delete': (9, 'barangay', ''),
+    'reference:barangay_get': (8, 'barangay', ''),
+    'reference:position_list': (8, None, ''),
+    'reference:position_add': (9, None, ''),
+    'reference:position_edit': (10, 'position', ''),
+    'reference:position_delete': (9, 'position', ''),
+    'reference:position_get': (8, 'position', ''),
+    'reference:position_detail': (10, 'position', ''),
+    'reference:position_barangay_officials': (11, 'position_barangay', ''),
+
+    'operations:index': (7, None, ''),
+    'operations:coordinator': (11, None, ''),
+    'operations:coordinator_add': (9, None, ''),
+    'operations:coordinator_edit': (8, 'coordinator', ''),
+    'operations:coordinator_delete': (7, 'coordinator', ''),
+    'operations:coordinator_position_add': (9, None, ''),
+    'operations:coordinator_position_edit': (8, 'coordinator_position', ''),
+    'operations:coordinator_position_delete': (7, 'coordinator_position', ''),
+    'operations:barangay_officials': (9, None, ''),
+    'operations:barangay_official_add': (9, None, ''),
+    'operations:barangay_official_get': (9, 'official', ''),
+    'operations:barangay_official_edit': (10, 'official', ''),
+    'operations:barangay_official_delete': (9, 'official', ''),
+    'operations:residents_record': (11, None, ''),
+    'operations:resident_add': (9, None, ''),
+    'operations:resident_get': (8, 'resident', ''),
+    'operations:resident_qr': (5, 'resident', ''),
+    'operations:resident_print': (9, 'resident', ''),
+    'operations:resident_print_batch': (9, None, 'barangay={barangay}'),
+    'operations:resident_docx': (8, 'resident', ''),
+    'operations:resident_docx_batch': (9, None, 'barangay={barangay}'),
+    'operations:resident_edit': (10, 'resident', ''),
+    'operations:resident_delete': (9, 'resident', ''),
+    'operations:voters_registration': (9, None, ''),
+    'operations:voters_registration_barangay': (10, 'barangay', ''),
+    'operations:get_residents_by_barangay': (9, None, 'barangay_id={barangay}'),
+    'operations:get_voters_by_barangay': (8, 'barangay', ''),
+    'operations:get_barangays_by_municipality': (8, None, 'municipality_id={municipality}'),
+    'operations:get_municipalities': (7, None, ''),
+
+    'reports:index': (7, None, ''),
+    'reports:list_male': (12, None, ''),
+    'reports:print_male': (9, None, ''),
+    'reports:list_female': (12, None, ''),
+    'reports:print_female': (9, None, ''),
+    'reports:list_pwd': (12, None, ''),
+    'reports:print_pwd': (9, None, ''),
+    'reports:list_solo_parent': (12, None, ''),
+    'reports:print_solo_parent': (9, None, ''),
+    'reports:list_senior_citizen': (12, None, ''),
+    'reports:print_senior_citizen': (9, None, ''),
+    'reports:list_4ps_member': (12, None, ''),
+    'reports:print_4ps_member': (9, None, ''),
+    'reports:list_voters': (12, None, ''),
+    'reports:print_voters': (9, None, ''),
+    'reports:list_residents_record': (12, None, ''),
+    'reports:print_residents_record': (9, None, ''),
+    'reports:list_deceased': (12, None, ''),
+    'reports:print_deceased': (9, None, ''),
+    'reports:list_birth_by_year': (12, None, ''),
+    'reports:print_birth_by_year': (9, None, ''),
+
+    'administrator:index': (7, None, ''),
+    'administrator:system_policy': (7, None, ''),
+    'administrator:user_accounts': (8, None, ''),
+    'administrator:user_add': (16, None, ''),
+    'administrator:user_change_password': (8, 'staff', ''),
+    'administrator:user_edit': (8, 'staff', ''),
+    'administrator:user_delete': (11, 'staff', ''),
+    'administrator:user_permissions': (8, None, ''),
+    'administrator:user_permissions_edit': (17, 'staff', ''),
+    'administrator:user_activity': (9, None, ''),
+    'administrator:user_activity_api': (7, None, ''),
+    'administrator:performance': (7, None, ''),
+    'administrator:sent_emails': (9, None, ''),
+    'administrator:sent_email_view': (8, 'sent_email', ''),
+    'administrator:mark_request_read': (8, 'password_request', ''),
+
+    'app:app_info': (4, None, ''),
+    'app:residents_search': (5, None, 'q=Res'),
+    'app:resident_api': (6, 'resident', ''),
+    'app:residents_batch': (4, None, ''),
+    'app:api_schema': (4, None, ''),
+    'app:residents_sync': (6, None, 'barangay={barangay}'),
+    'app:resident_profile': (6, 'resident', ''),
+    'app:resident_profile_pdf': (6, 'resident', ''),
+}
+
+
+def url_names(patterns=None, namespaces=()):
+    """Every named URL in the project except the Django admin site."""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace == 'admin':
+                continue
+            ns = namespaces + (pattern.namespace,) if pattern.namespace else namespaces
+            yield from url_names(pattern.url_patterns, ns)
+        elif pattern.name:
+            yield ':'.join(namespaces + (pattern.name,))
+
+
+@override_settings(
+    ACTIVITY_LOG_BUFFERED=False, EMAIL_OUTBOX_AUTOSEND=False, INSTRUMENTATION_SAMPLE_RATE=0,
+    SUPABASE_STORAGE_EMULATOR=False,
+)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('budget-admin', 'admin@example.com', 'pw')
+        staff_group, _ = Group.objects.get_or_create(name='Staff')
+        cls.staff_users = []
+        for i in range(ROWS):
+            user = User.objects.create_user(f'staff{i}', f'staff{i}@example.com', 'pw')
+            user.groups.add(staff_group)
+            UserProfile.objects.get_or_create(user=user)
+            cls.staff_users.append(user)
+
+        cls.municipalities = [Municipality.objects.create(name=f'Municipality {i}') for i in range(ROWS)]
+        cls.barangays = [
+            Barangay.objects.create(name=f'Barangay {i}', municipality=cls.municipalities[i % 2])
+            for i in range(ROWS)
+        ]
+        cls.positions = [Position.objects.create(name=f'Position {i}') for i in range(ROWS)]
+        cls.coordinator_positions = [CoordinatorPosition.objects.create(name=f'Coordinator {i}') for i in range(ROWS)]
+
+        cls.residents = []
+        for i in range(ROWS * 2):
+            cls.residents.append(Resident.objects.create(
+                barangay=cls.barangays[i % ROWS],
+                lastname=f'Resident{i}', firstname='Juan',
+                gender=Resident.GENDER_MALE if i % 2 else Resident.GENDER_FEMALE,
+                date_of_birth=date(1950 + i * 5, 1 + i % 12, 1),
+                place_of_birth='Puerto Princesa', address='Main St', purok='1', contact_no='0917',
+                civil_status='SINGLE', educational_attainment='COLLEGE GRADUATE',
+                citizenship='Filipino', dialect_ethnic='Cuyonon', occupation='Farmer',
+                health_status='PWD' if i % 3 == 0 else 'HEALTHY',
+                economic_status=['SOLO PARENT', 'SENIOR CITIZEN', '4PS MEMBER'][i % 3],
+                is_voter=bool(i % 2), status=Resident.STATUS_DECEASED if i == 0 else Resident.STATUS_ALIVE,
+            ))
+        cls.officials = [
+            BarangayOfficial.objects.create(
+                resident=cls.residents[i], barangay=cls.barangays[i], position=cls.positions[i % 2],
+                start_date=date(2023, 1, 1),
+            )
+            for i in range(ROWS)
+        ]
+        cls.coordinators = [
+            Coordinator.objects.create(
+                barangay=cls.barangays[i], fullname=f'Coordinator {i}', position=cls.coordinator_positions[i],
+            )
+            for i in range(ROWS)
+        ]
+        for i in range(ROWS):
+            UserActivity.objects.create(
+                user=cls.staff_users[i], action=UserActivity.ACTION_CREATE, description=f'Row {i}',
+            )
+            SentEmail.objects.create(
+                recipient_email=f'staff{i}@example.com', subject=f'Email {i}', related_user=cls.staff_users[i],
+            )
+            PasswordChangeRequest.objects.create(user=cls.staff_users[i])
+        cls.sent_email = SentEmail.objects.first()
+        cls.password_request = PasswordChangeRequest.objects.first()
+
+    def setUp(self):
+        cache.clear()  # budgets are for cold caches
+        self.enterContext(override_settings(FILE_CACHE_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+        self.client.force_login(self.admin)
+
+    def _kwargs(self, key):
+        return {
+            None: {},
+            'barangay': {'pk': self.barangays[0].pk},
+            'position': {'pk': self.positions[0].pk},
+            'position_barangay': {'position_pk': self.positions[0].pk, 'barangay_pk': self.barangays[0].pk},
+            'coordinator': {'pk': self.coordinators[0].pk},
+            'coordinator_position': {'pk': self.coordinator_positions[0].pk},
+            'official': {'pk': self.officials[0].pk},
+            'resident': {'pk': self.residents[1].pk},
+            'staff': {'pk': self.staff_users[0].pk},
+            'sent_email': {'pk': self.sent_email.pk},
+            'password_request': {'pk': self.password_request.pk},
+        }[key]
+
+    def test_every_url_has_a_budget(self):
+        missing = sorted(set(url_names()) - set(BUDGETS))
+        self.assertEqual(missing, [], 'Add a query budget to main/tests.py for these URL names')
+
+    def test_views_stay_within_query_budget(self):
+        ids = {'barangay': self.barangays[0].pk, 'municipality': self.municipalities[0].pk}
+        for name, (budget, kwargs_key, query) in BUDGETS.items():
+            if name == 'logout':
+                continue  # signs the test client out; covered last
+            with self.subTest(url=name):
+                url = reverse(name, kwargs=self._kwargs(kwargs_key))
+                if query:
+                    url += '?' + query.format(**ids)
+                with query_budget(budget, label=name):
+                    response = self.client.get(url)
+                self.assertLess(response.status_code, 500, name)
+        with query_budget(BUDGETS['logout'][0], label='logout'):
+            self.client.get(reverse('logout'))
+
+
+class SqlShapeTests(TestCase):
+    def test_literals_and_in_lists_are_normalised(self):
+        self.assertEqual(
+            sql_shape("SELECT * FROM t WHERE a = 5 AND b = 'x''y' AND c IN (1, 2, 3)"),
+            'SELECT * FROM t WHERE a = ? AND b = ? AND c IN (...)',
+        )
+        self.assertEqual(sql_shape('SELECT "t"."col1" FROM "t" WHERE "t"."id" IN (%s, %s)'),
+                         'SELECT "t"."col1" FROM "t" WHERE "t"."id" IN (...)')
+
+    def test_repeated_shapes(self):
+        statements = [f'SELECT * FROM t WHERE id = {i}' for i in range(4)] + ['SELECT 1']
+        self.assertEqual(repeated_shapes(statements, threshold=3), [('SELECT * FROM t WHERE id = ?', 4)])
+
+    def test_budget_failure_lists_repeated_statements(self):
+        with self.assertRaises(QueryBudgetExceeded) as ctx:
+            with query_budget(2, label='loop'):
+                for municipality_id in range(4):
+                    list(Barangay.objects.filter(municipality_id=municipality_id))
+        message = str(ctx.exception)
+        self.assertIn('loop: 4 queries run, budget is 2.', message)
+        self.assertIn('4x SELECT', message)
+
+
+class TransactionRoutingTests(TestCase):
+    def _view(self, depth):
+        def view(request):
+            depth.append(len(connection.savepoint_ids))
+            return HttpResponse('ok')
+        return view
+
+    def _call(self, method, view):
+        with mock.patch.dict(connections.settings[DEFAULT_DB_ALIAS], {'ATOMIC_REQUESTS': False}):
+            middleware = TransactionRoutingMiddleware(lambda request: HttpResponse())
+        request = RequestFactory().generic(method, '/')
+        return middleware.process_view(request, view, (), {})
+
+    def test_mode_by_method_and_marker(self):
+        plain = self._view([])
+        self.assertEqual(request_transaction_mode('GET', plain), AUTOCOMMIT)
+        self.assertEqual(request_transaction_mode('POST', plain), ATOMIC)
+        self.assertEqual(request_transaction_mode('GET', atomic_view(self._view([]))), ATOMIC)
+        self.assertEqual(request_transaction_mode('POST', read_only_view(self._view([]))), AUTOCOMMIT)
+        self.assertEqual(request_transaction_mode('POST', transaction.non_atomic_requests(self._view([]))), AUTOCOMMIT)
+        with override_settings(SAFE_REQUEST_TRANSACTIONS=READ_ONLY):
+            self.assertEqual(request_transaction_mode('GET', plain), READ_ONLY)
+
+    def test_get_skips_the_transaction_and_post_is_atomic(self):
+        depth = []
+        outside = len(connection.savepoint_ids)
+        self.assertIsNone(self._call('GET', self._view(depth)))  # Django calls the view itself
+        self.assertEqual(self._call('POST', self._view(depth)).content, b'ok')
+        self.assertEqual(self._call('GET', atomic_view(self._view(depth))).content, b'ok')
+        with override_settings(SAFE_REQUEST_TRANSACTIONS=READ_ONLY):
+            self._call('GET', self._view(depth))
+        self.assertEqual(depth, [outside + 1] * 3)
+
+    def test_get_views_that_write_are_marked_atomic(self):
+        for name, kwargs in (('logout', {}), ('operations:resident_qr', {'pk': 1}),
+                             ('administrator:mark_request_read', {'pk': 1}),
+                             ('administrator:user_permissions_edit', {'pk': 1})):
+            view = get_resolver().resolve(reverse(name, kwargs=kwargs)).func
+            self.assertEqual(request_transaction_mode('GET', view), ATOMIC, name)
+
+
+    def test_async_views_are_left_to_autocommit(self):
+        async def view(request):
+            return HttpResponse('ok')
+
+        for marked in (view, read_only_view(view), atomic_view(view)):
+            self.assertIsNone(self._call('POST', marked))
+        batch = get_resolver().resolve(reverse('app:residents_batch')).func
+        self.assertEqual(request_transaction_mode('POST', batch), AUTOCOMMIT)  # @async_view wins
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.addCleanup(lag_monitor.reset)
+
+    def _route_read(self, lag):
+        with mock.patch.object(lag_monitor, 'measure', return_value=lag):
+            lag_monitor.reset()
+            return ReplicaRouter().db_for_read(Resident)
+
+    def test_router_uses_replica_only_when_marked_and_fresh(self):
+        self.assertIsNone(self._route_read(0.0))
+        token = replica_reads.set(True)
+        try:
+            self.assertEqual(self._route_read(0.5), REPLICA_ALIAS)
+            self.assertEqual(self._route_read(60.0), DEFAULT_DB_ALIAS)  # lagging
+            self.assertEqual(self._route_read(None), DEFAULT_DB_ALIAS)  # unreachable
+        finally:
+            replica_reads.reset(token)
+        self.assertEqual(ReplicaRouter().db_for_write(Resident), DEFAULT_DB_ALIAS)
+
+    def test_middleware_routes_listed_gets_and_pins_writers_to_primary(self):
+        seen = []
+
+        def view(request):
+            seen.append(replica_reads.get())
+            return HttpResponse('ok')
+
+        def get_response(request):
+            match = get_resolver().resolve(request.path_info)
+            request.resolver_match = match
+            return middleware.process_view(request, match.func, (), {}) or view(request)
+
+        with mock.patch('main.middleware.replica_configured', return_value=True):
+            middleware = ReplicaRoutingMiddleware(get_response)
+        factory = RequestFactory()
+        report = reverse('reports:list_male')
+        middleware(factory.get(report))
+        middleware(factory.get(reverse('operations:residents_record')))
+        pinned = factory.get(report)
+        pinned.COOKIES[PIN_PRIMARY_COOKIE] = '1'
+        middleware(pinned)
+        response = middleware(factory.post(report))
+        lookup = middleware(factory.post(reverse('app:residents_batch')))  # a @read_only_view POST
+        self.assertEqual(seen, [True, False, False, False, True])
+        self.assertIn(PIN_PRIMARY_COOKIE, response.cookies)
+        self.assertNotIn(PIN_PRIMARY_COOKIE, lookup.cookies)
+        self.assertFalse(replica_reads.get())
+
+
+def public_paths(patterns=None, prefix=''):
+    """A concrete path (every int converter set to 1) for each @public_route view."""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from public_paths(pattern.url_patterns, route)
+        elif getattr(pattern.callback, 'public_route', False) or getattr(
+            getattr(pattern.callback, 'view_class', None), 'public_route', False,
+        ):
+            yield '/' + re.sub(r'<[^>]+>', '1', route)
+
+
+@override_settings(
+    ACTIVITY_LOG_BUFFERED=False, EMAIL_OUTBOX_AUTOSEND=False, INSTRUMENTATION_SAMPLE_RATE=0,
+    SUPABASE_STORAGE_EMULATOR=False,
+)
+class PublicRouteTests(TestCase):
+    def setUp(self):
+        self.client = Client(raise_request_exception=False)
+
+    def _is_public(self, path):
+        response = self.client.get(path)
+        login = response.get('Location', '').startswith(settings.LOGIN_URL + '?next=')
+        return getattr(response.wsgi_request, 'is_public_route', False) and not login
+
+    def test_every_public_route_is_reachable_anonymously(self):
+        paths = sorted(set(public_paths()))
+        self.assertIn('/sign-in/', paths)
+        self.assertIn('/app/api/sync/residents/', paths)
+        for path in paths:
+            with self.subTest(path=path):
+                self.assertTrue(self._is_public(path))
+                self.assertTrue(self._is_public(path.rstrip('/')))
+
+    def test_private_routes_redirect_to_sign_in(self):
+        for path in ('/', '/operations/', '/administrator/', '/sign-in/extra/'):
+            with self.subTest(path=path):
+                self.assertFalse(self._is_public(path))
+
+    def test_prefix_tricks_are_not_public(self):
+        matcher = compile_public_matcher()
+        self.assertTrue(matcher.match('/static/css/site.css'))
+        for path in (
+            '/app-admin/', '/metricsX', '/metrics/extra', '/sign-inX/',
+            '/static/../', '/static/..', '/static/../operations/', '/static/css/../../operations/',
+            '/media/./x', '/admin/../administrator/',
+        ):
+            with self.subTest(path=path):
+                self.assertIsNone(matcher.match(path))
+                self.assertFalse(self._is_public(path))
+
+
+class AsyncMiddlewareTests(TestCase):
+    def test_middleware_chain_stays_async(self):
+        with self.assertNoLogs('django.request', level='DEBUG'):  # Django logs every sync/async adaptation
+            BaseHandler().load_middleware(is_async=True)
+
+
+@override_settings(ACTIVITY_LOG_BUFFERED=False, INSTRUMENTATION_SAMPLE_RATE=0)
+class RequestInstrumentationTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        self.url = reverse('administrator:user_activity_api')
+
+    def _endpoint(self, name):
+        return next(row for row in metrics.endpoints() if row['name'] == name)
+
+    def test_request_is_recorded_under_its_url_name(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        row = self._endpoint('administrator:user_activity_api')
+        self.assertEqual(row['count'], 1)
+        self.assertGreater(row['max'], 0)
+        self.assertEqual(row['avg_queries'], len(queries))
+        self.assertGreater(row['avg_db_ms'], 0)
+        self.assertLessEqual(row['avg_db_ms'], row['max'])
+        self.assertEqual(row['avg_bytes'], len(response.content))
+        self.assertFalse(RequestSample.objects.exists())
+
+    def test_only_the_slowest_statements_are_kept(self):
+        durations = [4, 1, 8, 2, 6, 3, 7, 5]
+        timer = _QueryTimer()
+        clock = [value for ms in durations for value in (0, ms / 1000)]
+        with mock.patch('main.middleware.time.perf_counter', side_effect=clock):
+            for ms in durations:
+                timer(lambda *args: None, f'SELECT {ms}', (), False, {})
+        self.assertEqual(timer.count, 8)
+        self.assertEqual(sorted(sql for _, sql in timer.slowest), [f'SELECT {ms}' for ms in (4, 5, 6, 7, 8)])
+
+        store = MetricsStore(slow_sql_limit=3)
+        for ms in durations:
+            store.record_sql(f'SELECT {ms}', ms, 'view')
+        self.assertEqual([entry['duration_ms'] for entry in store.slow_sql()], [8, 7, 6])
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=1.0)
+    def test_sampled_requests_are_saved(self):
+        response = self.client.get(self.url, {'user': 'nobody'})
+        sample = RequestSample.objects.get()
+        self.assertEqual(
+            (sample.name, sample.path, sample.method, sample.status_code, sample.response_bytes),
+            ('administrator:user_activity_api', self.url, 'GET', 200, len(response.content)),
+        )
+        self.assertGreater(sample.queries, 0)
+        self.assertGreater(sample.duration_ms, sample.db_ms)
+
+
+def parse_exposition(text):
+    """{family: {'help', 'type', 'samples': [(name, labels, value)]}} from Prometheus text format."""
+    families, family = {}, None
+    sample = re.compile(r'([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+    for line in text.splitlines():
+        if line.startswith('# '):
+            kind, family, rest = line[2:].split(' ', 2)
+            families.setdefault(family, {'samples': []})[kind.lower()] = rest
+            continue
+        name, labels, value = sample.match(line).groups()
+        float(value)  # every value is a number
+        assert family and name.startswith(family), f'{line!r} outside its # TYPE block'
+        labels = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', labels or ''))
+        families[family]['samples'].append((name, labels, value))
+    return families
+
+
+@override_settings(METRICS_TOKEN='scrape-token')
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.url = reverse('metrics')
+
+    def test_scrapers_need_the_token_or_an_admin_session(self):
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        for header in ('Bearer wrong-token', 'Bearer ', 'scrape-token'):
+            with self.subTest(header=header):
+                response = self.client.get(self.url, headers={'authorization': header})
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get(self.url, headers={'authorization': 'Bearer '}).status_code, 401)
+        scraper = self.client.get(self.url, headers={'authorization': 'Bearer scrape-token'})
+        self.assertEqual(scraper.status_code, 200)
+        self.client.force_login(User.objects.create_user('clerk'))
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_body_is_prometheus_text(self):
+        for ms in (3, 30, 30, 300, 20000):
+            metrics.record_request('reports:summary', ms, 1, 2, 100, 200)
+        metrics.observe('supabase_upload', 120, {'kind': 'photo'})
+        metrics.record_cache('sidebar', True)
+        response = self.client.get(self.url, headers={'authorization': 'Bearer scrape-token'})
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        families = parse_exposition(response.content.decode())
+        for family, data in families.items():
+            with self.subTest(family=family):
+                self.assertTrue(data.get('help'))
+                self.assertIn(data.get('type'), ('counter', 'gauge', 'histogram'))
+                if data['type'] == 'histogram':
+                    self._check_histogram(family, data['samples'])
+
+        latency = families['pgso_request_duration_seconds']['samples']
+        buckets = [value for name, labels, value in latency if name.endswith('_bucket')]
+        self.assertEqual(buckets[0], '1')  # le=0.005
+        self.assertEqual(latency[-1], ('pgso_request_duration_seconds_count', {'view': 'reports:summary'}, '5'))
+        hit_ratio = families['pgso_cache_hit_ratio']['samples']
+        self.assertIn(('pgso_cache_hit_ratio', {'cache': 'sidebar'}, '1.0000'), hit_ratio)
+        self.assertIn('pgso_residents', families)
+
+    def _check_histogram(self, family, samples):
+        series = {}
+        for name, labels, value in samples:
+            key = tuple(sorted((k, v) for k, v in labels.items() if k != 'le'))
+            series.setdefault(key, []).append((name[len(family):], labels.get('le'), float(value)))
+        self.assertTrue(series)
+        for key, lines in series.items():
+            buckets = [(le, value) for suffix, le, value in lines if suffix == '_bucket']
+            counts = [value for _, value in buckets]
+            self.assertEqual(counts, sorted(counts))  # cumulative
+            self.assertEqual(buckets[-1][0], '+Inf')
+            self.assertEqual([suffix for suffix, _, _ in lines[-2:]], ['_sum', '_count'])
+            self.assertEqual(lines[-1][2], counts[-1])
+
+
+class _ImageHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append((self.client_address[1], self.headers.get('If-None-Match')))
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.send_header('ETag', '"v1"')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', '5')
+        self.end_headers()
+        self.wfile.write(b'image')
+
+    def log_message(self, *args):
+        pass
+
+
+class ImageCacheTests(TestCase):
+    def setUp(self):
+        self.enterContext(override_settings(FILE_CACHE_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+        _ImageHandler.requests = []
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _ImageHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.url = f'http://127.0.0.1:{server.server_address[1]}/profiles/1.jpg'
+
+    def test_fresh_copies_skip_the_network_and_stale_ones_revalidate(self):
+        path = fetch_image(self.url)
+        self.assertEqual(path.read_bytes(), b'image')
+        self.assertEqual(fetch_image(self.url), path)
+        self.assertEqual(len(_ImageHandler.requests), 1)
+
+        with override_settings(IMAGE_CACHE_SECONDS=0):
+            self.assertEqual(fetch_image(self.url), path)
+        self.assertEqual(len(_ImageHandler.requests), 2)
+        (first_port, _), (second_port, validator) = _ImageHandler.requests
+        self.assertEqual(validator, '"v1"')  # answered with 304, no body
+        self.assertEqual(first_port, second_port)  # same keep-alive connection
@@ -0,0 +1,94 @@
+"""
+Per-request transaction policy, used by TransactionRoutingMiddleware instead of ATOMIC_REQUESTS.
+
+Unsafe methods (POST, PUT, PATCH, DELETE) run the view in transaction.atomic, as before.
+GET / HEAD / OPTIONS run in settings.SAFE_REQUEST_TRANSACTIONS mode:
+  'autocommit'  no BEGIN/COMMIT at all; each query commits on its own (the fast path)
+  'read_only'   one transaction started as BEGIN READ ONLY on PostgreSQL, so a stray write
+                fails loudly; use it in staging to find GET views that still write
+Views opt out with @atomic_view (always atomic, e.g. a GET that saves a generated file URL) or
+opt in with @read_only_view (treated as safe whatever the method, e.g. a POST search API).
+Django's transaction.non_atomic_requests is respected and always means autocommit; async views
+use @async_view, which applies it for every database (Django cannot wrap them in ATOMIC_REQUESTS).
+TransactionRoutingMiddleware leaves async views alone, so on them @read_only_view only affects
+replica routing (ReplicaRoutingMiddleware): the request may read from the replica and does not pin
+the primary, whatever its method.
+"""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+ATOMIC = 'atomic'
+READ_ONLY = 'read_only'
+AUTOCOMMIT = 'autocommit'
+SAFE_MODES = (AUTOCOMMIT, READ_ONLY)
+
+_SAFE = 'safe'
+
+
+def atomic_view(view_func):
+    """Always run the view in transaction.atomic, even for GET (views that write on GET)."""
+    view_func.transaction_mode = ATOMIC
+    return view_func
+
+
+def read_only_view(view_func):
+    """
+    Run the view in the SAFE_REQUEST_TRANSACTIONS mode for every method (views that never write).
+    On an async view this only marks it as a reader for replica routing; it runs in autocommit.
+    """
+    view_func.transaction_mode = _SAFE
+    return view_func
+
+
+def is_read_only_view(view_func):
+    """True for views marked @read_only_view."""
+    view_class = getattr(view_func, 'view_class', None)
+    return _SAFE in (getattr(view_func, 'transaction_mode', None), getattr(view_class, 'transaction_mode', None))
+
+
+def async_view(view_func):
+    """Mark an async view non-atomic on every database, so it also works with ATOMIC_REQUESTS on."""
+    view_func._non_atomic_requests = set(settings.DATABASES)
+    return view_func
+
+
+def safe_request_mode():
+    return getattr(settings, 'SAFE_REQUEST_TRANSACTIONS', AUTOCOMMIT)
+
+
+def request_transaction_mode(method, view_func, using=DEFAULT_DB_ALIAS):
+    """Return ATOMIC, READ_ONLY or AUTOCOMMIT for a request to view_func."""
+    if using in getattr(view_func, '_non_atomic_requests', ()):
+        return AUTOCOMMIT
+    view_class = getattr(view_func, 'view_class', None)
+    marked = getattr(view_func, 'transaction_mode', None) or getattr(view_class, 'transaction_mode', None)
+    if marked == ATOMIC:
+        return ATOMIC
+    if marked == _SAFE or method in SAFE_METHODS:
+        return safe_request_mode()
+    return ATOMIC
+
+
+@contextmanager
+def read_only_transaction(using=DEFAULT_DB_ALIAS):
+    """
+    transaction.atomic that PostgreSQL opens as BEGIN READ ONLY. psycopg sends the BEGIN with the
+    first query, so this costs no extra round-trip. Elsewhere (SQLite) it is a plain atomic block.
+    """
+    connection = transaction.get_connection(using)
+    outermost = not connection.in_atomic_block
+    raw = None
+    try:
+        with transaction.atomic(using=using):
+            if outermost and connection.vendor == 'postgresql' and hasattr(connection.connection, 'read_only'):
+                raw = connection.connection
+                raw.read_only = True
+            yield
+    finally:
+        # Reset after COMMIT/ROLLBACK: the connection may be reused (persistent or pooled).
+        if raw is not None and not raw.closed:
+            raw.read_only = None
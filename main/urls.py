@@ -5,11 +5,13 @@ from django.urls import path, include
 from django.views.generic import RedirectView
 
 from . import views as main_views
+from .public_routes import public_route
 
 urlpatterns = [
-    path('favicon.ico', RedirectView.as_view(url=settings.STATIC_URL + 'favicon.ico', permanent=True)),
+    path('favicon.ico', public_route(RedirectView.as_view(url=settings.STATIC_URL + 'favicon.ico', permanent=True))),
     path('admin/', admin.site.urls),
-    path('sign-in/', main_views.RoleLoginView.as_view(), name='login'),
+    path('metrics', main_views.metrics, name='metrics'),
+    path('sign-in/', public_route(main_views.RoleLoginView.as_view()), name='login'),
     path('sign-out/', main_views.sign_out, name='logout'),
     path('password-reset/', main_views.password_reset_request, name='password_reset'),
     path('password-reset/done/', main_views.password_reset_done, name='password_reset_done'),
@@ -2,6 +2,8 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model, logout
 from django.contrib import messages
+from django.db.models import Count, Q
+from django.http import HttpResponse
 from django.shortcuts import redirect, render
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
@@ -20,15 +22,21 @@ from administrator.activity_log import log_activity_for_user
 from administrator.email_utils import send_and_log_email
 from administrator.utils import ADMIN_GROUP_NAME
 
+from .public_routes import public_route
+from .transactions import atomic_view
+
 User = get_user_model()
 
 
+@public_route
+@atomic_view
 def sign_out(request):
     """Sign out the user. Accepts both GET and POST so links and forms work."""
     logout(request)
     return redirect(settings.LOGOUT_REDIRECT_URL)
 
 
+@public_route
 @require_http_methods(['GET', 'POST'])
 def password_reset_request(request):
     """User requests password change. Admin confirms, then new password is sent to user's email."""
@@ -61,6 +69,7 @@ def password_reset_request(request):
     return render(request, 'registration/password_reset_form.html')
 
 
+@public_route
 def password_reset_done(request):
     """Show 'request submitted' – admin will confirm and send new password to email."""
     return render(request, 'registration/password_reset_done.html')
@@ -100,6 +109,7 @@ class RoleLoginView(LoginView):
         return super().form_valid(form)
 
 
+@public_route
 @require_http_methods(['GET', 'POST'])
 def admin_password_reset_request(request):
     """
@@ -152,6 +162,7 @@ def admin_password_reset_request(request):
     return render(request, 'registration/admin_password_reset_form.html')
 
 
+@public_route
 @require_http_methods(['GET', 'POST'])
 def admin_password_reset_verify(request):
     """Verify OTP and set a new admin password."""
@@ -221,3 +232,59 @@ def admin_password_reset_verify(request):
         return redirect('login')
 
     return render(request, 'registration/admin_password_reset_verify.html', {'token': token})
+
+
+@public_route
+@require_http_methods(['GET'])
+def metrics(request):
+    """
+    Prometheus text exposition of request, DB, cache, queue and Supabase metrics.
+    Authenticate with 'Authorization: Bearer <METRICS_TOKEN>' (for scrapers) or an Admin session.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    auth = request.META.get('HTTP_AUTHORIZATION', '')
+    if not (token and secrets.compare_digest(auth, f'Bearer {token}')):
+        if not (request.user.is_authenticated and _is_admin_user(request.user)):
+            response = HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+            response['WWW-Authenticate'] = 'Bearer'
+            return response
+
+    from django.db import connections
+    from administrator.activity_log import pending_activity_count
+    from administrator.models import OutboxEmail
+    from main.db_router import REPLICA_ALIAS, lag_monitor, replica_configured
+    from main.instrumentation import db_pool_gauges, prometheus_text
+    from operations.models import Resident
+
+    outbox = dict(
+        OutboxEmail.objects.exclude(status=OutboxEmail.STATUS_SENT)
+        .values_list('status')
+        .annotate(n=Count('id'))
+    )
+    residents = Resident.objects.aggregate(
+        alive=Count('id', filter=Q(status=Resident.STATUS_ALIVE)),
+        deceased=Count('id', filter=Q(status=Resident.STATUS_DECEASED)),
+        voters=Count('id', filter=Q(status=Resident.STATUS_ALIVE, is_voter=True)),
+    )
+    gauges = [
+        ('db_connection_open', 'Whether this worker holds an open DB connection.',
+         {'alias': conn.alias}, 1 if conn.connection is not None else 0)
+        for conn in connections.all()
+    ]
+    gauges += [
+        ('job_queue_depth', 'Items waiting in background queues.', {'queue': 'email_outbox'},
+         outbox.get(OutboxEmail.STATUS_PENDING, 0) + outbox.get(OutboxEmail.STATUS_SENDING, 0)),
+        ('job_queue_depth', 'Items waiting in background queues.', {'queue': 'email_outbox_dead'},
+         outbox.get(OutboxEmail.STATUS_DEAD, 0)),
+        ('job_queue_depth', 'Items waiting in background queues.', {'queue': 'activity_log'},
+         pending_activity_count()),
+        ('residents', 'Residents by status.', {'status': 'alive'}, residents['alive']),
+        ('residents', 'Residents by status.', {'status': 'deceased'}, residents['deceased']),
+        ('voters', 'Registered voters among living residents.', {}, residents['voters']),
+    ]
+    gauges += db_pool_gauges()
+    if replica_configured():
+        lag = lag_monitor.current()
+        gauges.append(('db_replica_lag_seconds', 'Replication lag of the read replica (-1 = unreachable).',
+                       {'alias': REPLICA_ALIAS}, -1 if lag is None else lag))
+    return HttpResponse(prometheus_text(gauges), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -7,7 +7,7 @@ from django.db.models import Q, Count
 from django.db.models.functions import TruncMonth, ExtractYear
 from operations.models import Resident
 from reference.models import Barangay, Municipality
-from administrator.models import UserActivity
+from administrator.models import UserActivity, UserActivityArchive
 from datetime import date
 
 
@@ -56,7 +56,7 @@ def dashboard(request):
     if activity_month:
         activity_qs = activity_qs.filter(created_at__month=activity_month)
 
-    chart_data = _build_activity_chart_data(activity_qs)
+    chart_data = _build_activity_chart_data(activity_qs, _archived_activity(activity_year, activity_month))
     total_login = chart_data['totals']['login']
     total_logout = chart_data['totals']['logout']
     total_create = chart_data['totals']['create']
@@ -121,10 +121,12 @@ def dashboard(request):
     }
     bar_muni_chart_json = json.dumps(bar_muni_chart_data)
 
-    # Available years for activity filter (from UserActivity)
-    activity_years = list(dict.fromkeys(
-        [d.year for d in UserActivity.objects.dates('created_at', 'year', order='DESC')]
-    ))
+    # Available years for activity filter (from UserActivity and its monthly archives)
+    activity_years = sorted(
+        {d.year for d in UserActivity.objects.dates('created_at', 'year')}
+        | {d.year for d in UserActivityArchive.objects.dates('month', 'year')},
+        reverse=True,
+    )
     if not activity_years or today.year not in activity_years:
         activity_years = [today.year] + [y for y in activity_years if y != today.year]
 
@@ -147,9 +149,23 @@ def dashboard(request):
     })
 
 
-def _build_activity_chart_data(activity_qs):
-    """Build chart data from UserActivity queryset."""
-    by_month = (
+def _archived_activity(activity_year, activity_month):
+    """Per-month action counts for archived UserActivity months matching the year/month filter."""
+    archives = UserActivityArchive.objects.all()
+    if activity_year:
+        archives = archives.filter(month__year=activity_year)
+    if activity_month:
+        archives = archives.filter(month__month=activity_month)
+    actions = ['login', 'logout', 'create', 'update', 'delete']
+    return [
+        {'month': a.month, **{name: (a.action_counts or {}).get(name, 0) for name in actions}}
+        for a in archives.only('month', 'action_counts')
+    ]
+
+
+def _build_activity_chart_data(activity_qs, archived=()):
+    """Build chart data from UserActivity queryset plus rows from _archived_activity()."""
+    live_months = list(
         activity_qs
         .annotate(month=TruncMonth('created_at'))
         .values('month')
@@ -162,6 +178,19 @@ def _build_activity_chart_data(activity_qs):
         )
         .order_by('month')
     )
+    # Merge archived months in front of the live ones; a month can be split between both
+    # if rows for it arrived after it was archived.
+    merged = {}
+    for row in list(archived) + live_months:
+        if not row['month']:
+            continue
+        key = (row['month'].year, row['month'].month)
+        if key in merged:
+            for name in ('login', 'logout', 'create', 'update', 'delete'):
+                merged[key][name] += row[name]
+        else:
+            merged[key] = dict(row)
+    by_month = [merged[key] for key in sorted(merged)]
     chart_labels = []
     chart_login = []
     chart_logout = []
@@ -221,7 +250,7 @@ def dashboard_activity_chart(request):
         activity_qs = activity_qs.filter(created_at__year=activity_year)
     if activity_month:
         activity_qs = activity_qs.filter(created_at__month=activity_month)
-    data = _build_activity_chart_data(activity_qs)
+    data = _build_activity_chart_data(activity_qs, _archived_activity(activity_year, activity_month))
     return JsonResponse(data)
 
 
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class OperationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'operations'
+
+    def ready(self):
+        import operations.signals  # noqa: F401
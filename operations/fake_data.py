@@ -0,0 +1,348 @@
+"""
+Fast, reproducible fake data for development and load tests.
+
+Residents are generated in fixed-size chunks. Chunk k always uses the random stream
+Random(f'{seed}:{k}') and the resident_id block starting at first_seq + k * batch_size, so the
+output is the same whether the chunks are written serially or by parallel worker processes.
+Ages, terms of office and activity dates are counted back from a fixed reference date (as_of,
+default AS_OF) rather than today, so a seed gives the same rows on any day.
+Each barangay gets its own profile (size, age mix, voter / PWD / 4Ps / solo parent rates,
+dialect), so reports and per-barangay pages see uneven, production-like data.
+Used by `manage.py create_fake_residents` and `manage.py seed_benchmark_data`.
+"""
+import csv
+import io
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time, timedelta
+
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from reports.sidebar import bump_sidebar_version
+
+from .models import BarangayOfficial, Coordinator, Resident
+
+# Fake names (Filipino-style first and last names)
+FIRST_NAMES_MALE = [
+    'Juan', 'Pedro', 'Jose', 'Antonio', 'Manuel', 'Carlos', 'Miguel', 'Ramon', 'Fernando', 'Ricardo',
+    'Eduardo', 'Alberto', 'Roberto', 'Francisco', 'Angel', 'Rafael', 'Luis', 'Enrique', 'Andres', 'Sergio',
+    'Marco', 'Paolo', 'Christian', 'Mark', 'John', 'Michael', 'David', 'Daniel', 'James', 'Ryan',
+]
+FIRST_NAMES_FEMALE = [
+    'Maria', 'Ana', 'Rosa', 'Carmen', 'Elena', 'Teresa', 'Lourdes', 'Luz', 'Fe', 'Grace',
+    'Joy', 'Mary', 'Elizabeth', 'Patricia', 'Jennifer', 'Michelle', 'Angela', 'Christine', 'Karen', 'Anna',
+    'Maricar', 'Jasmine', 'Kristine', 'Catherine', 'Diana', 'Rose', 'Liza', 'Marilyn', 'Nina',
+]
+LAST_NAMES = [
+    'Dela Cruz', 'Santos', 'Reyes', 'Garcia', 'Ramos', 'Mendoza', 'Cruz', 'Torres', 'Gonzales', 'Villanueva',
+    'Fernandez', 'Rivera', 'Aquino', 'Castillo', 'Castro', 'Perez', 'Sanchez', 'Romero', 'Lopez', 'Mercado',
+    'Flores', 'Morales', 'Gutierrez', 'Ocampo', 'Silva', 'Bautista', 'Diaz', 'Martinez', 'Santiago',
+    'Navarro', 'Vargas', 'Jimenez', 'Salazar', 'Medina', 'Herrera', 'Cabrera', 'Vega', 'Sandoval', 'Cortez',
+]
+MIDDLE_INITIALS = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'M', 'R', 'S', '']
+OCCUPATIONS = ['Farmer', 'Fisherman', 'Driver', 'Vendor', 'Laborer', 'Housewife', 'Teacher', 'Barangay Staff', 'Self-employed', 'None']
+DIALECTS = ['Tagalog', 'Cuyonon', 'Waray', 'Cebuano', 'Ilocano', 'Bisaya']
+PLACES_OF_BIRTH = ['Manila', 'Puerto Princesa', 'Quezon City', 'Cebu', 'Davao', 'Barangay Health Center']
+OFFICIAL_TITLES = ['Punong Barangay', 'Kagawad', 'Secretary', 'Treasurer', 'SK Chairperson']
+
+# Default reference date for generated ages and dates (--as-of on the commands).
+AS_OF = date(2026, 1, 1)
+
+# Columns written by COPY (everything except id and the nullable date_verified).
+RESIDENT_COLUMNS = [
+    'resident_id', 'barangay_id', 'status', 'lastname', 'firstname', 'middlename', 'suffix', 'gender',
+    'date_of_birth', 'place_of_birth', 'address', 'purok', 'contact_no', 'civil_status',
+    'educational_attainment', 'citizenship', 'dialect_ethnic', 'occupation', 'health_status',
+    'economic_status', 'is_voter', 'precinct_number', 'voter_legend', 'verified_by', 'remarks',
+    'profile_picture', 'profile_picture_url', 'qr_code_url', 'created_at', 'updated_at',
+]
+
+
+class BarangayProfile:
+    """Per-barangay demographics, derived only from (seed, barangay pk)."""
+
+    def __init__(self, seed, barangay_id):
+        rng = random.Random(f'{seed}:barangay:{barangay_id}')
+        self.weight = rng.choice([1, 1, 2, 3, 5, 8])  # a few large barangays, many small ones
+        self.oldest_year = rng.randint(1930, 1945)
+        self.senior_share = rng.uniform(0.08, 0.2)
+        self.voter_rate = rng.uniform(0.55, 0.8)
+        self.pwd_rate = rng.uniform(0.03, 0.1)
+        self.fourps_rate = rng.uniform(0.05, 0.25)
+        self.solo_parent_rate = rng.uniform(0.04, 0.12)
+        self.deceased_rate = rng.uniform(0.03, 0.08)
+        self.puroks = rng.randint(3, 9)
+        self.dialect = rng.choice(DIALECTS)
+        self.precinct_base = rng.randint(1, 900)
+
+
+def profiles_for(barangay_ids, seed):
+    return {pk: BarangayProfile(seed, pk) for pk in barangay_ids}
+
+
+def _age(dob, today):
+    return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+
+
+def resident_row(rng, resident_id, barangay_id, profile, today, now, remarks=''):
+    """Field values for one Resident (a dict usable by Resident(**row) and COPY)."""
+    is_male = rng.random() < 0.5
+    if rng.random() < profile.senior_share:
+        year = rng.randint(profile.oldest_year, today.year - 61)
+    else:
+        year = rng.randint(today.year - 60, today.year - 1)
+    dob = date(year, rng.randint(1, 12), rng.randint(1, 28))
+    age = _age(dob, today)
+
+    r = rng.random()
+    if age >= 60:
+        economic = 'SENIOR CITIZEN'
+    elif age >= 18 and r < profile.fourps_rate:
+        economic = '4PS MEMBER'
+    elif age >= 18 and r < profile.fourps_rate + profile.solo_parent_rate:
+        economic = 'SOLO PARENT'
+    elif age < 22:
+        economic = rng.choice(['IN SCHOOL', 'IN SCHOOL', 'OUT OF SCHOOL'])
+    else:
+        economic = rng.choice(['NHTS MEMBER', 'OUT OF SCHOOL', 'WITH BUSINESS'])
+
+    is_voter = age >= 18 and rng.random() < profile.voter_rate
+    pwd = rng.random() < profile.pwd_rate
+    legend = []
+    if is_voter and pwd:
+        legend.append('B')
+    if is_voter and age >= 60:
+        legend.append('C')
+    middle = rng.choice(MIDDLE_INITIALS)
+    last = rng.choice(LAST_NAMES)
+    purok = f'Purok {rng.randint(1, profile.puroks)}'
+    return {
+        'resident_id': resident_id,
+        'barangay_id': barangay_id,
+        'status': Resident.STATUS_DECEASED if rng.random() < profile.deceased_rate * (3 if age >= 60 else 1) else Resident.STATUS_ALIVE,
+        'lastname': last,
+        'firstname': rng.choice(FIRST_NAMES_MALE if is_male else FIRST_NAMES_FEMALE),
+        'middlename': middle + '.' if middle else '',
+        'suffix': '',
+        'gender': Resident.GENDER_MALE if is_male else Resident.GENDER_FEMALE,
+        'date_of_birth': dob,
+        'place_of_birth': rng.choice(PLACES_OF_BIRTH),
+        'address': f'{last} Residence, {purok}',
+        'purok': purok,
+        'contact_no': '09' + ''.join(rng.choice('0123456789') for _ in range(9)),
+        'civil_status': 'SINGLE' if age < 20 else rng.choice(['SINGLE', 'MARRIED', 'MARRIED', 'MARRIED', 'WIDOW', 'SEPARATED', 'LIVE-IN']),
+        'educational_attainment': rng.choice([c for c, _ in Resident.EDUCATION_CHOICES]),
+        'citizenship': 'Filipino',
+        'dialect_ethnic': profile.dialect if rng.random() < 0.7 else rng.choice(DIALECTS),
+        'occupation': 'Student' if age < 22 else rng.choice(OCCUPATIONS),
+        'health_status': 'PWD' if pwd else rng.choice(['HEALTHY', 'HEALTHY', 'HEALTHY', 'SMOKER', 'HYPERTENSION', 'DIABETIC']),
+        'economic_status': economic,
+        'is_voter': is_voter,
+        'precinct_number': f'{profile.precinct_base + rng.randint(0, 20):04d}A' if is_voter else '',
+        'voter_legend': ','.join(legend),
+        'verified_by': '',
+        'remarks': remarks,
+        'profile_picture': '',
+        'profile_picture_url': '',
+        'qr_code_url': '',
+        'created_at': now,
+        'updated_at': now,
+    }
+
+
+def next_resident_seq():
+    """First sequence number for a new block of resident IDs (same source as Resident.save())."""
+    return (Resident.objects.aggregate(m=Max('pk'))['m'] or 0) + 1
+
+
+class ResidentPlan:
+    """Everything a worker needs to build and insert chunk k; picklable for worker processes."""
+
+    def __init__(self, count, seed, barangay_ids, first_seq, batch_size=2000, remarks='', use_copy=False,
+                 as_of=AS_OF):
+        self.count = count
+        self.seed = seed
+        self.barangay_ids = list(barangay_ids)
+        self.first_seq = first_seq
+        self.batch_size = batch_size
+        self.remarks = remarks
+        self.use_copy = use_copy
+        self.as_of = as_of
+        self.now = timezone.now()  # write time for created_at / updated_at (COPY only), not generated data
+
+    @property
+    def chunks(self):
+        return (self.count + self.batch_size - 1) // self.batch_size
+
+    def rows(self, k):
+        rng = random.Random(f'{self.seed}:{k}')
+        profiles = profiles_for(self.barangay_ids, self.seed)
+        cum_weights = list(itertools.accumulate(profiles[pk].weight for pk in self.barangay_ids))
+        start = k * self.batch_size
+        rows = []
+        for i in range(start, min(start + self.batch_size, self.count)):
+            barangay_id = rng.choices(self.barangay_ids, cum_weights=cum_weights)[0]
+            rows.append(resident_row(
+                rng, Resident.format_resident_id(self.first_seq + i), barangay_id,
+                profiles[barangay_id], self.as_of, self.now, self.remarks,
+            ))
+        return rows
+
+    def insert(self, k):
+        rows = self.rows(k)
+        with transaction.atomic():
+            if self.use_copy:
+                copy_rows(Resident._meta.db_table, RESIDENT_COLUMNS, rows)
+            else:
+                Resident.objects.bulk_create([Resident(**row) for row in rows])
+        return len(rows)
+
+
+def copy_rows(table, columns, rows):
+    """COPY rows (dicts) into table on PostgreSQL. Works with psycopg2 and psycopg 3."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['' if row[c] is None else row[c] for c in columns])
+    quote = connection.ops.quote_name
+    sql = f'COPY {quote(table)} ({", ".join(quote(c) for c in columns)}) FROM STDIN WITH (FORMAT csv)'
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        raw = cursor.cursor
+        if hasattr(raw, 'copy_expert'):
+            raw.copy_expert(sql, buffer)
+        else:
+            with raw.copy(sql) as copy:
+                copy.write(buffer.read())
+
+
+def _init_worker(settings_module):
+    # Under 'spawn' (Windows, macOS) the child starts empty; under 'fork' this is a no-op setup
+    # and only the inherited DB connection has to be dropped.
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+    connections.close_all()
+
+
+_worker_plan = None
+
+
+def _set_worker_plan(settings_module, plan):
+    global _worker_plan
+    _init_worker(settings_module)
+    _worker_plan = plan
+
+
+def _insert_chunk(k):
+    return _worker_plan.insert(k)
+
+
+def create_residents(plan, workers=1, progress=None):
+    """Insert every chunk of plan, in worker processes when workers > 1. Returns rows created."""
+    report = progress or (lambda message: None)
+    created = 0
+    if workers <= 1 or plan.chunks <= 1:
+        for k in range(plan.chunks):
+            created += plan.insert(k)
+            report(f'residents: {created}/{plan.count}')
+    else:
+        connections.close_all()  # never share a socket with forked children
+        settings_module = os.environ.get('DJANGO_SETTINGS_MODULE', 'main.settings')
+        with ProcessPoolExecutor(max_workers=workers, initializer=_set_worker_plan,
+                                 initargs=(settings_module, plan)) as pool:
+            for n in pool.map(_insert_chunk, range(plan.chunks)):
+                created += n
+                report(f'residents: {created}/{plan.count}')
+    bump_sidebar_version()  # bulk inserts send no post_save
+    return created
+
+
+def create_officials(barangay_ids, positions, per_barangay, seed, resident_filter=None, start_date=None,
+                     as_of=AS_OF):
+    """
+    Up to per_barangay active officials in each barangay that has none yet, picked from its
+    living adult residents. Returns the number created.
+    """
+    if per_barangay <= 0 or not positions:
+        return 0
+    rng = random.Random(f'{seed}:officials')
+    start_date = start_date or date(as_of.year - 2, 7, 1)
+    adult_cutoff = date(as_of.year - 18, 1, 1)
+    has_officials = set(BarangayOfficial.objects.filter(is_active=True).values_list('barangay_id', flat=True))
+    officials = []
+    for barangay_id in barangay_ids:
+        if barangay_id in has_officials:
+            continue
+        candidates = Resident.objects.filter(
+            barangay_id=barangay_id, status=Resident.STATUS_ALIVE, date_of_birth__lt=adult_cutoff,
+            **(resident_filter or {}),
+        ).order_by('pk').values_list('pk', flat=True)[:per_barangay * 10]
+        candidates = list(candidates)
+        for slot, resident_pk in enumerate(rng.sample(candidates, min(per_barangay, len(candidates)))):
+            officials.append(BarangayOfficial(
+                resident_id=resident_pk, barangay_id=barangay_id,
+                position_id=positions[slot % len(positions)].pk, start_date=start_date,
+            ))
+    BarangayOfficial.objects.bulk_create(officials, batch_size=1000)
+    return len(officials)
+
+
+def create_coordinators(barangay_ids, coordinator_positions, per_barangay, seed, as_of=AS_OF):
+    """per_barangay coordinators for each barangay that has none yet. Returns the number created."""
+    if per_barangay <= 0 or not coordinator_positions:
+        return 0
+    rng = random.Random(f'{seed}:coordinators')
+    has_coordinators = set(Coordinator.objects.values_list('barangay_id', flat=True))
+    coordinators = []
+    for barangay_id in barangay_ids:
+        if barangay_id in has_coordinators:
+            continue
+        for slot in range(per_barangay):
+            is_male = rng.random() < 0.5
+            coordinators.append(Coordinator(
+                barangay_id=barangay_id,
+                fullname=f'{rng.choice(FIRST_NAMES_MALE if is_male else FIRST_NAMES_FEMALE)} {rng.choice(LAST_NAMES)}',
+                position_id=coordinator_positions[slot % len(coordinator_positions)].pk,
+                contact_no='09' + ''.join(rng.choice('0123456789') for _ in range(9)),
+                date_start=date(as_of.year - rng.randint(0, 3), rng.randint(1, 12), 1),
+            ))
+    Coordinator.objects.bulk_create(coordinators, batch_size=1000)
+    return len(coordinators)
+
+
+def create_activity(users, count, seed, description_prefix='', batch_size=5000, progress=None, as_of=AS_OF):
+    """
+    count User Activity rows over the year before as_of for users, mostly on weekdays in office
+    hours. Returns the number created.
+    """
+    from administrator.models import UserActivity
+
+    if count <= 0 or not users:
+        return 0
+    report = progress or (lambda message: None)
+    rng = random.Random(f'{seed}:activity')
+    actions = [UserActivity.ACTION_CREATE] * 5 + [UserActivity.ACTION_UPDATE] * 4 + [UserActivity.ACTION_DELETE]
+    subjects = ['resident', 'resident', 'resident', 'barangay official', 'coordinator', 'voter record']
+    written = 0
+    while written < count:
+        batch = []
+        for _ in range(min(batch_size, count - written)):
+            day = as_of - timedelta(days=rng.randint(0, 364))
+            if day.weekday() >= 5 and rng.random() < 0.8:
+                day -= timedelta(days=day.weekday() - 4)
+            moment = timezone.make_aware(datetime.combine(day, time(rng.randint(8, 16), rng.randint(0, 59), rng.randint(0, 59))))
+            action = rng.choice(actions)
+            batch.append(UserActivity(
+                user=rng.choice(users), action=action,
+                description=f'{description_prefix}{action.capitalize()}d {rng.choice(subjects)}'[:255],
+                ip_address='127.0.0.1', created_at=moment,
+            ))
+        UserActivity.objects.bulk_create(batch)
+        written += len(batch)
+        report(f'activity: {written}/{count}')
+    return written
@@ -0,0 +1,137 @@
+"""
+ReportLab layout for resident ID cards: the resident_print card (8.56 x 5.40 cm), up to 8 per
+letter page, with light cut lines. Cards are plain dicts built by operations.id_cards.
+
+This module imports no Django code, so render_chunk() can run in spawned worker processes without
+setting Django up; merge_pdfs() joins the chunks into one document.
+"""
+import io
+import math
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import cm
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas as pdf_canvas
+
+CARD_WIDTH = 8.56 * cm
+CARD_HEIGHT = 5.40 * cm
+GAP = 0.4 * cm
+COLUMNS = 2
+MAX_PER_PAGE = 8
+
+INK = (0.10, 0.11, 0.14)
+MUTED = (0.62, 0.62, 0.62)
+
+
+def _fit(text, font, size, width, min_size=4):
+    while size > min_size and stringWidth(text, font, size) > width:
+        size -= 0.25
+    return size
+
+
+def _card_origins(per_page):
+    """Bottom-left corner of each card slot on the page, filled left to right, top to bottom."""
+    columns = min(COLUMNS, per_page)
+    rows = math.ceil(per_page / columns)
+    page_width, page_height = letter
+    grid_width = columns * CARD_WIDTH + (columns - 1) * GAP
+    grid_height = rows * CARD_HEIGHT + (rows - 1) * GAP
+    left = (page_width - grid_width) / 2
+    top = (page_height + grid_height) / 2
+    return [
+        (left + col * (CARD_WIDTH + GAP), top - (row + 1) * CARD_HEIGHT - row * GAP)
+        for row in range(rows) for col in range(columns)
+    ][:per_page]
+
+
+def _draw_card(c, card, x, y):
+    def at(left_cm, top_cm):
+        """Card coordinates (cm from the top-left corner, like the print CSS) -> page points."""
+        return x + left_cm * cm, y + CARD_HEIGHT - top_cm * cm
+
+    c.setStrokeColorRGB(*MUTED)
+    c.setLineWidth(0.25)
+    c.setDash(2, 2)
+    c.rect(x, y, CARD_WIDTH, CARD_HEIGHT)
+    c.setDash()
+    c.setFillColorRGB(*INK)
+
+    font_size = _fit(card['id_barangay'], 'Helvetica-Bold', 0.32 * cm, CARD_WIDTH - 0.7 * cm)
+    c.setFont('Helvetica-Bold', font_size)
+    c.drawRightString(x + CARD_WIDTH - 0.35 * cm, at(0, 0.15)[1] - font_size, card['id_barangay'])
+
+    name_width = CARD_WIDTH - 2.10 * cm - 1.95 * cm
+    font_size = _fit(card['full_name'], 'Helvetica-Bold', 0.36 * cm, name_width)
+    c.setFont('Helvetica-Bold', font_size)
+    c.drawString(*at(2.10, 0.5 + 0.36), card['full_name'])
+
+    photo_x, photo_y = at(0.35, 1.0 + 1.55)
+    if card.get('photo_path'):
+        c.drawImage(card['photo_path'], photo_x, photo_y, 1.55 * cm, 1.55 * cm)
+    else:
+        c.setFillColorRGB(0.91, 0.92, 0.93)
+        c.rect(photo_x, photo_y, 1.55 * cm, 1.55 * cm, stroke=0, fill=1)
+        c.setFillColorRGB(*INK)
+
+    size = 0.26 * cm
+    field_width = CARD_WIDTH - 2.10 * cm - 1.95 * cm
+    line_x, line_y = at(2.10, 1.05 + 0.26)
+    c.setFont('Helvetica', size)
+    for label, value, wrap in (
+        ('Birthdate:', f"{card['birthdate']}  Age: {card['age']}  {card['gender']}", False),
+        ('Contact No:', card['contact'], False),
+        ('Address:', card['address'], True),
+        ('Remarks:', card['badges'], False),
+    ):
+        if label == 'Remarks:' and not value:
+            continue
+        c.setFont('Helvetica-Bold', size)
+        c.drawString(line_x, line_y, label)
+        value_x = line_x + stringWidth(label, 'Helvetica-Bold', size) + 0.12 * cm
+        lines = simpleSplit(value, 'Helvetica', size, line_x + field_width - value_x)[:2 if wrap else 1]
+        c.setFont('Helvetica', size)
+        for text in lines or ['']:
+            c.drawString(value_x, line_y, text)
+            line_y -= size * 1.2
+        line_y -= 0.10 * cm
+
+    qr_x, qr_y = at(CARD_WIDTH / cm - 0.35 - 1.45, 0.95 + 1.45)
+    if card.get('qr_path'):
+        c.drawImage(card['qr_path'], qr_x, qr_y, 1.45 * cm, 1.45 * cm)
+
+    font_size = _fit(card['precinct'], 'Helvetica-Bold', 0.32 * cm, 1.45 * cm)
+    c.setFont('Helvetica-Bold', font_size)
+    c.drawCentredString(qr_x + 0.725 * cm, at(0, 2.60)[1] - font_size, card['precinct'])
+
+    size = 0.20 * cm
+    c.setFont('Helvetica-Bold', size)
+    notes_y = at(0, 3.05)[1] - size
+    for text in simpleSplit(card['notes'], 'Helvetica-Bold', size, 1.45 * cm)[:6]:
+        c.drawString(qr_x, notes_y, text)
+        notes_y -= size * 1.2
+
+
+def render_chunk(job):
+    """job = (cards, per_page) -> PDF bytes with len(cards) / per_page pages."""
+    cards, per_page = job
+    buffer = io.BytesIO()
+    c = pdf_canvas.Canvas(buffer, pagesize=letter, pageCompression=1)
+    origins = _card_origins(per_page)
+    for i, card in enumerate(cards):
+        if i and i % per_page == 0:
+            c.showPage()
+        _draw_card(c, card, *origins[i % per_page])
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def merge_pdfs(chunks, out):
+    """Write the PDFs in chunks (bytes, in order) to the binary file out as one document."""
+    from pypdf import PdfReader, PdfWriter
+
+    writer = PdfWriter()
+    for data in chunks:
+        writer.append(PdfReader(io.BytesIO(data)))
+    writer.write(out)
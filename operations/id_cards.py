@@ -0,0 +1,235 @@
+"""
+Batch ID cards for a filtered set of residents: one PDF (operations:resident_print_batch) or a zip
+of filled Profiling-template.docx forms (operations:resident_docx_batch); the print_id_cards
+command writes either.
+
+Card assets are cached on disk under FILE_CACHE_ROOT: QR codes by their content (qr/) and profile
+pictures as small square JPEG thumbnails (thumbs/), fetched through main.image_cache. Assets are
+prepared on a thread pool (mostly network waits), then PDF pages (operations.id_card_pdf) or DOCX
+forms (operations.profiling_docx) are produced in chunks on worker processes.
+"""
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import zipfile
+from pathlib import Path
+
+from django.conf import settings
+
+from main.image_cache import cache_root, fetch_image
+
+from .id_card_pdf import MAX_PER_PAGE, merge_pdfs, render_chunk
+from .profiling_docx import load_template, render_batch, render_docx
+
+CHUNK_PAGES = 25
+CHUNK_FORMS = 100
+THUMBNAIL_PX = 240
+ASSET_THREADS = 8
+
+
+def id_card_fields(resident):
+    """Text shown on the card (shared with resident_print). Expects resident.barangay to be loaded."""
+    # Format: LASTNAME, FIRSTNAME SUFFIX MIDDLENAME
+    middlename = (resident.middlename or '').strip()
+    middle_initial = ''
+    if middlename:
+        first_char = (middlename.split()[0][:1] or '').strip()
+        if first_char:
+            middle_initial = f'{first_char}.'
+    parts = [resident.lastname or '']
+    name_parts = [resident.firstname or '', resident.suffix or '', middle_initial]
+    parts.append(' '.join(p for p in name_parts if p).strip())
+    full_name = ', '.join(p for p in parts if p).upper() or '-'
+    # Badges per Profiling-template.docx: PWD, SENIOR (VOTERS shown under QR)
+    badges = []
+    if resident.health_status == 'PWD':
+        badges.append('PWD')
+    if resident.economic_status == 'SENIOR CITIZEN':
+        badges.append('SENIOR')
+    barangay_name = resident.barangay.name if resident.barangay else ''
+    barangay_number = ''
+    if resident.barangay:
+        # Prefer barangay.code if set, otherwise use its primary key
+        barangay_number = resident.barangay.code or str(resident.barangay.id)
+    if barangay_name:
+        id_barangay = f"{barangay_number}. {barangay_name}" if barangay_number else barangay_name
+    else:
+        id_barangay = ''
+    return {
+        'full_name': full_name,
+        'birthdate': resident.date_of_birth.strftime('%b-%d-%Y') if resident.date_of_birth else '-',
+        'age': str(resident.get_age()) if resident.date_of_birth else '-',
+        'address_line': f"{resident.address or ''}{', ' + resident.purok if resident.purok else ''}".strip() or '-',
+        'badges': badges,
+        'barangay_name': barangay_name,
+        'id_barangay': id_barangay,
+    }
+
+
+def _notes(resident):
+    """The text under the precinct number: economic status, voter legend, Voters."""
+    notes = []
+    if resident.get_economic_status_display():
+        notes.append(resident.get_economic_status_display().replace(' Member', ''))
+    if resident.get_voter_legend_display():
+        notes.append(resident.get_voter_legend_display())
+    if resident.is_voter:
+        notes.append('Voters')
+    return ', '.join(notes) or '—'
+
+
+def _write_once(path, make_bytes):
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp.write_bytes(make_bytes())
+        tmp.replace(path)
+    return path
+
+
+def qr_image(content):
+    """Cached QR code PNG for content (the same image resident_qr generates)."""
+    import qrcode
+
+    def make():
+        qr = qrcode.QRCode(version=1, box_size=8, border=2)
+        qr.add_data(content)
+        qr.make(fit=True)
+        buffer = io.BytesIO()
+        qr.make_image(fill_color='#1a1d24', back_color='white').save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    return _write_once(cache_root() / 'qr' / f'{hashlib.sha256(content.encode()).hexdigest()}.png', make)
+
+
+def thumbnail(path):
+    """Cached square JPEG thumbnail of the image at path (cropped to fill, like the card's photo box)."""
+    from PIL import Image, ImageOps
+
+    stat = Path(path).stat()
+    key = hashlib.sha256(f'{path}:{stat.st_mtime_ns}:{stat.st_size}'.encode()).hexdigest()
+
+    def make():
+        with Image.open(path) as image:
+            square = ImageOps.fit(ImageOps.exif_transpose(image).convert('RGB'), (THUMBNAIL_PX, THUMBNAIL_PX))
+        buffer = io.BytesIO()
+        square.save(buffer, format='JPEG', quality=85)
+        return buffer.getvalue()
+
+    return _write_once(cache_root() / 'thumbs' / f'{key}.jpg', make)
+
+
+def _photo_path(resident):
+    if resident.profile_picture_url:
+        source = fetch_image(resident.profile_picture_url, not_before=resident.updated_at)
+    elif resident.profile_picture:
+        try:
+            source = resident.profile_picture.path
+        except Exception:
+            source = None
+    else:
+        source = None
+    if not source:
+        return None
+    try:
+        return str(thumbnail(source))
+    except (OSError, ValueError):
+        return None  # unreadable image: draw the placeholder
+
+
+def card_for(resident, base_url):
+    fields = id_card_fields(resident)
+    return {
+        'id_barangay': fields['id_barangay'],
+        'full_name': fields['full_name'],
+        'birthdate': fields['birthdate'],
+        'age': fields['age'],
+        'gender': resident.get_gender_display(),
+        'contact': resident.contact_no or '—',
+        'address': fields['address_line'],
+        'badges': ', '.join(fields['badges']),
+        'precinct': resident.precinct_number or 'Precinct',
+        'notes': _notes(resident),
+        'photo_path': _photo_path(resident),
+        'qr_path': str(qr_image(f'{base_url.rstrip("/")}/app/resident/{resident.pk}/')),
+    }
+
+
+def profiling_template_path():
+    return str(getattr(
+        settings, 'PROFILING_TEMPLATE', Path(settings.BASE_DIR) / 'static' / 'profiling format' / 'Profiling-template.docx',
+    ))
+
+
+def docx_filename(resident):
+    return f'profiling_{resident.resident_id or resident.pk}.docx'
+
+
+def _prepare_cards(residents, base_url):
+    with ThreadPoolExecutor(max_workers=ASSET_THREADS) as pool:
+        return list(pool.map(lambda r: card_for(r, base_url), residents))
+
+
+def _run(fn, jobs, workers):
+    """Yield fn(job) for each job, in order; on worker processes when there is more than one job."""
+    workers = min(workers, len(jobs))
+    if workers <= 1:
+        yield from map(fn, jobs)
+        return
+    # spawn: never fork a web worker that holds DB connections and threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        yield from pool.map(fn, jobs)
+
+
+def write_id_cards_pdf(residents, out, base_url, per_page=MAX_PER_PAGE, workers=1, progress=None):
+    """
+    Write ID cards for residents (select_related('barangay')) to the binary file out.
+    Returns the number of cards. workers > 1 draws page chunks in parallel processes.
+    """
+    report = progress or (lambda message: None)
+    if not 1 <= per_page <= MAX_PER_PAGE:
+        raise ValueError(f'per_page must be between 1 and {MAX_PER_PAGE}.')
+    cards = _prepare_cards(residents, base_url)
+    report(f'prepared {len(cards)} cards')
+
+    size = per_page * CHUNK_PAGES
+    jobs = [(cards[i:i + size], per_page) for i in range(0, len(cards), size)] or [([], per_page)]
+    chunks = list(_run(render_chunk, jobs, workers))
+    report(f'rendered {len(jobs)} chunk(s)')
+    if len(chunks) == 1:
+        out.write(chunks[0])
+    else:
+        merge_pdfs(chunks, out)
+    return len(cards)
+
+
+def profiling_docx(resident, base_url):
+    """The filled Profiling-template.docx for one resident, as bytes."""
+    card = card_for(resident, base_url)
+    return render_docx(load_template(profiling_template_path()), card, card['photo_path'], card['qr_path'])
+
+
+def write_profiling_docx_zip(residents, out, base_url, workers=1, progress=None):
+    """
+    Write a zip of filled Profiling-template.docx forms (one per resident) to the binary file out.
+    Returns the number of forms. workers > 1 fills CHUNK_FORMS-form chunks in parallel processes.
+    """
+    report = progress or (lambda message: None)
+    residents = list(residents)
+    cards = _prepare_cards(residents, base_url)
+    report(f'prepared {len(cards)} forms')
+
+    path = profiling_template_path()
+    load_template(path)  # fail before starting workers if the template is missing or changed
+    forms = [(docx_filename(resident), card) for resident, card in zip(residents, cards)]
+    jobs = [(path, forms[i:i + CHUNK_FORMS]) for i in range(0, len(forms), CHUNK_FORMS)]
+    # DOCX files are already deflated; storing them keeps the zip step cheap.
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_STORED) as archive:
+        for documents in _run(render_batch, jobs, workers):
+            for name, data in documents:
+                archive.writestr(name, data)
+    report(f'filled {len(jobs)} chunk(s)')
+    return len(forms)
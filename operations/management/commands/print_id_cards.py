@@ -0,0 +1,73 @@
+"""
+Write ID cards for every resident of a barangay to one PDF (the batch version of resident_print), or
+a zip of filled Profiling-template.docx forms with --format docx.
+Run: python manage.py print_id_cards --barangay 12 -o cards.pdf
+     python manage.py print_id_cards --barangay 12 --voters --per-page 4 --workers 4
+     python manage.py print_id_cards --barangay 12 --format docx
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from operations.id_card_pdf import MAX_PER_PAGE
+from operations.id_cards import write_id_cards_pdf, write_profiling_docx_zip
+from operations.models import Resident
+from reference.models import Barangay
+
+
+class Command(BaseCommand):
+    help = (
+        'Write ID cards for the residents of a barangay to a PDF (or a zip of DOCX forms), '
+        'produced on parallel worker processes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--barangay', type=int, required=True, help='Barangay id')
+        parser.add_argument('--voters', action='store_true', help='Only living registered voters')
+        parser.add_argument('--format', choices=['pdf', 'docx'], default='pdf', help='pdf (default) or docx (zip of forms)')
+        parser.add_argument('--per-page', type=int, default=MAX_PER_PAGE, help=f'Cards per page (1-{MAX_PER_PAGE}, default {MAX_PER_PAGE})')
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Worker processes that draw pages (default ID_CARD_WORKERS)',
+        )
+        parser.add_argument(
+            '--base-url', default=None,
+            help='Site URL encoded in the QR codes (default SITE_URL, else http://localhost:8000)',
+        )
+        parser.add_argument('-o', '--output', default=None, help='Output file (default id_cards_<barangay>.pdf / .zip)')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        if not 1 <= options['per_page'] <= MAX_PER_PAGE:
+            raise CommandError(f'--per-page must be between 1 and {MAX_PER_PAGE}.')
+        try:
+            barangay = Barangay.objects.get(pk=options['barangay'])
+        except Barangay.DoesNotExist:
+            raise CommandError(f"Barangay {options['barangay']} does not exist.")
+        residents = Resident.objects.filter(barangay=barangay).select_related('barangay').order_by('lastname', 'firstname')
+        if options['voters']:
+            residents = residents.filter(is_voter=True, status=Resident.STATUS_ALIVE)
+        base_url = options['base_url'] or getattr(settings, 'SITE_URL', '') or 'http://localhost:8000'
+        workers = options['workers'] if options['workers'] is not None else getattr(settings, 'ID_CARD_WORKERS', 1)
+        docx = options['format'] == 'docx'
+        output = options['output'] or f"id_cards_{barangay.pk}.{'zip' if docx else 'pdf'}"
+
+        start = time.monotonic()
+        with open(output, 'wb') as out:
+            if docx:
+                count = write_profiling_docx_zip(
+                    residents, out, base_url, workers=max(1, workers), progress=self._progress,
+                )
+            else:
+                count = write_id_cards_pdf(
+                    residents, out, base_url, per_page=options['per_page'], workers=max(1, workers),
+                    progress=self._progress,
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {count} ID cards for {barangay.name} to {output} in {time.monotonic() - start:.1f}s.'
+        ))
+
+    def _progress(self, message):
+        if self.verbosity >= 2:
+            self.stdout.write(f'  {message}')
@@ -0,0 +1,28 @@
+"""
+Delete resident tombstones older than SYNC_TOMBSTONE_DAYS. Scanner devices whose sync cursor is
+older than that are told to download their barangay again (app.sync), so nothing is lost.
+Run daily: python manage.py prune_sync_tombstones
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app.sync import tombstone_days
+from operations.models import ResidentTombstone
+
+
+class Command(BaseCommand):
+    help = 'Delete resident sync tombstones older than SYNC_TOMBSTONE_DAYS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Count the tombstones without deleting them')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=tombstone_days())
+        old = ResidentTombstone.objects.filter(deleted_at__lt=cutoff)
+        if options['dry_run']:
+            self.stdout.write(f'{old.count()} tombstone(s) older than {cutoff:%Y-%m-%d} would be deleted.')
+            return
+        deleted, _ = old.delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstone(s) older than {cutoff:%Y-%m-%d}.'))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0012_add_resident_date_of_death'),
+        ('reference', '0007_alter_barangay_municipality'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResidentTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resident_pk', models.IntegerField()),
+                ('barangay_pk', models.IntegerField(null=True)),
+                ('deleted_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['deleted_at', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='resident',
+            index=models.Index(fields=['barangay', 'updated_at', 'id'], name='resident_brgy_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='residenttombstone',
+            index=models.Index(fields=['barangay_pk', 'deleted_at'], name='tombstone_brgy_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='residenttombstone',
+            index=models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ),
+    ]
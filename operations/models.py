@@ -119,6 +119,10 @@ class Resident(models.Model):
         ordering = ['id']
         verbose_name = 'Resident'
         verbose_name_plural = 'Residents'
+        indexes = [
+            # Keyset order of the scanner delta sync (app.sync)
+            models.Index(fields=['barangay', 'updated_at', 'id'], name='resident_brgy_updated_idx'),
+        ]
     
     def __str__(self):
         return f"{self.firstname} {self.lastname}"
@@ -149,34 +153,57 @@ class Resident(models.Model):
             age -= 1
         return age
     
-    def save(self, *args, **kwargs):
-        """Override save to auto-generate resident ID.
+    @staticmethod
+    def format_resident_id(seq):
+        """Resident ID for sequence number seq.
 
         Format rules:
         - 1 to 99,999  -> zero-padded 5 digits, e.g. 00001, 00002, ..., 99999
         - 100,000+     -> letter prefix for each 100k block, then 4 digits:
           100,000..199,999 -> A0001, A0002, ...
           200,000..299,999 -> B0001, B0002, ...
+          (past 9,999 inside a block the number simply widens: A10000, so IDs stay unique)
         """
+        if seq <= 99999:
+            # Simple zero-padded numeric ID up to 99,999
+            return f"{seq:05d}"
+        # Use letter prefix per 100k block, then 4-digit sequence inside the block
+        # 100,000..199,999 -> 'A', 200,000..299,999 -> 'B', etc.
+        block_index = (seq - 100000) // 100000  # 0-based
+        letter = chr(ord('A') + block_index)
+        within_block = (seq - 100000) % 100000 + 1  # 1..100000
+        return f"{letter}{within_block:04d}"
+
+    def save(self, *args, **kwargs):
+        """Override save to auto-generate resident ID (see format_resident_id)."""
         if not self.resident_id:
             # Use last primary key as sequence source
             last_resident = Resident.objects.order_by('-id').first()
             next_seq = (last_resident.id if last_resident else 0) + 1
-
-            if next_seq <= 99999:
-                # Simple zero-padded numeric ID up to 99,999
-                self.resident_id = f"{next_seq:05d}"
-            else:
-                # Use letter prefix per 100k block, then 4-digit sequence inside the block
-                # 100,000..199,999 -> 'A', 200,000..299,999 -> 'B', etc.
-                block_index = (next_seq - 100000) // 100000  # 0-based
-                letter = chr(ord('A') + block_index)
-                within_block = (next_seq - 100000) % 100000 + 1  # 1..100000
-                within_block = min(within_block, 9999)  # keep 4 digits max
-                self.resident_id = f"{letter}{within_block:04d}"
+            self.resident_id = self.format_resident_id(next_seq)
         super().save(*args, **kwargs)
 
 
+class ResidentTombstone(models.Model):
+    """
+    A resident that left a barangay's sync set: deleted, or moved to another barangay.
+    Written by operations.signals; pruned after SYNC_TOMBSTONE_DAYS (prune_sync_tombstones).
+    """
+    resident_pk = models.IntegerField()
+    barangay_pk = models.IntegerField(null=True)
+    deleted_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['barangay_pk', 'deleted_at'], name='tombstone_brgy_deleted_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"Resident #{self.resident_pk} left barangay #{self.barangay_pk}"
+
+
 class BarangayOfficial(models.Model):
     """Model for barangay officials."""
     
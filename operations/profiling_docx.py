@@ -0,0 +1,134 @@
+"""
+Fill static/profiling format/Profiling-template.docx for residents.
+
+The template is read and compiled once per process (load_template, keyed on the file's mtime): the
+placeholder paragraphs of its text boxes ("LASTNAME, FIRSTNAME, MD", "Birthdate:____", "#. Brgy", ...)
+become slots and the rest of word/document.xml stays literal text, so filling a form is a string
+join plus writing the zip. Text-box paragraphs that are not placeholders are dropped (the precinct
+box of the official file carries pasted console output below its placeholder). The photo and QR
+are the template's placeholder images, replaced in place.
+
+Like id_card_pdf, this module imports no Django code so render_batch() can run in spawned workers.
+"""
+import functools
+import io
+import os
+import re
+import zipfile
+from collections import namedtuple
+from xml.sax.saxutils import escape
+
+DOCUMENT = 'word/document.xml'
+# The placeholder pictures (DrawingML image and its VML fallback) of the photo and QR rectangles.
+PHOTO_PARTS = ('word/media/image1.png', 'word/media/image2.png')
+QR_PARTS = ('word/media/image3.png', 'word/media/image4.png')
+PHOTO_PX = (240, 256)  # the photo rectangle's aspect ratio
+
+# Placeholder paragraph text (whitespace and underscores removed) -> filled text.
+PLACEHOLDERS = {
+    'LASTNAME,FIRSTNAME,MD': '{full_name}',
+    'Birthdate:': 'Birthdate: {birthdate}',
+    'Age:Gender:': 'Age: {age} Gender: {gender}',
+    'ContactNo:': 'Contact No: {contact}',
+    'Address:': 'Address: {address}',
+    '#.Brgy': '{id_barangay}',
+    'Economicstatus,legend,andvoters': '{notes}',
+    'Precintnumber': '{precinct}',
+}
+
+_TEXTBOX = re.compile(r'(<w:txbxContent(?: [^>]*)?>)(.*?)(</w:txbxContent>)', re.S)
+_PARAGRAPH = re.compile(r'<w:p[ >].*?</w:p>', re.S)
+_TEXT = re.compile(r'<w:t(?: [^>]*)?>([^<]*)</w:t>')
+_PARAGRAPH_PROPS = re.compile(r'<w:pPr>.*?</w:pPr>', re.S)
+_RUN_PROPS = re.compile(r'<w:r[ >].*?(<w:rPr>.*?</w:rPr>)', re.S)
+
+Template = namedtuple('Template', 'members document')
+
+
+def _compile(xml):
+    """document.xml -> list of literal strings and (pPr, rPr, format) paragraph slots."""
+    parts, found, pos = [], set(), 0
+    for box in _TEXTBOX.finditer(xml):
+        parts.append(xml[pos:box.end(1)])
+        for paragraph in _PARAGRAPH.findall(box.group(2)):
+            key = re.sub(r'[\s_]', '', ''.join(_TEXT.findall(paragraph)))
+            if key not in PLACEHOLDERS:
+                continue
+            found.add(key)
+            paragraph_props = _PARAGRAPH_PROPS.search(paragraph)
+            run_props = _RUN_PROPS.search(paragraph)
+            parts.append((
+                paragraph_props.group(0) if paragraph_props else '',
+                run_props.group(1) if run_props else '',
+                PLACEHOLDERS[key],
+            ))
+        parts.append(box.group(3))
+        pos = box.end()
+    parts.append(xml[pos:])
+    missing = set(PLACEHOLDERS) - found
+    if missing:
+        raise ValueError(f'Profiling template has no placeholder for: {", ".join(sorted(missing))}')
+    return parts
+
+
+@functools.lru_cache(maxsize=4)
+def _load(path, mtime_ns):
+    with zipfile.ZipFile(path) as archive:
+        members = [(info, archive.read(info)) for info in archive.infolist()]
+    document = dict((info.filename, data) for info, data in members)[DOCUMENT].decode('utf-8')
+    return Template(members, _compile(document))
+
+
+def load_template(path):
+    """The compiled template at path; re-read only when the file changes."""
+    return _load(str(path), os.stat(path).st_mtime_ns)
+
+
+def _render_document(template, fields):
+    out = []
+    for part in template.document:
+        if isinstance(part, str):
+            out.append(part)
+        else:
+            paragraph_props, run_props, text = part
+            out.append(
+                f'<w:p>{paragraph_props}<w:r>{run_props}'
+                f'<w:t xml:space="preserve">{escape(text.format_map(fields))}</w:t></w:r></w:p>'
+            )
+    return ''.join(out).encode('utf-8')
+
+
+def _png(path, size=None):
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as image:
+        image = image.convert('RGB')
+        if size:
+            image = ImageOps.fit(image, size)
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def render_docx(template, fields, photo_path=None, qr_path=None):
+    """One filled form as DOCX bytes. fields holds the id_cards card keys; images stay placeholders if None."""
+    photo = _png(photo_path, PHOTO_PX) if photo_path else None
+    qr = _png(qr_path) if qr_path else None
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for info, data in template.members:
+            if info.filename == DOCUMENT:
+                data = _render_document(template, fields)
+            elif info.filename in PHOTO_PARTS and photo:
+                data = photo
+            elif info.filename in QR_PARTS and qr:
+                data = qr
+            archive.writestr(info, data)
+    return buffer.getvalue()
+
+
+def render_batch(job):
+    """job = (template path, [(name, card)]) -> [(name, DOCX bytes)]."""
+    path, forms = job
+    template = load_template(path)
+    return [(name, render_docx(template, card, card.get('photo_path'), card.get('qr_path'))) for name, card in forms]
@@ -40,7 +40,7 @@ def main():
     count = 0
     for idx, resident in enumerate(Resident.objects.order_by("id"), start=1):
         resident.resident_id = format_resident_id(idx)
-        resident.save(update_fields=["resident_id"])
+        resident.save(update_fields=["resident_id", "updated_at"])
         count += 1
 
     print(f"Updated resident_ids for {count} residents.")
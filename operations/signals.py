@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Resident, ResidentTombstone
+
+
+@receiver(pre_save, sender=Resident)
+def tombstone_moved_resident(sender, instance, update_fields=None, raw=False, **kwargs):
+    """A resident moved to another barangay disappears from the old barangay's sync set."""
+    if raw or instance.pk is None or (update_fields is not None and 'barangay' not in update_fields):
+        return
+    old_barangay_pk = Resident.objects.filter(pk=instance.pk).values_list('barangay_id', flat=True).first()
+    if old_barangay_pk is not None and old_barangay_pk != instance.barangay_id:
+        ResidentTombstone.objects.create(
+            resident_pk=instance.pk, barangay_pk=old_barangay_pk, deleted_at=timezone.now(),
+        )
+
+
+@receiver(post_delete, sender=Resident)
+def tombstone_deleted_resident(sender, instance, **kwargs):
+    ResidentTombstone.objects.create(
+        resident_pk=instance.pk, barangay_pk=instance.barangay_id, deleted_at=timezone.now(),
+    )
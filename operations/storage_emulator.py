@@ -0,0 +1,103 @@
+"""
+Local filesystem stand-in for the Supabase Storage client.
+
+supabase_storage uses it instead of a real client when SUPABASE_STORAGE_EMULATOR is on (the
+default in OFFLINE_MODE). It implements the part of the supabase-py API we call:
+client.storage.from_(bucket).upload / download / remove / list / get_public_url.
+Files are written to SUPABASE_STORAGE_EMULATOR_ROOT/<bucket>/<path> and served from MEDIA_URL,
+so uploads work, and can be measured, without network access.
+"""
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+
+class StorageEmulatorError(Exception):
+    pass
+
+
+def _root():
+    return Path(getattr(settings, 'SUPABASE_STORAGE_EMULATOR_ROOT', Path(settings.MEDIA_ROOT) / 'storage-emulator'))
+
+
+class EmulatedBucket:
+    def __init__(self, bucket):
+        if not bucket or '/' in bucket or bucket in ('.', '..'):
+            raise StorageEmulatorError(f'Invalid bucket name: {bucket!r}')
+        self.bucket = bucket
+        self.directory = _root() / bucket
+
+    def _file(self, path):
+        target = (self.directory / path).resolve()
+        if self.directory.resolve() not in target.parents:
+            raise StorageEmulatorError(f'Path escapes the bucket: {path!r}')
+        return target
+
+    def upload(self, path, file, file_options=None):
+        options = file_options or {}
+        upsert = str(options.get('upsert', 'false')).lower() == 'true'
+        target = self._file(path)
+        if target.exists() and not upsert:
+            raise StorageEmulatorError(f'The resource already exists: {self.bucket}/{path}')
+        if hasattr(file, 'read'):
+            file = file.read()
+        elif isinstance(file, (str, os.PathLike)):
+            file = Path(file).read_bytes()
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # One temp file per writer, so concurrent uploads to the same path don't clobber each other.
+        tmp = target.with_name(f'{target.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp.write_bytes(file)
+        try:
+            if upsert:
+                os.replace(tmp, target)  # readers never see a half-written file
+            else:
+                os.link(tmp, target)  # fails if another upload created it since the check above
+        except FileExistsError:
+            raise StorageEmulatorError(f'The resource already exists: {self.bucket}/{path}') from None
+        finally:
+            tmp.unlink(missing_ok=True)
+        return {'path': path, 'Key': f'{self.bucket}/{path}'}
+
+    def download(self, path):
+        target = self._file(path)
+        if not target.exists():
+            raise StorageEmulatorError(f'Object not found: {self.bucket}/{path}')
+        return target.read_bytes()
+
+    def remove(self, paths):
+        removed = []
+        for path in paths:
+            target = self._file(path)
+            if target.exists():
+                target.unlink()
+                removed.append({'name': path})
+        return removed
+
+    def list(self, path=''):
+        directory = self._file(path) if path else self.directory
+        if not directory.is_dir():
+            return []
+        return [{'name': entry.name} for entry in sorted(directory.iterdir()) if not entry.name.endswith('.tmp')]
+
+    def get_public_url(self, path):
+        target = self._file(path)
+        try:
+            relative = target.relative_to(Path(settings.MEDIA_ROOT).resolve()).as_posix()
+        except ValueError:
+            return target.as_uri()  # emulator root outside MEDIA_ROOT: not served over HTTP
+        base = (getattr(settings, 'SITE_URL', '') or '').rstrip('/')
+        return f'{base}{settings.MEDIA_URL}{relative}'
+
+
+class _EmulatedStorage:
+    def from_(self, bucket):
+        return EmulatedBucket(bucket)
+
+
+class EmulatedClient:
+    """Drop-in for supabase.create_client(...) as far as Storage is concerned."""
+
+    def __init__(self):
+        self.storage = _EmulatedStorage()
@@ -1,12 +1,35 @@
-"""Upload resident profile pictures and QR images to Supabase Storage."""
+"""Upload resident profile pictures and QR images to Supabase Storage (or its local emulator offline)."""
 import logging
+import time
 from django.conf import settings
 
+from main.instrumentation import metrics
+
 logger = logging.getLogger(__name__)
 
 
+def _upload(client, bucket, path, body, content_type, kind):
+    """Upload to a bucket and return its public URL; records latency and failures for /metrics."""
+    start = time.perf_counter()
+    try:
+        client.storage.from_(bucket).upload(
+            path=path,
+            file=body,
+            file_options={'content-type': content_type, 'upsert': 'true'}
+        )
+    except Exception:
+        metrics.inc('supabase_upload_failures', {'kind': kind})
+        raise
+    finally:
+        metrics.observe('supabase_upload', (time.perf_counter() - start) * 1000, {'kind': kind})
+    return client.storage.from_(bucket).get_public_url(path)
+
+
 def _get_client():
-    """Return Supabase client or None if not configured."""
+    """Return Supabase client (or the local emulator, see storage_emulator) or None if not configured."""
+    if getattr(settings, 'SUPABASE_STORAGE_EMULATOR', False):
+        from .storage_emulator import EmulatedClient
+        return EmulatedClient()
     if not getattr(settings, 'SUPABASE_URL', None) or not getattr(settings, 'SUPABASE_SERVICE_ROLE_KEY', None):
         return None
     try:
@@ -35,13 +58,7 @@ def upload_profile_picture(file, resident_id: int) -> str:
     try:
         file.seek(0)
         body = file.read()
-        client.storage.from_(bucket).upload(
-            path=path,
-            file=body,
-            file_options={'content-type': content_type, 'upsert': 'true'}
-        )
-        url = client.storage.from_(bucket).get_public_url(path)
-        return url
+        return _upload(client, bucket, path, body, content_type, 'profile')
     except Exception as e:
         logger.exception('Supabase profile upload failed for resident %s: %s', resident_id, e)
         return ''
@@ -58,13 +75,7 @@ def upload_qr_image(png_bytes: bytes, resident_id: int) -> str:
     bucket = getattr(settings, 'SUPABASE_STORAGE_BUCKET_QR', 'qr')
     path = f'{resident_id}.png'
     try:
-        client.storage.from_(bucket).upload(
-            path=path,
-            file=png_bytes,
-            file_options={'content-type': 'image/png', 'upsert': 'true'}
-        )
-        url = client.storage.from_(bucket).get_public_url(path)
-        return url
+        return _upload(client, bucket, path, png_bytes, 'image/png', 'qr')
     except Exception as e:
         logger.exception('Supabase QR upload failed for resident %s: %s', resident_id, e)
         return ''
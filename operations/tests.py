@@ -1,3 +1,236 @@
-from django.test import TestCase
+"""
+Batch ID-card PDFs, Profiling-template.docx forms, conditional GET on resident JSON views, the
+local Supabase Storage emulator and reproducible fake data.
+"""
+import io
+import pickle
+import tempfile
+import threading
+import zipfile
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from administrator.models import UserActivity
+from reference.models import Barangay, Municipality
+
+from . import fake_data
+from .models import Resident
+from .storage_emulator import EmulatedClient, StorageEmulatorError
+
+
+class IdCardBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        municipality = Municipality.objects.create(name='Municipality')
+        cls.barangay = Barangay.objects.create(name='Barangay', municipality=municipality)
+        for i in range(10):
+            Resident.objects.create(
+                barangay=cls.barangay, lastname=f'Cruz {i}', firstname='Juan', gender=Resident.GENDER_MALE,
+                date_of_birth=date(1980, 1, 1), status=Resident.STATUS_ALIVE, is_voter=i < 3,
+            )
+
+    def setUp(self):
+        self.root = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(FILE_CACHE_ROOT=str(self.root)))
+
+    def _pages(self, data):
+        from pypdf import PdfReader
+        return len(PdfReader(io.BytesIO(data)).pages)
+
+    def test_batch_pdf_has_one_page_per_per_page_cards(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        url = reverse('operations:resident_print_batch')
+        response = self.client.get(url, {'barangay': self.barangay.pk, 'per_page': 4})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._pages(b''.join(response.streaming_content)), 3)
+        voters = self.client.get(url, {'barangay': self.barangay.pk, 'voters': 1})
+        self.assertEqual(self._pages(b''.join(voters.streaming_content)), 1)
+        self.assertEqual(len(list((self.root / 'qr').glob('*.png'))), 10)  # reused by the second batch
+
+    def test_bad_or_unknown_barangay_is_404(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        for name in ('resident_print_batch', 'resident_docx_batch'):
+            for barangay in ('abc', '', '999999'):
+                with self.subTest(view=name, barangay=barangay):
+                    response = self.client.get(reverse(f'operations:{name}'), {'barangay': barangay})
+                    self.assertEqual(response.status_code, 404)
+
+    def test_chunks_drawn_in_worker_processes_are_merged_in_order(self):
+        from operations import id_cards
+        residents = Resident.objects.filter(barangay=self.barangay).select_related('barangay').order_by('lastname')
+        out = io.BytesIO()
+        with mock.patch.object(id_cards, 'CHUNK_PAGES', 1):
+            count = id_cards.write_id_cards_pdf(residents, out, 'http://testserver', per_page=2, workers=2)
+        self.assertEqual(count, 10)
+        self.assertEqual(self._pages(out.getvalue()), 5)
+
+    def test_docx_forms_fill_the_profiling_template(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        response = self.client.get(reverse('operations:resident_docx_batch'), {'barangay': self.barangay.pk, 'voters': 1})
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as archive:
+            self.assertEqual(len(archive.namelist()), 3)
+            with zipfile.ZipFile(io.BytesIO(archive.read(archive.namelist()[0]))) as form:
+                document = form.read('word/document.xml').decode()
+                qr = form.read('word/media/image3.png')
+        self.assertIn('CRUZ 0, JUAN', document)
+        self.assertIn('Birthdate: Jan-01-1980', document)
+        self.assertNotIn('LASTNAME, FIRSTNAME', document)
+        self.assertNotIn('Traceback', document)  # stray text in the template's text boxes is dropped
+        with zipfile.ZipFile(settings.PROFILING_TEMPLATE) as template:
+            self.assertNotEqual(qr, template.read('word/media/image3.png'))  # placeholder replaced by the QR
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.municipality = Municipality.objects.create(name='Municipality')
+        cls.barangay = Barangay.objects.create(name='Barangay', municipality=cls.municipality)
+        cls.resident = Resident.objects.create(
+            barangay=cls.barangay, lastname='Cruz', firstname='Juan', gender=Resident.GENDER_MALE,
+            date_of_birth=date(1980, 1, 1), status=Resident.STATUS_ALIVE,
+        )
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def _urls(self):
+        return [
+            reverse('operations:resident_get', kwargs={'pk': self.resident.pk}),
+            reverse('app:resident_api', kwargs={'pk': self.resident.pk}),
+            reverse('operations:get_municipalities'),
+            reverse('operations:get_barangays_by_municipality') + f'?municipality_id={self.municipality.pk}',
+            reverse('reference:barangay_get', kwargs={'pk': self.barangay.pk}),
+        ]
+
+    def test_matching_etag_is_answered_before_the_payload_is_built(self):
+        for url in self._urls():
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as full:
+                    first = self.client.get(url)
+                self.assertEqual(first.status_code, 200)
+                self.assertIn('no-cache', first['Cache-Control'])
+                with CaptureQueriesContext(connection) as revalidation:
+                    again = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+                self.assertEqual(again.status_code, 304)
+                self.assertEqual(again.content, b'')
+                self.assertLess(len(revalidation), len(full))
+
+    def test_edits_and_deletes_change_the_etag(self):
+        etags = [self.client.get(url)['ETag'] for url in self._urls()]
+        self.barangay.name = 'Renamed'
+        self.barangay.save()
+        self.resident.save()
+        Municipality.objects.create(name='Second')
+        for url, etag in zip(self._urls(), etags):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        Barangay.objects.create(name='Other', municipality=self.municipality)
+        url = self._urls()[3]
+        etag = self.client.get(url)['ETag']
+        Barangay.objects.filter(name='Other').delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class StorageEmulatorTests(TestCase):
+    def setUp(self):
+        media = Path(self.enterContext(tempfile.TemporaryDirectory())).resolve()
+        self.enterContext(override_settings(
+            MEDIA_ROOT=media, MEDIA_URL='/media/', SITE_URL='https://pgso.example',
+            SUPABASE_STORAGE_EMULATOR_ROOT=media / 'storage-emulator',
+        ))
+        self.bucket = EmulatedClient().storage.from_('photos')
+
+    def test_upload_download_list_remove(self):
+        uploaded = self.bucket.upload('residents/1.jpg', b'first')
+        self.assertEqual(uploaded, {'path': 'residents/1.jpg', 'Key': 'photos/residents/1.jpg'})
+        with self.assertRaises(StorageEmulatorError):
+            self.bucket.upload('residents/1.jpg', b'second')
+        self.assertEqual(self.bucket.download('residents/1.jpg'), b'first')
+        self.bucket.upload('residents/1.jpg', io.BytesIO(b'second'), {'upsert': 'true'})
+        self.assertEqual(self.bucket.download('residents/1.jpg'), b'second')
+        self.bucket.upload('residents/2.jpg', b'other')
+        self.assertEqual(self.bucket.list('residents'), [{'name': '1.jpg'}, {'name': '2.jpg'}])
+        removed = self.bucket.remove(['residents/1.jpg', 'residents/missing.jpg'])
+        self.assertEqual(removed, [{'name': 'residents/1.jpg'}])
+        self.assertEqual(self.bucket.list('residents'), [{'name': '2.jpg'}])
+        self.assertEqual(self.bucket.list('nowhere'), [])
+        with self.assertRaises(StorageEmulatorError):
+            self.bucket.download('residents/1.jpg')
+        with self.assertRaises(StorageEmulatorError):
+            self.bucket.upload('../escape.jpg', b'x')
+
+    def test_concurrent_uploads_to_one_path_leave_one_whole_file(self):
+        payloads = [bytes([i]) * 100_000 for i in range(8)]
+        threads = [
+            threading.Thread(target=self.bucket.upload, args=('same.jpg', data, {'upsert': 'true'}))
+            for data in payloads
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertIn(self.bucket.download('same.jpg'), payloads)
+        self.assertEqual(sorted(p.name for p in self.bucket.directory.iterdir()), ['same.jpg'])  # no stray temp files
+
+    def test_public_url_is_served_from_media_url(self):
+        self.assertEqual(
+            self.bucket.get_public_url('residents/1.jpg'),
+            'https://pgso.example/media/storage-emulator/photos/residents/1.jpg',
+        )
+        outside = Path(self.enterContext(tempfile.TemporaryDirectory())).resolve()
+        with override_settings(SUPABASE_STORAGE_EMULATOR_ROOT=outside):
+            url = EmulatedClient().storage.from_('photos').get_public_url('1.jpg')
+        self.assertEqual(url, (outside / 'photos' / '1.jpg').as_uri())
+
+
+class FakeDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        municipality = Municipality.objects.create(name='Municipality')
+        cls.barangay_ids = [Barangay.objects.create(name=f'B{i}', municipality=municipality).pk for i in range(3)]
+
+    def _plan(self):
+        return fake_data.ResidentPlan(45, 7, self.barangay_ids, first_seq=1, batch_size=10)
+
+    @staticmethod
+    def _generated(row):
+        return {key: value for key, value in row.items() if key not in ('created_at', 'updated_at')}
+
+    def test_a_seed_gives_the_same_rows_serially_in_chunks_and_on_another_day(self):
+        fake_data.create_residents(self._plan())
+        fields = [c for c in fake_data.RESIDENT_COLUMNS if c not in ('created_at', 'updated_at')]
+        inserted = list(Resident.objects.order_by('resident_id').values(*fields))
+        later = timezone.now() + timedelta(days=400)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            plan = pickle.loads(pickle.dumps(self._plan()))  # as shipped to a worker process
+            chunked = {k: plan.rows(k) for k in reversed(range(plan.chunks))}
+        rows = [self._generated(row) for k in sorted(chunked) for row in chunked[k]]
+        self.assertEqual(len(inserted), 45)
+        self.assertEqual(inserted, rows)
+
+    def test_activity_dates_count_back_from_as_of(self):
+        users = [User.objects.create_user(f'user{i}') for i in range(2)]
+
+        def generate():
+            fake_data.create_activity(users, 30, 7, description_prefix='[t] ')
+            rows = UserActivity.objects.filter(description__startswith='[t] ').order_by('pk')
+            generated = list(rows.values_list('user_id', 'action', 'description', 'created_at'))
+            rows.delete()
+            return generated
+
+        first = generate()
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(days=400)):
+            self.assertEqual(generate(), first)
+        self.assertTrue(all(fake_data.AS_OF - timedelta(days=365) <= moment.date() <= fake_data.AS_OF
+                            for *_, moment in first))
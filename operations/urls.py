@@ -23,6 +23,9 @@ urlpatterns = [
     path("resident/get/<int:pk>/", views.resident_get, name="resident_get"),
     path("resident/qr/<int:pk>/", views.resident_qr, name="resident_qr"),
     path("resident/print/<int:pk>/", views.resident_print, name="resident_print"),
+    path("resident/print/batch/", views.resident_print_batch, name="resident_print_batch"),
+    path("resident/docx/<int:pk>/", views.resident_docx, name="resident_docx"),
+    path("resident/docx/batch/", views.resident_docx_batch, name="resident_docx_batch"),
     path("resident/edit/<int:pk>/", views.resident_edit, name="resident_edit"),
     path("resident/delete/<int:pk>/", views.resident_delete, name="resident_delete"),
     path("voters-registration/", views.voters_registration, name="voters_registration"),
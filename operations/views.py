@@ -1,6 +1,6 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, Http404, JsonResponse, HttpResponse
 from django.db import transaction
 from django.db.models import Q, Count, Prefetch
 from django.urls import reverse
@@ -17,16 +17,31 @@ from administrator.utils import (
     user_can_delete_operations_residents_record,
 )
 from administrator.activity_log import log_activity, ACTION_CREATE, ACTION_UPDATE, ACTION_DELETE
+from main.conditional import list_etag, revalidated, row_etag
+from main.public_routes import public_route
+from main.transactions import atomic_view
+from reports.sidebar import cached_fragment
+from .id_cards import (
+    docx_filename,
+    id_card_fields,
+    profiling_docx,
+    write_id_cards_pdf,
+    write_profiling_docx_zip,
+)
 from .models import Resident, BarangayOfficial, CoordinatorPosition, Coordinator
 from .supabase_storage import upload_profile_picture, upload_qr_image
 from django.conf import settings
+import functools
 import logging
 import socket
+import tempfile
 from django.utils import timezone
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+DOCX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
 
 def _get_base_url_for_devices(request):
     """Return base URL reachable from other devices. Always includes http:// and :8000 for dev server."""
@@ -169,7 +184,7 @@ def coordinator_edit(request, pk):
         messages.error(request, 'You do not have permission to edit coordinators.')
         return redirect('operations:coordinator')
     if request.method == 'GET':
-        return redirect('operations:coordinator' + '?edit=' + str(pk))
+        return redirect(reverse('operations:coordinator') + '?edit=' + str(pk))
     barangays = Barangay.objects.filter(is_active=True).order_by('name')
     coordinator_positions = CoordinatorPosition.objects.filter(is_active=True).order_by('code')
     if request.method == 'POST':
@@ -188,12 +203,12 @@ def coordinator_edit(request, pk):
                 request,
                 'The fullname must be a resident of the selected barangay. Please select a name from the list or enter a valid resident name.',
             )
-            return redirect('operations:coordinator' + '?edit=' + str(pk))
+            return redirect(reverse('operations:coordinator') + '?edit=' + str(pk))
         position = get_object_or_404(CoordinatorPosition, id=position_id)
         contact_no = request.POST.get('contact_no', '').strip()
         if not contact_no:
             messages.error(request, 'Contact number is required.')
-            return redirect('operations:coordinator' + '?edit=' + str(pk))
+            return redirect(reverse('operations:coordinator') + '?edit=' + str(pk))
         date_start_val = request.POST.get('date_start', '').strip()
         from datetime import datetime
         date_start = None
@@ -265,35 +280,47 @@ def get_residents_by_barangay(request):
         return JsonResponse({'residents': []}, safe=False)
 
 
-def get_municipalities(request):
-    """API endpoint to get municipalities with optional search."""
+def _municipalities_queryset(request):
     search = request.GET.get('search', '').strip()
-    municipalities_qs = Municipality.objects.filter(is_active=True).order_by('name')
+    municipalities_qs = Municipality.objects.filter(is_active=True)
     if search:
         municipalities_qs = municipalities_qs.filter(name__icontains=search)
-    municipalities_qs = municipalities_qs[:100]
+    return municipalities_qs
+
+
+@revalidated(lambda request: list_etag(_municipalities_queryset(request)))
+def get_municipalities(request):
+    """API endpoint to get municipalities with optional search."""
+    municipalities_qs = _municipalities_queryset(request).order_by('name')[:100]
     data = [{'id': m.id, 'name': m.name} for m in municipalities_qs]
     return JsonResponse({'municipalities': data}, safe=False)
 
 
-def get_barangays_by_municipality(request):
-    """API endpoint to get barangays by municipality with optional search."""
+def _barangays_queryset(request):
+    """Active barangays of ?municipality_id= matching ?search=, or None without a valid municipality."""
     municipality_id = request.GET.get('municipality_id')
     search = request.GET.get('search', '').strip()
-    
-    if not municipality_id:
-        return JsonResponse({'barangays': []}, safe=False)
-    
-    try:
-        municipality = Municipality.objects.get(id=municipality_id)
-        barangays = Barangay.objects.filter(municipality=municipality, is_active=True)
-        if search:
-            barangays = barangays.filter(name__icontains=search)
-        barangays = barangays.order_by('name')[:100]
-        data = [{'id': b.id, 'name': b.name} for b in barangays]
-        return JsonResponse({'barangays': data}, safe=False)
-    except Exception:
+    if not municipality_id or not municipality_id.isdigit():
+        return None
+    barangays = Barangay.objects.filter(municipality_id=municipality_id, is_active=True)
+    if search:
+        barangays = barangays.filter(name__icontains=search)
+    return barangays
+
+
+def _barangays_etag(request):
+    barangays = _barangays_queryset(request)
+    return None if barangays is None else list_etag(barangays)
+
+
+@revalidated(_barangays_etag)
+def get_barangays_by_municipality(request):
+    """API endpoint to get barangays by municipality with optional search."""
+    barangays = _barangays_queryset(request)
+    if barangays is None:
         return JsonResponse({'barangays': []}, safe=False)
+    data = [{'id': b.id, 'name': b.name} for b in barangays.order_by('name')[:100]]
+    return JsonResponse({'barangays': data}, safe=False)
 
 
 def coordinator_delete(request, pk):
@@ -399,21 +426,15 @@ def residents_record(request):
     """Display list of residents."""
     residents = Resident.objects.select_related('barangay', 'barangay__municipality').all()
     barangays = Barangay.objects.filter(is_active=True).select_related('municipality').order_by('name')
-    barangays_with_resident_count = Barangay.objects.filter(
-        is_active=True
-    ).annotate(
-        resident_count=Count('residents', distinct=True),
-    ).order_by('name')
-    municipalities = Municipality.objects.filter(
-        is_active=True
-    ).prefetch_related(
-        Prefetch('barangays', queryset=barangays_with_resident_count)
-    ).order_by('name')
     base_url = _get_base_url_for_devices(request)
     context = {
         'residents': residents,
         'barangays': barangays,
-        'municipalities': municipalities,
+        'sidebar_tree': cached_fragment(
+            'residents_record',
+            'operations/includes/residents_barangay_tree.html',
+            lambda: {'municipalities': _municipalities_with_counts(resident_count=Count('residents', distinct=True))},
+        ),
         'network_url': base_url,
     }
     return render(request, "operations/residents_record.html", context)
@@ -465,11 +486,11 @@ def resident_add(request):
                 url = upload_profile_picture(profile_file, resident.id)
                 if url:
                     resident.profile_picture_url = url
-                    resident.save(update_fields=['profile_picture_url'])
+                    resident.save(update_fields=['profile_picture_url', 'updated_at'])
                 else:
                     profile_file.seek(0)
                     resident.profile_picture = profile_file
-                    resident.save(update_fields=['profile_picture'])
+                    resident.save(update_fields=['profile_picture', 'updated_at'])
             
             # Log successful save to Supabase
             logger.info(f'Resident {resident.get_full_name()} (ID: {resident.resident_id}) added to Supabase database successfully')
@@ -485,6 +506,8 @@ def resident_add(request):
     return redirect('operations:residents_record')
 
 
+@public_route
+@atomic_view
 def resident_qr(request, pk):
     """Serve or generate QR code image; store in Supabase when possible."""
     import qrcode
@@ -513,51 +536,83 @@ def resident_print(request, pk):
     """Render print template for resident (record layout: name, details, address, QR, profile)."""
     resident = get_object_or_404(Resident, pk=pk)
     profile_picture_url = _resident_profile_picture_url(resident, request)
-    # Format: LASTNAME, FIRSTNAME SUFFIX MIDDLENAME
-    middlename = (resident.middlename or '').strip()
-    middle_initial = ''
-    if middlename:
-        first_char = (middlename.split()[0][:1] or '').strip()
-        if first_char:
-            middle_initial = f'{first_char}.'
-    parts = [resident.lastname or '']
-    name_parts = [resident.firstname or '', resident.suffix or '', middle_initial]
-    parts.append(' '.join(p for p in name_parts if p).strip())
-    full_name = ', '.join(p for p in parts if p).upper() or '-'
-    birthdate = resident.date_of_birth.strftime('%b-%d-%Y') if resident.date_of_birth else '-'
-    age = str(resident.get_age()) if resident.date_of_birth else '-'
-    address_line = f"{resident.address or ''}{', ' + resident.purok if resident.purok else ''}".strip() or '-'
     # Prefer stored QR URL in Supabase; fallback to on-the-fly QR view
     qr_code_url = resident.qr_code_url or request.build_absolute_uri(reverse('operations:resident_qr', args=[pk]))
-    # Badges per Profiling-template.docx: PWD, SENIOR (VOTERS shown under QR)
-    badges = []
-    if resident.health_status == 'PWD':
-        badges.append('PWD')
-    if resident.economic_status == 'SENIOR CITIZEN':
-        badges.append('SENIOR')
-    barangay_name = resident.barangay.name if resident.barangay else ''
-    barangay_number = ''
-    if resident.barangay:
-        # Prefer barangay.code if set, otherwise use its primary key
-        barangay_number = resident.barangay.code or str(resident.barangay.id)
-    if barangay_name:
-        id_barangay = f"{barangay_number}. {barangay_name}" if barangay_number else barangay_name
-    else:
-        id_barangay = ''
     return render(request, 'operations/resident_print.html', {
         'resident': resident,
         'profile_picture_url': profile_picture_url,
-        'full_name': full_name,
-        'birthdate': birthdate,
-        'age': age,
-        'address_line': address_line,
         'qr_code_url': qr_code_url,
-        'badges': badges,
-        'barangay_name': barangay_name,
-        'id_barangay': id_barangay,
+        **id_card_fields(resident),
     })
 
 
+def _batch_residents(request):
+    """Barangay and residents for the batch print views (?barangay=<id>[&voters=1])."""
+    try:
+        barangay_pk = int(request.GET.get('barangay') or 0)
+    except ValueError:
+        raise Http404('Invalid barangay.')
+    barangay = get_object_or_404(Barangay, pk=barangay_pk)
+    residents = Resident.objects.filter(barangay=barangay).select_related('barangay').order_by('lastname', 'firstname')
+    if request.GET.get('voters'):
+        residents = residents.filter(is_voter=True, status=Resident.STATUS_ALIVE)
+    return barangay, residents
+
+
+def _batch_filename(barangay, extension):
+    return f"id_cards_{barangay.code or barangay.pk}_{barangay.name}.{extension}".replace(' ', '_')
+
+
+def resident_print_batch(request):
+    """
+    ID cards for every resident of a barangay as one PDF (?barangay=<id>[&voters=1][&per_page=8]).
+    Cards are drawn on ID_CARD_WORKERS processes (operations.id_cards) and streamed from a temp file.
+    """
+    barangay, residents = _batch_residents(request)
+    try:
+        per_page = int(request.GET.get('per_page') or 8)
+    except ValueError:
+        per_page = 8
+    out = tempfile.TemporaryFile()
+    try:
+        write_id_cards_pdf(
+            residents, out, _get_base_url_for_devices(request),
+            per_page=max(1, min(per_page, 8)),
+            workers=getattr(settings, 'ID_CARD_WORKERS', 1),
+        )
+    except Exception:
+        out.close()
+        raise
+    out.seek(0)
+    return FileResponse(out, as_attachment=True, filename=_batch_filename(barangay, 'pdf'), content_type='application/pdf')
+
+
+def resident_docx(request, pk):
+    """The resident's filled Profiling-template.docx."""
+    resident = get_object_or_404(Resident.objects.select_related('barangay'), pk=pk)
+    return HttpResponse(
+        profiling_docx(resident, _get_base_url_for_devices(request)),
+        content_type=DOCX_CONTENT_TYPE,
+        headers={'Content-Disposition': f'attachment; filename="{docx_filename(resident)}"'},
+    )
+
+
+def resident_docx_batch(request):
+    """Zip of filled Profiling-template.docx forms for a barangay (same filters as resident_print_batch)."""
+    barangay, residents = _batch_residents(request)
+    out = tempfile.TemporaryFile()
+    try:
+        write_profiling_docx_zip(
+            residents, out, _get_base_url_for_devices(request), workers=getattr(settings, 'ID_CARD_WORKERS', 1),
+        )
+    except Exception:
+        out.close()
+        raise
+    out.seek(0)
+    return FileResponse(out, as_attachment=True, filename=_batch_filename(barangay, 'zip'), content_type='application/zip')
+
+
+@revalidated(lambda request, pk: row_etag(Resident.objects.filter(pk=pk), 'updated_at', 'barangay__updated_at'))
 def resident_get(request, pk):
     """Get resident data as JSON."""
     resident = get_object_or_404(Resident, pk=pk)
@@ -731,45 +786,42 @@ def resident_delete(request, pk):
     return redirect('operations:residents_record')
 
 
-def voters_registration(request):
-    """Voters registration: show municipalities, then barangays; clicking a barangay shows its voters."""
-    barangays_with_voter_count = Barangay.objects.filter(
+def _municipalities_with_counts(**count):
+    """Active municipalities with their active barangays annotated with count (e.g. voter_count=Count(...))."""
+    barangays = Barangay.objects.filter(is_active=True).annotate(**count).order_by('name')
+    return Municipality.objects.filter(
         is_active=True
-    ).annotate(
-        voter_count=Count(
+    ).prefetch_related(
+        Prefetch('barangays', queryset=barangays)
+    ).order_by('name')
+
+
+def _voters_sidebar():
+    """Cached barangay tree and barangay <option>s shared by both voters registration pages."""
+    @functools.cache  # both fragments render from one evaluated queryset on a miss
+    def build():
+        return {'municipalities': _municipalities_with_counts(voter_count=Count(
             'residents',
             filter=Q(residents__is_voter=True, residents__status=Resident.STATUS_ALIVE),
             distinct=True,
-        ),
-    ).order_by('name')
-    municipalities = Municipality.objects.filter(
-        is_active=True
-    ).prefetch_related(
-        Prefetch('barangays', queryset=barangays_with_voter_count)
-    ).order_by('name')
-    context = {'municipalities': municipalities}
+        ))}
+    return {
+        'sidebar_tree': cached_fragment('voters', 'operations/includes/voters_barangay_tree.html', build),
+        'barangay_options': cached_fragment('voters_options', 'operations/includes/voters_barangay_options.html', build),
+    }
+
+
+def voters_registration(request):
+    """Voters registration: show municipalities, then barangays; clicking a barangay shows its voters."""
+    context = _voters_sidebar()
     return render(request, "operations/voters_registration.html", context)
 
 
 def voters_registration_barangay(request, pk):
     """Voters registration detail page for a single barangay (full-width voters list)."""
-    barangays_with_voter_count = Barangay.objects.filter(
-        is_active=True
-    ).annotate(
-        voter_count=Count(
-            'residents',
-            filter=Q(residents__is_voter=True, residents__status=Resident.STATUS_ALIVE),
-            distinct=True,
-        ),
-    ).order_by('name')
-    municipalities = Municipality.objects.filter(
-        is_active=True
-    ).prefetch_related(
-        Prefetch('barangays', queryset=barangays_with_voter_count)
-    ).order_by('name')
     initial_barangay = get_object_or_404(Barangay, pk=pk, is_active=True)
     context = {
-        'municipalities': municipalities,
+        **_voters_sidebar(),
         'initial_barangay': initial_barangay,
         'single_barangay_view': True,
     }
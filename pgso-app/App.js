@@ -12,9 +12,11 @@ import {
   FlatList,
   Keyboard,
 } from 'react-native';
+import AsyncStorage from '@react-native-async-storage/async-storage';
 import { CameraView, useCameraPermissions } from 'expo-camera';
 import { StatusBar } from 'expo-status-bar';
-import { API_BASE_URL } from './config';
+import { fetchResident } from './compact';
+import { findResident, setStorage, syncBarangay } from './residentSync';
 
 function extractResidentId(url) {
   const match = url.match(/\/app\/resident\/(\d+)\/?/);
@@ -100,18 +102,24 @@ function ProfileScreen({ residentId, onScanAgain }) {
   const [error, setError] = useState(null);
 
   useEffect(() => {
-    fetch(`${API_BASE_URL}/app/api/resident/${residentId}/`)
-      .then((res) => {
-        if (!res.ok) {
-          if (res.status === 404) throw new Error('Resident not found.');
-          throw new Error(`Server error (${res.status}). Check that the server is running.`);
-        }
-        return res.json();
+    fetchResident(residentId)
+      .catch((err) => {
+        if (err.status === 404) throw new Error('Resident not found.');
+        if (err.status) throw new Error(`Server error (${err.status}). Check that the server is running.`);
+        throw err;
+      })
+      .then((resident) => {
+        setData(resident);
+        if (resident.barangay_id) syncBarangay(resident.barangay_id).catch(() => {});
       })
-      .then(setData)
       .catch((err) => {
         const msg = (err && err.message) || 'Failed to load resident data';
         const isNetwork = /network|fetch|connection|refused|timeout/i.test(msg);
+        const offlineCopy = isNetwork ? findResident(residentId) : null;
+        if (offlineCopy) {
+          setData(offlineCopy);
+          return;
+        }
         setError(isNetwork ? 'Cannot reach server. Ensure phone is on same WiFi, API_BASE_URL in config.js matches your PC IP, and runserver-network.bat is running.' : msg);
       })
       .finally(() => setLoading(false));
@@ -200,6 +208,11 @@ export default function App() {
   const [screen, setScreen] = useState('home');
   const [residentId, setResidentId] = useState(null);
 
+  useEffect(() => {
+    // Reload the offline copies synced in earlier sessions.
+    setStorage(AsyncStorage).catch(() => {});
+  }, []);
+
   const handleScanned = (id) => {
     setResidentId(id);
     setScreen('profile');
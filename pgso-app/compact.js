@@ -0,0 +1,161 @@
+/**
+ * Compact (MessagePack) responses of the PPS scanner API.
+ *
+ * getCompact() asks for application/x-msgpack and decodes the body. Residents arrive as arrays
+ * in the server schema's field order, with enum codes instead of labels. expandResident() turns one
+ * back into the /app/api/resident/<id>/ JSON shape. The schema (/app/api/schema/) is fetched once
+ * and fetched again when a response names a different schema id.
+ */
+import { API_BASE_URL } from './config';
+
+const MSGPACK = 'application/x-msgpack';
+
+function utf8(bytes, start, end) {
+  let out = '';
+  let i = start;
+  while (i < end) {
+    const b = bytes[i++];
+    let code;
+    if (b < 0x80) code = b;
+    else if (b < 0xe0) code = ((b & 0x1f) << 6) | (bytes[i++] & 0x3f);
+    else if (b < 0xf0) code = ((b & 0x0f) << 12) | ((bytes[i++] & 0x3f) << 6) | (bytes[i++] & 0x3f);
+    else {
+      code = ((b & 0x07) << 18) | ((bytes[i++] & 0x3f) << 12) | ((bytes[i++] & 0x3f) << 6) | (bytes[i++] & 0x3f);
+    }
+    out += String.fromCodePoint(code);
+  }
+  return out;
+}
+
+/** Decode one MessagePack value (nil, bool, int, float, str, bin, array, map) from an ArrayBuffer. */
+export function decode(buffer) {
+  const bytes = new Uint8Array(buffer);
+  const view = new DataView(buffer);
+  let pos = 0;
+
+  const str = (length) => {
+    const value = utf8(bytes, pos, pos + length);
+    pos += length;
+    return value;
+  };
+  const bin = (length) => {
+    const value = bytes.slice(pos, pos + length);
+    pos += length;
+    return value;
+  };
+  const array = (length) => {
+    const value = new Array(length);
+    for (let i = 0; i < length; i++) value[i] = read();
+    return value;
+  };
+  const map = (length) => {
+    const value = {};
+    for (let i = 0; i < length; i++) {
+      const key = read();
+      value[key] = read();
+    }
+    return value;
+  };
+  const next = (size, get) => {
+    const value = get(pos);
+    pos += size;
+    return value;
+  };
+  const u8 = () => next(1, (p) => view.getUint8(p));
+  const u16 = () => next(2, (p) => view.getUint16(p));
+  const u32 = () => next(4, (p) => view.getUint32(p));
+
+  function read() {
+    const type = bytes[pos++];
+    if (type <= 0x7f) return type;
+    if (type <= 0x8f) return map(type & 0x0f);
+    if (type <= 0x9f) return array(type & 0x0f);
+    if (type <= 0xbf) return str(type & 0x1f);
+    if (type >= 0xe0) return type - 0x100;
+    switch (type) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xc4: return bin(u8());
+      case 0xc5: return bin(u16());
+      case 0xc6: return bin(u32());
+      case 0xca: return next(4, (p) => view.getFloat32(p));
+      case 0xcb: return next(8, (p) => view.getFloat64(p));
+      case 0xcc: return u8();
+      case 0xcd: return u16();
+      case 0xce: return u32();
+      case 0xcf: return next(8, (p) => view.getUint32(p) * 2 ** 32 + view.getUint32(p + 4));
+      case 0xd0: return next(1, (p) => view.getInt8(p));
+      case 0xd1: return next(2, (p) => view.getInt16(p));
+      case 0xd2: return next(4, (p) => view.getInt32(p));
+      case 0xd3: return next(8, (p) => view.getInt32(p) * 2 ** 32 + view.getUint32(p + 4));
+      case 0xd9: return str(u8());
+      case 0xda: return str(u16());
+      case 0xdb: return str(u32());
+      case 0xdc: return array(u16());
+      case 0xdd: return array(u32());
+      case 0xde: return map(u16());
+      case 0xdf: return map(u32());
+      default: throw new Error(`Unsupported MessagePack type 0x${type.toString(16)}`);
+    }
+  }
+
+  return read();
+}
+
+let schema = null;
+
+async function fetchDecoded(path, init = {}) {
+  const res = await fetch(`${API_BASE_URL}${path}`, {
+    ...init,
+    headers: { ...(init.headers || {}), Accept: MSGPACK },
+  });
+  if (!res.ok) {
+    const error = new Error(`Server error (${res.status})`);
+    error.status = res.status;
+    throw error;
+  }
+  return decode(await res.arrayBuffer());
+}
+
+/** GET (or init.method) path as MessagePack. Resolves to { data, schema } with a current schema. */
+export async function getCompact(path, init) {
+  const data = await fetchDecoded(path, init);
+  if (!schema || schema.schema !== data.schema) schema = await fetchDecoded('/app/api/schema/');
+  return { data, schema };
+}
+
+function ageOn(dateOfBirth, today = new Date()) {
+  const year = Math.floor(dateOfBirth / 10000);
+  const month = Math.floor(dateOfBirth / 100) % 100;
+  const day = dateOfBirth % 100;
+  let age = today.getFullYear() - year;
+  if (today.getMonth() + 1 < month || (today.getMonth() + 1 === month && today.getDate() < day)) age -= 1;
+  return age;
+}
+
+const pad = (n) => String(n).padStart(2, '0');
+
+/** A compact resident row -> the resident_api JSON object. barangays: [[id, name], ...]. */
+export function expandResident(row, currentSchema, barangays = []) {
+  const resident = {};
+  currentSchema.resident.forEach((field, i) => {
+    const value = row[i];
+    const table = currentSchema.enums[field];
+    resident[field] = table ? (value == null ? '' : table[value][1]) : value;
+  });
+  const dob = resident.date_of_birth;
+  resident.age = dob ? ageOn(dob) : null;
+  resident.date_of_birth = dob ? `${Math.floor(dob / 10000)}-${pad(Math.floor(dob / 100) % 100)}-${pad(dob % 100)}` : '';
+  resident.updated_at = new Date(resident.updated_at).toISOString();
+  const barangay = barangays.find(([id]) => id === resident.barangay_id);
+  resident.barangay = barangay ? barangay[1] : '';
+  resident.pdf_url = `${API_BASE_URL}/app/resident/${resident.id}/pdf/`;
+  return resident;
+}
+
+/** One resident in the resident_api shape, fetched compactly. */
+export async function fetchResident(residentId) {
+  const { data, schema: currentSchema } = await getCompact(`/app/api/resident/${residentId}/`);
+  return expandResident(data.resident, currentSchema, data.barangays);
+}
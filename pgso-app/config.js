@@ -4,3 +4,9 @@
  * Example: http://192.168.1.32:8000
  */
 export const API_BASE_URL = 'http://192.168.90.122:8000';
+
+/**
+ * Token for the offline sync API (the server's SYNC_API_TOKEN setting). Without it the app still
+ * scans online, but cannot keep offline copies of barangays.
+ */
+export const SYNC_API_TOKEN = '';
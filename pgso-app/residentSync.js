@@ -0,0 +1,104 @@
+/**
+ * Local copy of residents per barangay, kept current with /app/api/sync/residents/ (fetched as
+ * MessagePack, see compact.js).
+ *
+ * Each barangay keeps { cursor, name, residents: { [id]: resident } }. A sync walks pages until
+ * "more" is false, applying "deleted" before the page's rows. Copies live in memory and in the
+ * storage given to setStorage() (App.js passes AsyncStorage at startup), so they survive restarts.
+ * The profile screen syncs the barangay of every resident it loads, so scans of that barangay
+ * still resolve when the server cannot be reached. Sync requests carry SYNC_API_TOKEN.
+ */
+import { expandResident, getCompact } from './compact';
+import { API_BASE_URL, SYNC_API_TOKEN } from './config';
+
+const barangays = {};
+const syncing = {};
+let storage = null;
+let loaded = Promise.resolve();
+
+const storageKey = (barangayId) => `residents-sync:${barangayId}`;
+const INDEX_KEY = 'residents-sync:barangays';
+
+/** Use a persistent storage and load the copies saved in it (call once at startup). */
+export function setStorage(nextStorage) {
+  storage = nextStorage;
+  loaded = (async () => {
+    const saved = JSON.parse((await storage.getItem(INDEX_KEY)) || '[]');
+    await Promise.all(saved.map(load));
+  })();
+  return loaded;
+}
+
+async function load(barangayId) {
+  if (!barangays[barangayId] && storage) {
+    const saved = await storage.getItem(storageKey(barangayId));
+    if (saved) barangays[barangayId] = JSON.parse(saved);
+  }
+  if (!barangays[barangayId]) barangays[barangayId] = { cursor: '', name: '', residents: {} };
+  return barangays[barangayId];
+}
+
+function applyPage(copy, page, schema) {
+  if (page.reset) copy.residents = {};
+  page.deleted.forEach((id) => {
+    delete copy.residents[id];
+  });
+  const [barangayId, name] = page.barangay;
+  page.rows.forEach((row) => {
+    const resident = expandResident(row, schema, [[barangayId, name]]);
+    copy.residents[resident.id] = resident;
+  });
+  copy.name = name;
+  copy.cursor = page.cursor;
+}
+
+async function pull(barangayId) {
+  await loaded.catch(() => {}); // start from the saved cursor, not from scratch
+  const copy = await load(barangayId);
+  const headers = { Authorization: `Bearer ${SYNC_API_TOKEN}` };
+  let more = true;
+  while (more) {
+    const query = `barangay=${barangayId}&cursor=${encodeURIComponent(copy.cursor)}`;
+    const { data: page, schema } = await getCompact(`/app/api/sync/residents/?${query}`, { headers });
+    applyPage(copy, page, schema);
+    more = page.more;
+  }
+  if (storage) {
+    await storage.setItem(storageKey(barangayId), JSON.stringify(copy));
+    await storage.setItem(INDEX_KEY, JSON.stringify(Object.keys(barangays)));
+  }
+  return copy;
+}
+
+/** Bring the local copy of a barangay up to date (one sync per barangay at a time). */
+export function syncBarangay(barangayId) {
+  if (!syncing[barangayId]) {
+    syncing[barangayId] = pull(barangayId).finally(() => {
+      delete syncing[barangayId];
+    });
+  }
+  return syncing[barangayId];
+}
+
+function ageOn(dateOfBirth, today = new Date()) {
+  const [year, month, day] = dateOfBirth.split('-').map(Number);
+  let age = today.getFullYear() - year;
+  if (today.getMonth() + 1 < month || (today.getMonth() + 1 === month && today.getDate() < day)) age -= 1;
+  return age;
+}
+
+/** A synced resident in the shape of /app/api/resident/<id>/, or null if no copy has it. */
+export function findResident(residentId) {
+  for (const copy of Object.values(barangays)) {
+    const resident = copy.residents[residentId];
+    if (resident) {
+      return {
+        ...resident,
+        barangay: copy.name,
+        age: resident.date_of_birth ? ageOn(resident.date_of_birth) : null,
+        pdf_url: `${API_BASE_URL}/app/resident/${resident.id}/pdf/`,
+      };
+    }
+  }
+  return null;
+}
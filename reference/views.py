@@ -2,6 +2,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.http import JsonResponse
 from django.db import transaction
+from django.db.models import Count, Q
 from django.urls import reverse
 from administrator.utils import (
     user_can_add_reference_barangay,
@@ -12,6 +13,7 @@ from administrator.utils import (
     user_can_delete_reference_position,
 )
 from administrator.activity_log import log_activity, ACTION_CREATE, ACTION_UPDATE, ACTION_DELETE
+from main.conditional import revalidated, row_etag
 from .models import Barangay, Municipality, Position
 from operations.models import BarangayOfficial
 
@@ -176,6 +178,7 @@ def barangay_delete(request, pk):
     return redirect('reference:barangay_list')
 
 
+@revalidated(lambda request, pk: row_etag(Barangay.objects.filter(pk=pk, is_active=True), 'updated_at'))
 def barangay_get(request, pk):
     """Get barangay details as JSON for editing."""
     barangay = get_object_or_404(Barangay, pk=pk, is_active=True)
@@ -190,14 +193,13 @@ def barangay_get(request, pk):
 
 def position_list(request):
     """List all active positions ordered by code."""
-    positions = Position.objects.filter(is_active=True)
+    # Total active officials per position from BarangayOfficial, counted in the same query
+    positions = Position.objects.filter(is_active=True).annotate(
+        total=Count('officials', filter=Q(officials__is_active=True))
+    )
     # Sort by numeric code value instead of alphabetically
     positions = sorted(positions, key=lambda x: int(x.code) if x.code.isdigit() else 999999)
     
-    # Add total count for each position from BarangayOfficial model
-    for position in positions:
-        position.total = BarangayOfficial.objects.filter(position=position, is_active=True).count()
-    
     return render(request, 'reference/position_list.html', {'positions': positions})
 
 
@@ -347,13 +349,13 @@ def position_detail(request, pk):
         # Show all barangays when no municipality filter is selected
         barangays = Barangay.objects.filter(is_active=True).select_related('municipality').order_by('name')
     
-    # Add official count for each barangay for this position
-    for barangay in barangays:
-        barangay.officials_count = BarangayOfficial.objects.filter(
-            position=position,
-            barangay=barangay,
-            is_active=True
-        ).count()
+    # Official count for each barangay for this position, counted in the same query
+    barangays = barangays.annotate(
+        officials_count=Count(
+            'officials',
+            filter=Q(officials__position=position, officials__is_active=True),
+        )
+    )
     
     context = {
         'position': position,
@@ -0,0 +1,64 @@
+"""
+Shared cache for the municipality → barangay sidebar tree.
+
+Report pages, voters registration and the residents record render the same tree with per-barangay
+counts for every user. cached_fragment() renders it once per (kind, year, month) and keeps the HTML
+in the default cache, so a hit skips both the aggregate query and the template loop. Keys carry a
+version number that bump_sidebar_version() increments after barangay, municipality and resident
+writes commit (see reports.signals), which retires every cached tree at once; old entries simply
+expire after SIDEBAR_CACHE_SECONDS. Bulk loaders that bypass model signals call it themselves.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from main.instrumentation import metrics
+
+VERSION_KEY = 'sidebar:version'
+
+
+def _cache_seconds():
+    return getattr(settings, 'SIDEBAR_CACHE_SECONDS', 300)
+
+
+def sidebar_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Start from the clock so a version lost to eviction or a restart never repeats an old one.
+        cache.add(VERSION_KEY, time.time_ns() // 1000, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_sidebar_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        sidebar_version()
+
+
+def cached_fragment(kind, template_name, build_context, year=None, month=None):
+    """
+    Rendered template_name for this (kind, year, month). build_context() is only called on a miss.
+    Markup must not depend on the request beyond those values: mark the selection with mark_selected().
+    """
+    if not _cache_seconds():
+        return mark_safe(render_to_string(template_name, build_context()))
+    key = f'sidebar:{sidebar_version()}:{kind}:{year or ""}:{month or ""}'
+    html = cache.get(key)
+    metrics.record_cache('sidebar', html is not None)
+    if html is None:
+        html = render_to_string(template_name, build_context())
+        cache.set(key, html, _cache_seconds())
+    return mark_safe(html)
+
+
+def mark_selected(html, barangay_id):
+    """Add the `selected` class to the folder of barangay_id (fragments tag folders with data-barangay-id)."""
+    if not barangay_id:
+        return html
+    needle = f'class="barangay-folder" data-barangay-id="{barangay_id}"'
+    return mark_safe(html.replace(needle, f'class="barangay-folder selected" data-barangay-id="{barangay_id}"', 1))
@@ -0,0 +1,19 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from operations.models import Resident
+from reference.models import Barangay, Municipality
+
+from .sidebar import bump_sidebar_version
+
+
+@receiver(post_save, sender=Resident)
+@receiver(post_delete, sender=Resident)
+@receiver(post_save, sender=Barangay)
+@receiver(post_delete, sender=Barangay)
+@receiver(post_save, sender=Municipality)
+@receiver(post_delete, sender=Municipality)
+def invalidate_sidebar(sender, **kwargs):
+    # After commit: a tree rebuilt before the write is visible would be cached under the new version.
+    transaction.on_commit(bump_sidebar_version)
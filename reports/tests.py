@@ -1,3 +1,69 @@
-from django.test import TestCase
+"""Cached municipality / barangay sidebar tree (reports.sidebar)."""
+from datetime import date
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from operations.models import Resident
+from reference.models import Barangay, Municipality
+
+
+@override_settings(SIDEBAR_CACHE_SECONDS=300)
+class SidebarCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('sidebar-admin', 'admin@example.com', 'pw')
+        municipality = Municipality.objects.create(name='Municipality')
+        cls.barangays = [Barangay.objects.create(name=f'Barangay {i}', municipality=municipality) for i in range(2)]
+        cls.resident = cls._resident(cls.barangays[0], 'Cruz')
+
+    @staticmethod
+    def _resident(barangay, lastname):
+        return Resident.objects.create(
+            barangay=barangay, lastname=lastname, firstname='Juan', gender=Resident.GENDER_MALE,
+            date_of_birth=date(1980, 1, 1), status=Resident.STATUS_ALIVE,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def _get(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        html = response.content.decode()
+        start = html.index('municipalities-section')
+        return html[start:html.index('<script>', start)], len(ctx.captured_queries)
+
+    def test_tree_is_cached_until_a_write_commits(self):
+        url = reverse('reports:list_male')
+        cold, cold_queries = self._get(url)
+        warm, warm_queries = self._get(url)
+        self.assertEqual(warm, cold)
+        self.assertEqual(warm_queries, cold_queries - 2)  # no barangay aggregate, no prefetch
+        self.assertEqual(warm.count('<span class="resident-badge">1</span>'), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._resident(self.barangays[1], 'Santos')
+        fresh, _ = self._get(url)
+        self.assertEqual(fresh.count('<span class="resident-badge">1</span>'), 2)
+
+    def test_selected_barangay_is_marked_on_the_cached_tree(self):
+        url = reverse('reports:list_male')
+        self._get(url)
+        html, _ = self._get(f'{url}?barangay={self.barangays[1].pk}')
+        self.assertIn(f'class="barangay-folder selected" data-barangay-id="{self.barangays[1].pk}"', html)
+        self.assertIn(f'class="barangay-folder" data-barangay-id="{self.barangays[0].pk}"', html)
+
+    def test_voters_pages_share_one_tree(self):
+        detail = reverse('operations:voters_registration_barangay', kwargs={'pk': self.barangays[0].pk})
+        _, cold_queries = self._get(detail)
+        cache.clear()
+        self._get(reverse('operations:voters_registration'))
+        html, warm_queries = self._get(detail)
+        self.assertEqual(warm_queries, cold_queries - 2)
+        self.assertIn(f'data-barangay-id="{self.barangays[1].pk}"', html)
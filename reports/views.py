@@ -7,6 +7,8 @@ from django.utils import timezone
 from reference.models import Barangay, Municipality
 from django.urls import reverse
 
+from .sidebar import cached_fragment, mark_selected
+
 
 def reports_index(request):
     """Reports index view"""
@@ -80,6 +82,26 @@ def _sidebar_municipalities_for_report(resident_rel_q: Q):
     )
 
 
+def _report_sidebar(request, resident_rel_q: Q, selected_barangay_id, selected_year=None, selected_month=None):
+    """
+    Rendered barangay folder tree for this report, cached per (report, year, month).
+    resident_rel_q must already filter on selected_year / selected_month.
+    """
+    html = cached_fragment(
+        request.resolver_match.view_name,
+        'reports/includes/barangay_folders_tree.html',
+        lambda: {
+            'municipalities': _sidebar_municipalities_for_report(resident_rel_q),
+            'base_path': request.path,
+            'selected_year': selected_year,
+            'selected_month': selected_month,
+        },
+        year=selected_year,
+        month=selected_month,
+    )
+    return mark_selected(html, selected_barangay_id)
+
+
 def _get_selected_barangay(request):
     barangay_id = request.GET.get('barangay')
     if not barangay_id:
@@ -115,7 +137,7 @@ def list_male(request):
         'count': residents.count(),
         'barangay': selected_barangay,
         'selected_barangay_id': selected_barangay_id,
-        'municipalities': _sidebar_municipalities_for_report(rel_q),
+        'sidebar_tree': _report_sidebar(request, rel_q, selected_barangay_id, selected_year),
         'base_path': request.path,
         'print_path': reverse('reports:print_male'),
         'available_years': available_years,
@@ -149,7 +171,7 @@ def list_female(request):
         'count': residents.count(),
         'barangay': selected_barangay,
         'selected_barangay_id': selected_barangay_id,
-        'municipalities': _sidebar_municipalities_for_report(rel_q),
+        'sidebar_tree': _report_sidebar(request, rel_q, selected_barangay_id, selected_year),
         'base_path': request.path,
         'print_path': reverse('reports:print_female'),
         'available_years': available_years,
@@ -183,7 +205,7 @@ def list_pwd(request):
         'count': residents.count(),
         'barangay': selected_barangay,
         'selected_barangay_id': selected_barangay_id,
-        'municipalities': _sidebar_municipalities_for_report(rel_q),
+        'sidebar_tree': _report_sidebar(request, rel_q, selected_barangay_id, selected_year),
         'base_path': request.path,
         'print_path': reverse('reports:print_pwd'),
         'available_years': available_years,
@@ -217,7 +239,7 @@ def list_solo_parent(request):
         'count': residents.count(),
         'barangay': selected_barangay,
         'selected_barangay_id': selected_barangay_id,
-        'municipalities': _sidebar_municipalities_for_report(rel_q),
+        'sidebar_tree': _report_sidebar(request, rel_q, selected_barangay_id, selected_year),
         'base_path': request.path,
         'print_path': reverse('reports:print_solo_parent'),
         'available_years': available_years,
@@ -251,7 +273,7 @@ def list_senior_citizen(request):
         'count': residents.count(),
         'barangay': selected_barangay,
         'selected_barangay_id': selected_barangay_id,
-        'municipalities': _sidebar_municipalities_for_report(rel_q),
+        'sidebar_tree': _report_sidebar(request, rel_q, selected_barangay_id, selected_year),
         'base_path': request.path,
         'print_path': reverse('reports:print_senior_citizen'),
         'available_years': available_years,
@@ -285,7 +307,7 @@ def list_4ps_member(request):
         'count': residents.count(),
         'barangay': selected_barangay,
         'selected_barangay_id': selected_barangay_id,
-        'municipalities': _sidebar_municipalities_for_report(rel_q),
+        'sidebar_tree': _report_sidebar(request, rel_q, selected_barangay_id, selected_year),
         'base_path': request.path,
         'print_path': reverse('reports:print_4ps_member'),
         'available_years': available_years,
@@ -324,7 +346,7 @@ def list_voters(request):
         'count': residents.count(),
         'barangay': selected_barangay,
         'selected_barangay_id': selected_barangay_id,
-        'municipalities': _sidebar_municipalities_for_report(rel_q),
+        'sidebar_tree': _report_sidebar(request, rel_q, selected_barangay_id, selected_year),
         'base_path': request.path,
         'print_path': reverse('reports:print_voters'),
         'available_years': available_years,
@@ -362,7 +384,7 @@ def list_residents_record(request):
         'count': residents.count(),
         'barangay': selected_barangay,
         'selected_barangay_id': selected_barangay_id,
-        'municipalities': _sidebar_municipalities_for_report(rel_q),
+        'sidebar_tree': _report_sidebar(request, rel_q, selected_barangay_id, selected_year),
         'base_path': request.path,
         'print_path': reverse('reports:print_residents_record'),
         'available_years': available_years,
@@ -484,7 +506,7 @@ def list_deceased(request):
         'count': residents.count(),
         'barangay': selected_barangay,
         'selected_barangay_id': selected_barangay_id,
-        'municipalities': _sidebar_municipalities_for_report(rel_q),
+        'sidebar_tree': _report_sidebar(request, rel_q, selected_barangay_id, selected_year, selected_month),
         'base_path': request.path,
         'print_path': reverse('reports:print_deceased'),
         'available_years': available_years,
@@ -526,7 +548,7 @@ def list_birth_by_year(request):
         'count': residents.count(),
         'barangay': selected_barangay,
         'selected_barangay_id': selected_barangay_id,
-        'municipalities': _sidebar_municipalities_for_report(rel_q),
+        'sidebar_tree': _report_sidebar(request, rel_q, selected_barangay_id, selected_year),
         'base_path': request.path,
         'print_path': reverse('reports:print_birth_by_year'),
         'available_years': available_years,